@@ -114,6 +114,9 @@ def create_app(config_obj: type | object = Config) -> Flask:
     app.register_blueprint(planes_bp)
     app.register_blueprint(contratos_cv_bp)
     app.register_blueprint(pagos_bp)
+
+    from app.commands import register_commands
+    register_commands(app)
     
     if __name__ == '__main__':
         app.run(debug=True)
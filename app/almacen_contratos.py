@@ -0,0 +1,179 @@
+"""
+Almacén de los HTML de contratos firmados, direccionado por contenido.
+
+Cada HTML se guarda una sola vez, comprimido con gzip, en un archivo cuyo
+nombre es su SHA-256 (el mismo `hash_contrato` que valida la firma):
+`<dir>/ab/cd/abcd….html.gz`. Dos contratos con el mismo contenido comparten
+el archivo y las filas de contrato solo guardan el hash; `contrato_html`
+queda en NULL. Los contratos firmados antes del almacén se siguen leyendo de
+la columna o del archivo plano en `static/contratos`, y los generados con
+plantilla se renderizan (app/plantillas_contratos.py) hasta que su primera
+descarga los deja como blob (app/entrega_contratos.py).
+"""
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from app import db
+from app.plantillas_contratos import html_guardado, PlantillaAlterada
+
+EXTENSION = '.html.gz'
+_HASH_VALIDO = re.compile(r'^[0-9a-f]{64}$')
+
+
+def directorio() -> str:
+    return current_app.config.get('CONTRATOS_BLOBS_DIR') or os.path.join(current_app.instance_path, 'contratos')
+
+
+def hash_de(html: str) -> str:
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def hash_valido(hash_hex) -> bool:
+    return bool(hash_hex) and _HASH_VALIDO.match(hash_hex) is not None
+
+
+def ruta_de(hash_hex: str) -> str:
+    """Ruta del blob; dos niveles de carpetas para no juntar todo en un directorio."""
+    if not hash_valido(hash_hex):
+        raise ValueError(f"Hash inválido: {hash_hex!r}")
+    return os.path.join(directorio(), hash_hex[:2], hash_hex[2:4], hash_hex + EXTENSION)
+
+
+def existe(hash_hex: str) -> bool:
+    return os.path.exists(ruta_de(hash_hex))
+
+
+def guardar(html: str) -> tuple:
+    """
+    Guarda el HTML si todavía no existe. Devuelve (hash, nuevo).
+
+    La escritura va a un temporal en la misma carpeta y se publica con
+    `os.replace`, así un lector nunca ve un blob a medias y dos firmas
+    simultáneas del mismo contenido dejan el mismo archivo. Si el blob ya
+    existe se le actualiza el mtime: puede ser un huérfano viejo que
+    `purgar_huerfanos` está por borrar y ahora lo referencia esta firma.
+    """
+    hash_hex = hash_de(html)
+    ruta = ruta_de(hash_hex)
+    try:
+        os.utime(ruta)
+        return hash_hex, False
+    except FileNotFoundError:
+        pass
+
+    carpeta = os.path.dirname(ruta)
+    os.makedirs(carpeta, exist_ok=True)
+    # mtime=0: el mismo HTML produce siempre los mismos bytes comprimidos
+    datos = gzip.compress(html.encode('utf-8'), compresslevel=9, mtime=0)
+    fd, temporal = tempfile.mkstemp(dir=carpeta, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(datos)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    return hash_hex, True
+
+
+def leer(hash_hex: str):
+    """HTML del blob, o None si no existe."""
+    try:
+        with gzip.open(ruta_de(hash_hex), 'rb') as f:
+            return f.read().decode('utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def html_de(contrato):
+    """HTML firmado de un contrato: la columna (contratos anteriores al almacén), su plantilla o su blob."""
+    if contrato.contrato_html is not None:
+        return contrato.contrato_html
+    if contrato.plantilla:
+        return html_guardado(contrato.plantilla, contrato.plantilla_version, contrato.variables, contrato.hash_contrato)
+    if hash_valido(contrato.hash_contrato):
+        return leer(contrato.hash_contrato)
+    return None
+
+
+def html_disponible(contrato):
+    """
+    Como `html_de`, pero un contrato con plantilla que ya no reproduce su hash
+    se registra en el log y se devuelve None, para que un solo contrato
+    alterado no tumbe un listado ni la reconstrucción del índice.
+    """
+    try:
+        return html_de(contrato)
+    except PlantillaAlterada as e:
+        current_app.logger.error('Contrato %s sin HTML: %s', contrato.id, e)
+        return None
+
+
+def migrar_columna(modelo, lote: int = 200) -> dict:
+    """
+    Pasa al almacén el `contrato_html` de las filas de `modelo` que aún lo
+    tienen en la columna y lo deja en NULL, por lotes de id. Las filas cuyo
+    HTML no coincide con su `hash_contrato` se dejan como están.
+    """
+    resumen = {'migrados': 0, 'nuevos': 0, 'no_coinciden': []}
+    ultimo_id = 0
+    while True:
+        filas = db.session.execute(
+            select(modelo.id, modelo.hash_contrato, modelo.contrato_html)
+            .where(modelo.id > ultimo_id, modelo.contrato_html.is_not(None))
+            .order_by(modelo.id)
+            .limit(lote)
+        ).all()
+        if not filas:
+            break
+
+        migrados = []
+        for contrato_id, hash_contrato, html in filas:
+            if hash_de(html) != hash_contrato:
+                resumen['no_coinciden'].append(contrato_id)
+                continue
+            _, nuevo = guardar(html)
+            resumen['nuevos'] += nuevo
+            migrados.append(contrato_id)
+        if migrados:
+            # Core UPDATE: no cuenta como cambio de versión del contrato
+            db.session.execute(
+                update(modelo.__table__).where(modelo.__table__.c.id.in_(migrados)).values(contrato_html=None)
+            )
+        db.session.commit()
+
+        resumen['migrados'] += len(migrados)
+        ultimo_id = filas[-1].id
+    return resumen
+
+
+def purgar_huerfanos(hashes_en_uso: set, antiguedad: float = 3600) -> int:
+    """
+    Borra los blobs que ningún contrato referencia. Los de menos de
+    `antiguedad` segundos se respetan: pueden ser de una firma cuya
+    transacción todavía no termina.
+    """
+    limite = time.time() - antiguedad
+    borrados = 0
+    for carpeta, _, archivos in os.walk(directorio()):
+        for archivo in archivos:
+            if not archivo.endswith(EXTENSION):
+                continue
+            ruta = os.path.join(carpeta, archivo)
+            if archivo[:-len(EXTENSION)] in hashes_en_uso:
+                continue
+            try:
+                # El mtime se vuelve a leer justo antes de borrar: `guardar` lo renueva al reusar el blob
+                if os.path.getmtime(ruta) < limite:
+                    os.unlink(ruta)
+                    borrados += 1
+            except FileNotFoundError:
+                continue
+    return borrados
@@ -0,0 +1,310 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import update, select, func, case, cast, literal, union_all, Integer
+
+from app import db
+from app.models import TotalCajaDiario, CorteCaja, EstadoCorte
+from app.dinero import a_centavos, a_decimal
+from app.errores import ErrorDeNegocio
+
+
+METODOS_PAGO = ('EFECTIVO', 'TARJETA', 'TRANSFERENCIA')
+
+
+def insert_upsert():
+    """`insert` del dialecto activo si soporta ON CONFLICT, si no None."""
+    dialecto = db.session.get_bind().dialect.name
+    if dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def acumular_pago(empleado_id, sucursal_id, fecha: date, metodo, monto: Decimal, transacciones: int = 1):
+    """
+    Suma un pago (o `transacciones` pagos que suman `monto`) al acumulado
+    diario de caja. No hace commit: debe llamarse dentro de la misma
+    transacción que inserta los Pago.
+    """
+    if sucursal_id is None or empleado_id is None:
+        return
+
+    clave = {
+        'empleado_id': empleado_id,
+        'sucursal_id': sucursal_id,
+        'fecha': fecha,
+        'metodo': metodo
+    }
+    insert = insert_upsert()
+    if insert is not None:
+        stmt = insert(TotalCajaDiario).values(**clave, total=monto, transacciones=transacciones)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(clave),
+            set_={
+                'total': TotalCajaDiario.total + stmt.excluded.total,
+                'transacciones': TotalCajaDiario.transacciones + stmt.excluded.transacciones
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    resultado = db.session.execute(
+        update(TotalCajaDiario)
+        .filter_by(**clave)
+        .values(
+            total=TotalCajaDiario.total + monto,
+            transacciones=TotalCajaDiario.transacciones + transacciones
+        )
+    )
+    if resultado.rowcount == 0:
+        db.session.add(TotalCajaDiario(**clave, total=monto, transacciones=transacciones))
+
+
+def totales_del_dia(empleado_id, sucursal_id, fecha: date) -> dict:
+    """
+    Devuelve {metodo: (total, transacciones)} del día para el empleado y
+    sucursal. Métodos sin pagos aparecen con (0, 0).
+    """
+    filas = TotalCajaDiario.query.filter_by(
+        empleado_id=empleado_id, sucursal_id=sucursal_id, fecha=fecha
+    ).all()
+
+    totales = {metodo: (Decimal('0'), 0) for metodo in METODOS_PAGO}
+    for fila in filas:
+        totales[fila.metodo] = (fila.total, fila.transacciones)
+    return totales
+
+
+# Columnas sumadas por el reporte de cortes: sistema, declarado y diferencias
+COLUMNAS_REPORTE = (
+    'total_efectivo', 'total_tarjeta', 'total_transferencia', 'total_general',
+    'real_efectivo', 'real_tarjeta', 'real_transferencia',
+    'dif_efectivo', 'dif_tarjeta', 'dif_transferencia'
+)
+
+
+def _agregados_reporte():
+    columnas = [
+        func.coalesce(func.sum(getattr(CorteCaja, c)), 0).label(c) for c in COLUMNAS_REPORTE
+    ]
+    columnas.append(func.count(CorteCaja.id).label('cortes'))
+    columnas += [
+        func.sum(case((CorteCaja.estado == estado, 1), else_=0)).label(f"estado_{estado.value.lower()}")
+        for estado in EstadoCorte
+    ]
+    return columnas
+
+
+def consulta_reporte_cortes(desde: date, hasta: date, sucursales=None, empleados=None):
+    """
+    SELECT del reporte de cortes entre `desde` y `hasta` (inclusive), con
+    subtotales por empleado, por sucursal y total general.
+
+    En PostgreSQL se usa GROUP BY ROLLUP; en otros motores se emula con
+    UNION ALL de los tres niveles. La columna `nivel` indica el subtotal:
+    'empleado', 'sucursal' o 'total'.
+    """
+    filtros = [CorteCaja.fecha_corte >= desde, CorteCaja.fecha_corte <= hasta]
+    if sucursales:
+        filtros.append(CorteCaja.sucursal_id.in_(sucursales))
+    if empleados:
+        filtros.append(CorteCaja.empleado_id.in_(empleados))
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        nivel = case(
+            (func.grouping(CorteCaja.sucursal_id) == 1, 'total'),
+            (func.grouping(CorteCaja.empleado_id) == 1, 'sucursal'),
+            else_='empleado'
+        )
+        return (
+            select(
+                nivel.label('nivel'),
+                CorteCaja.sucursal_id,
+                CorteCaja.empleado_id,
+                *_agregados_reporte()
+            )
+            .where(*filtros)
+            .group_by(func.rollup(CorteCaja.sucursal_id, CorteCaja.empleado_id))
+            .order_by(CorteCaja.sucursal_id.nulls_last(), CorteCaja.empleado_id.nulls_last())
+        )
+
+    por_empleado = (
+        select(literal('empleado').label('nivel'), CorteCaja.sucursal_id, CorteCaja.empleado_id,
+               *_agregados_reporte())
+        .where(*filtros)
+        .group_by(CorteCaja.sucursal_id, CorteCaja.empleado_id)
+    )
+    por_sucursal = (
+        select(literal('sucursal').label('nivel'), CorteCaja.sucursal_id,
+               literal(None, Integer).label('empleado_id'), *_agregados_reporte())
+        .where(*filtros)
+        .group_by(CorteCaja.sucursal_id)
+    )
+    total = (
+        select(literal('total').label('nivel'), literal(None, Integer).label('sucursal_id'),
+               literal(None, Integer).label('empleado_id'), *_agregados_reporte())
+        .where(*filtros)
+    )
+    reporte = union_all(por_empleado, por_sucursal, total).subquery()
+    return select(reporte).order_by(
+        reporte.c.sucursal_id.is_(None), reporte.c.sucursal_id,
+        reporte.c.empleado_id.is_(None), reporte.c.empleado_id
+    )
+
+
+# ──────────────────────────────────────────────
+#  Comparación y cierre de cortes por lote
+# ──────────────────────────────────────────────
+# Campo declarado → columna del sistema con la que se compara
+CAMPOS_DECLARADOS = {
+    'efectivo': CorteCaja.total_efectivo,
+    'tarjeta': CorteCaja.total_tarjeta,
+    'transferencia': CorteCaja.total_transferencia,
+    'total': CorteCaja.total_general,
+    'transacciones_tarjeta': CorteCaja.trans_tarjeta
+}
+
+
+class ErrorCortes(ErrorDeNegocio):
+    """Uno o más cortes del lote no se pueden procesar; lleva el detalle por corte."""
+
+    def __init__(self, errores: list, status: int = 409):
+        super().__init__(f"{len(errores)} corte(s) con error", status)
+        self.errores = errores
+
+
+def _valor_declarado(campo, valor):
+    if valor is None:
+        return literal(None, CAMPOS_DECLARADOS[campo].type)
+    if campo == 'transacciones_tarjeta':
+        return literal(int(valor), Integer)
+    return literal(a_decimal(a_centavos(valor)), CAMPOS_DECLARADOS[campo].type)
+
+
+def comparar_cortes(declarados: list) -> list:
+    """
+    Compara lo declarado contra lo del sistema para varios cortes con un solo
+    SELECT: lo declarado entra como tabla derivada y las diferencias se
+    calculan en la base.
+
+    Args:
+        declarados: [{'corte_id': int, 'efectivo': ..., 'tarjeta': ..., ...}]
+
+    Raises:
+        ValueError: si un corte_id o un monto no es válido.
+    """
+    filas = [
+        select(
+            literal(int(d['corte_id']), Integer).label('corte_id'),
+            *[_valor_declarado(campo, d.get(campo)).label(campo) for campo in CAMPOS_DECLARADOS]
+        )
+        for d in declarados
+    ]
+    if not filas:
+        return []
+    declarado = union_all(*filas).subquery('declarado') if len(filas) > 1 else filas[0].subquery('declarado')
+
+    consulta = (
+        select(
+            declarado.c.corte_id,
+            CorteCaja.id,
+            CorteCaja.estado,
+            *[columna.label(f"actual_{campo}") for campo, columna in CAMPOS_DECLARADOS.items()],
+            *[declarado.c[campo].label(f"declarado_{campo}") for campo in CAMPOS_DECLARADOS],
+            *[(declarado.c[campo] - columna).label(f"dif_{campo}") for campo, columna in CAMPOS_DECLARADOS.items()]
+        )
+        .select_from(declarado)
+        .outerjoin(CorteCaja, CorteCaja.id == declarado.c.corte_id)
+    )
+
+    resultado = []
+    for fila in db.session.execute(consulta).mappings():
+        if fila['id'] is None:
+            resultado.append({'corte_id': fila['corte_id'], 'error': 'Corte de caja no encontrado'})
+            continue
+        diferencias = {
+            campo: {
+                'actual': fila[f"actual_{campo}"],
+                'declarado': fila[f"declarado_{campo}"],
+                'diferencia': fila[f"dif_{campo}"]
+            }
+            for campo in CAMPOS_DECLARADOS
+            if fila[f"declarado_{campo}"] is not None and fila[f"dif_{campo}"] != 0
+        }
+        resultado.append({
+            'corte_id': fila['corte_id'],
+            'estado': fila['estado'].value,
+            'editable': fila['estado'] == EstadoCorte.PENDIENTE,
+            'actual': {campo: fila[f"actual_{campo}"] for campo in CAMPOS_DECLARADOS},
+            'diferencias': diferencias
+        })
+    return resultado
+
+
+def cerrar_cortes(corte_ids: list, admin_id: int) -> list:
+    """
+    Cierra varios cortes declarados en una sola transacción: todos o ninguno.
+
+    Los cortes se bloquean (SELECT ... FOR UPDATE), se validan juntos y se
+    cierran con un solo UPDATE que calcula el estado final a partir de la
+    suma de diferencias. No hace commit.
+
+    Raises:
+        ErrorCortes: con el motivo de cada corte que no se puede cerrar.
+    """
+    ids = sorted(set(corte_ids))
+    cortes = {
+        c.id: c for c in db.session.execute(
+            select(CorteCaja.id, CorteCaja.empleado_id, CorteCaja.confirmado_empleado, CorteCaja.estado)
+            .where(CorteCaja.id.in_(ids))
+            .order_by(CorteCaja.id)
+            .with_for_update()
+        )
+    }
+
+    errores = []
+    for corte_id in ids:
+        corte = cortes.get(corte_id)
+        if corte is None:
+            errores.append({'corte_id': corte_id, 'error': 'Corte de caja no encontrado'})
+        elif not corte.confirmado_empleado:
+            errores.append({'corte_id': corte_id, 'error': 'El empleado no ha confirmado el corte'})
+        elif corte.estado != EstadoCorte.DECLARADO:
+            errores.append({'corte_id': corte_id, 'error': 'El corte ya fue cerrado'})
+        elif corte.empleado_id == admin_id:
+            errores.append({'corte_id': corte_id, 'error': 'No puedes cerrar tu propio corte de caja'})
+    if errores:
+        raise ErrorCortes(errores)
+
+    dif_total = CorteCaja.dif_efectivo + CorteCaja.dif_tarjeta + CorteCaja.dif_transferencia
+    db.session.execute(
+        update(CorteCaja)
+        .where(CorteCaja.id.in_(ids))
+        .values(
+            estado=cast(
+                case(
+                    (dif_total == 0, EstadoCorte.COMPLETO.name),
+                    (dif_total < 0, EstadoCorte.FALTANTE.name),
+                    else_=EstadoCorte.SOBRANTE.name
+                ),
+                CorteCaja.estado.type
+            ),
+            confirmado_admin=True,
+            fecha_cierre=datetime.utcnow(),
+            cerrado_por_admin_id=admin_id
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    return [
+        {'corte_id': fila.id, 'estado': fila.estado.value, 'diferencia_total': float(fila.diferencia_total)}
+        for fila in db.session.execute(
+            select(CorteCaja.id, CorteCaja.estado, dif_total.label('diferencia_total'))
+            .where(CorteCaja.id.in_(ids))
+            .order_by(CorteCaja.id)
+        )
+    ]
@@ -0,0 +1,219 @@
+"""
+Antigüedad y riesgo de la cartera de contratos de compra-venta.
+
+Toda la cartera se trae con una sola consulta (contratos + lo pagado en el
+periodo del roll rate + sucursal del empleado que vendió) a un DataFrame, y
+los cálculos se hacen por columnas con pandas/NumPy, sin iterar objetos del
+ORM.
+
+Con un `corte` pasado solo se excluyen los contratos creados después: el
+saldo y el próximo pago de cada contrato son los actuales, no los que tenía
+a esa fecha (el saldo histórico está en app/libro.py).
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, case, or_
+
+from app import db
+from app.models import ContratoCompraVenta, Pago, Empleado, EstadoDeuda
+
+
+# (límite superior de días de atraso, etiqueta); el último tramo no tiene límite
+TRAMOS = ((7, '0-7'), (30, '8-30'), (60, '31-60'), (np.inf, '60+'))
+ETIQUETAS = [etiqueta for _, etiqueta in TRAMOS]
+LIQUIDADO = 'liquidado'
+
+# Probabilidad de incumplimiento por tramo y pérdida dado el incumplimiento
+# (se recupera parte con el equipo). Supuestos de negocio, ajustables aquí.
+PROBABILIDAD_INCUMPLIMIENTO = {'0-7': 0.02, '8-30': 0.10, '31-60': 0.35, '60+': 0.75}
+PERDIDA_DADO_INCUMPLIMIENTO = 0.6
+
+PERIODO_ROLL_DIAS = 30
+
+
+def _consulta_cartera(corte: datetime, inicio_periodo: datetime):
+    pagos = (
+        select(
+            Pago.contrato_id,
+            func.coalesce(
+                func.sum(case((Pago.fecha >= inicio_periodo, Pago.monto), else_=0)), 0
+            ).label('pagado_periodo')
+        )
+        .where(Pago.fecha < corte)
+        .group_by(Pago.contrato_id)
+        .subquery()
+    )
+    return (
+        select(
+            ContratoCompraVenta.id.label('contrato_id'),
+            Empleado.sucursal_id,
+            ContratoCompraVenta.plan_pago_id,
+            ContratoCompraVenta.estado_deuda,
+            ContratoCompraVenta.saldo_pendiente,
+            ContratoCompraVenta.pago_semanal,
+            ContratoCompraVenta.proximo_pago_fecha,
+            ContratoCompraVenta.fecha_creacion,
+            func.coalesce(pagos.c.pagado_periodo, 0).label('pagado_periodo')
+        )
+        .outerjoin(pagos, pagos.c.contrato_id == ContratoCompraVenta.id)
+        .outerjoin(Empleado, Empleado.id == ContratoCompraVenta.empleado_id)
+        # Liquidados solo si pagaron en el periodo: cuentan para el roll rate
+        .where(
+            ContratoCompraVenta.fecha_creacion < corte,
+            or_(
+                ContratoCompraVenta.estado_deuda != EstadoDeuda.LIQUIDADO,
+                pagos.c.pagado_periodo > 0
+            )
+        )
+    )
+
+
+def cargar_cartera(corte: datetime, periodo_dias: int = PERIODO_ROLL_DIAS) -> pd.DataFrame:
+    """Una fila por contrato, con columnas numéricas listas para vectorizar."""
+    resultado = db.session.execute(_consulta_cartera(corte, corte - timedelta(days=periodo_dias)))
+    df = pd.DataFrame(resultado.all(), columns=list(resultado.keys()))
+
+    for columna in ('saldo_pendiente', 'pago_semanal', 'pagado_periodo'):
+        df[columna] = pd.to_numeric(df[columna], errors='coerce').fillna(0.0).astype(np.float64)
+    for columna in ('proximo_pago_fecha', 'fecha_creacion'):
+        df[columna] = pd.to_datetime(df[columna], utc=True).dt.tz_localize(None)
+    df['estado_deuda'] = df['estado_deuda'].map(lambda e: getattr(e, 'value', e))
+    return df
+
+
+def _tramo(dias: np.ndarray) -> np.ndarray:
+    """Etiqueta de tramo para cada valor de días de atraso (≥ 0)."""
+    limites = np.array([limite for limite, _ in TRAMOS[:-1]])
+    return np.array(ETIQUETAS, dtype=object)[np.searchsorted(limites, dias, side='left')]
+
+
+def probabilidad_incumplimiento(dias: np.ndarray) -> np.ndarray:
+    """Probabilidad de incumplimiento según el tramo de cada valor de días de atraso."""
+    probabilidades = np.array([PROBABILIDAD_INCUMPLIMIENTO[t] for t in ETIQUETAS])
+    limites = np.array([limite for limite, _ in TRAMOS[:-1]])
+    return probabilidades[np.searchsorted(limites, dias, side='left')]
+
+
+def _dias_atraso(corte: datetime, proximo: pd.Series) -> np.ndarray:
+    dias = (np.datetime64(corte) - proximo.to_numpy(dtype='datetime64[ns]')) / np.timedelta64(1, 'D')
+    return np.clip(np.nan_to_num(np.floor(dias), nan=0.0), 0, None)
+
+
+def _resumen_por(df: pd.DataFrame, columna: str) -> list:
+    tabla = df.pivot_table(
+        index=columna, columns='tramo', values='saldo_pendiente',
+        aggfunc='sum', fill_value=0.0, observed=False, dropna=False
+    ).reindex(columns=ETIQUETAS, fill_value=0.0)
+    agregados = df.groupby(columna, dropna=False).agg(
+        contratos=('contrato_id', 'size'),
+        saldo=('saldo_pendiente', 'sum'),
+        perdida_esperada=('perdida_esperada', 'sum')
+    )
+    tabla = tabla.join(agregados)
+    filas = []
+    for clave, fila in tabla.iterrows():
+        filas.append({
+            columna: None if pd.isna(clave) else int(clave),
+            'contratos': int(fila['contratos']),
+            'saldo': round(float(fila['saldo']), 2),
+            'perdida_esperada': round(float(fila['perdida_esperada']), 2),
+            'saldo_por_tramo': {t: round(float(fila[t]), 2) for t in ETIQUETAS}
+        })
+    return filas
+
+
+def _roll_rates(df: pd.DataFrame, corte: datetime, periodo_dias: int) -> dict:
+    """
+    Matriz de transición entre tramos del inicio del periodo al corte.
+
+    El próximo pago al inicio del periodo se reconstruye restando las semanas
+    que cubren los pagos hechos dentro del periodo (monto / pago semanal).
+    """
+    inicio = corte - timedelta(days=periodo_dias)
+    previos = df[(df['fecha_creacion'] < inicio) & df['proximo_pago_fecha'].notna()]
+    if previos.empty:
+        return {'periodo_dias': periodo_dias, 'matriz': {}, 'avance': {}}
+
+    semanal = previos['pago_semanal'].to_numpy()
+    semanas = np.divide(
+        previos['pagado_periodo'].to_numpy(), semanal,
+        out=np.zeros(len(previos)), where=semanal > 0
+    ).astype(np.int64)
+    proximo_antes = previos['proximo_pago_fecha'] - pd.to_timedelta(semanas * 7, unit='D')
+
+    antes = pd.Series(_tramo(_dias_atraso(inicio, proximo_antes)), index=previos.index)
+    despues = previos['tramo'].astype(object)
+
+    matriz = pd.crosstab(antes, despues, normalize='index')
+    matriz = matriz.reindex(index=ETIQUETAS, columns=ETIQUETAS + [LIQUIDADO], fill_value=0.0)
+
+    # "Avance": proporción de cada tramo que pasó a un tramo peor
+    avance = {}
+    for i, origen in enumerate(ETIQUETAS[:-1]):
+        avance[origen] = round(float(matriz.loc[origen, ETIQUETAS[i + 1:]].sum()), 4)
+
+    return {
+        'periodo_dias': periodo_dias,
+        'contratos': int(len(previos)),
+        'matriz': {
+            origen: {destino: round(float(v), 4) for destino, v in fila.items()}
+            for origen, fila in matriz.iterrows()
+        },
+        'avance': avance
+    }
+
+
+def analizar_cartera(corte: datetime = None, periodo_dias: int = PERIODO_ROLL_DIAS) -> dict:
+    """
+    Tramos de antigüedad, roll rates y pérdida esperada por sucursal y plan.
+    `corte` es UTC sin zona horaria (ahora por defecto).
+    """
+    corte = corte or datetime.utcnow()
+    df = cargar_cartera(corte, periodo_dias)
+    if df.empty:
+        return {'fecha_corte': corte.isoformat(), 'contratos': 0, 'saldo_total': 0.0,
+                'antiguedad': [], 'roll_rates': {}, 'por_sucursal': [], 'por_plan': []}
+
+    liquidado = (df['estado_deuda'] == EstadoDeuda.LIQUIDADO.value).to_numpy()
+    df['dias_atraso'] = _dias_atraso(corte, df['proximo_pago_fecha'])
+    df['tramo'] = pd.Categorical(
+        np.where(liquidado, LIQUIDADO, _tramo(df['dias_atraso'].to_numpy())),
+        categories=ETIQUETAS + [LIQUIDADO]
+    )
+    probabilidad = df['tramo'].astype(object).map(PROBABILIDAD_INCUMPLIMIENTO).astype(np.float64).fillna(0.0)
+    df['perdida_esperada'] = df['saldo_pendiente'] * probabilidad * PERDIDA_DADO_INCUMPLIMIENTO
+
+    abiertos = df[~liquidado].copy()
+    abiertos['tramo'] = abiertos['tramo'].cat.remove_categories(LIQUIDADO)
+    saldo_total = float(abiertos['saldo_pendiente'].sum())
+
+    por_tramo = abiertos.groupby('tramo', observed=False).agg(
+        contratos=('contrato_id', 'size'),
+        saldo=('saldo_pendiente', 'sum'),
+        perdida_esperada=('perdida_esperada', 'sum'),
+        dias_promedio=('dias_atraso', 'mean')
+    )
+    antiguedad = [
+        {
+            'tramo': tramo,
+            'contratos': int(fila['contratos']),
+            'saldo': round(float(fila['saldo']), 2),
+            'porcentaje_saldo': round(float(fila['saldo']) / saldo_total, 4) if saldo_total else 0.0,
+            'perdida_esperada': round(float(fila['perdida_esperada']), 2),
+            'dias_promedio': round(float(np.nan_to_num(fila['dias_promedio'])), 1)
+        }
+        for tramo, fila in por_tramo.iterrows()
+    ]
+
+    return {
+        'fecha_corte': corte.isoformat(),
+        'contratos': int(len(abiertos)),
+        'saldo_total': round(saldo_total, 2),
+        'perdida_esperada': round(float(abiertos['perdida_esperada'].sum()), 2),
+        'antiguedad': antiguedad,
+        'roll_rates': _roll_rates(df, corte, periodo_dias),
+        'por_sucursal': _resumen_por(abiertos, 'sucursal_id'),
+        'por_plan': _resumen_por(abiertos, 'plan_pago_id')
+    }
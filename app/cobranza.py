@@ -0,0 +1,164 @@
+"""
+Lista de cobranza por sucursal: contratos que vencen hoy o ya están atrasados.
+
+La lista se ordena por días de atraso (día de cobro en hora de México, el
+más antiguo primero), luego por saldo pendiente de mayor a menor y por id.
+Filtro y orden salen del índice (sucursal_id, dia_cobro, saldo_pendiente
+DESC, id): `sucursal_id` y `dia_cobro` se guardan en el contrato (ver
+`_columnas_de_cobranza` en app/models.py) y `dia_cobro` es NULL para los
+liquidados. Cada página empieza en el día del cursor y lee a lo más las
+filas de ese día anteriores al cursor, sin ordenar nada en memoria. Solo se
+leen las columnas que necesita el cobrador, nunca `contrato_html`. El
+conteo por sucursal se guarda en memoria `TTL_CONTEO` segundos.
+
+`dia_cobro` y `sucursal_id` solo los mantiene ese evento del ORM; un
+`update()` de Core no lo dispara. Los de app/morosidad.py (cambian entre
+estados abiertos) y `migrar_columna` (solo `contrato_html`) no tocan las
+columnas de las que salen. Un UPDATE de Core que cambie
+`proximo_pago_fecha` o `empleado_id`, o que liquide contratos, debe
+recalcularlas en el mismo UPDATE; si no, el índice de la lista queda
+desactualizado.
+"""
+import threading
+import time
+from datetime import date, datetime, time as hora, timedelta, timezone
+
+from sqlalchemy import select, func, case, and_, or_
+
+from app import db
+from app.models import ContratoCompraVenta, CuotaContrato, Usuario, EstadoDeuda
+from app.cuotas import CUOTAS_ABIERTAS
+from app.fechas import ZONA_MX, fecha_mx
+
+
+TTL_CONTEO = 60
+ESTADOS_EN_COBRANZA = (EstadoDeuda.PENDIENTE, EstadoDeuda.AL_DIA, EstadoDeuda.ATRASADO)
+
+# (sucursal_id, día) → (vence, conteo)
+_conteos = {}
+_candado = threading.Lock()
+
+
+def limites_del_dia(ahora: datetime = None) -> tuple:
+    """
+    (inicio, fin) del día de hoy en hora de México, en UTC sin zona horaria
+    como se guarda `proximo_pago_fecha`.
+    """
+    hoy = (ahora or datetime.now(timezone.utc)).astimezone(ZONA_MX).date()
+    inicio = datetime.combine(hoy, hora.min, tzinfo=ZONA_MX)
+    fin = inicio + timedelta(days=1)
+    return tuple(d.astimezone(timezone.utc).replace(tzinfo=None) for d in (inicio, fin))
+
+
+def _en_cobranza(sucursal_id: int, hoy: date):
+    """Contratos abiertos de la sucursal con un pago vencido o que vence hoy."""
+    return and_(ContratoCompraVenta.sucursal_id == sucursal_id, ContratoCompraVenta.dia_cobro <= hoy)
+
+
+def contar(sucursal_id: int, ahora: datetime = None) -> dict:
+    """{'vencen_hoy', 'atrasados', 'total'} de la sucursal, desde el caché si no venció."""
+    inicio, fin = limites_del_dia(ahora)
+    clave = (sucursal_id, inicio)
+    with _candado:
+        guardado = _conteos.get(clave)
+        if guardado is not None and guardado[0] >= time.monotonic():
+            return guardado[1]
+
+    hoy = fecha_mx(inicio)
+    fila = db.session.execute(
+        select(
+            func.count(ContratoCompraVenta.id).label('total'),
+            func.coalesce(func.sum(case((ContratoCompraVenta.dia_cobro < hoy, 1), else_=0)), 0)
+            .label('atrasados')
+        ).where(_en_cobranza(sucursal_id, hoy))
+    ).one()
+    conteo = {'vencen_hoy': fila.total - fila.atrasados, 'atrasados': fila.atrasados, 'total': fila.total}
+
+    with _candado:
+        # Los conteos de días anteriores ya no se piden
+        for vieja in [c for c in _conteos if c[1] != inicio]:
+            del _conteos[vieja]
+        _conteos[clave] = (time.monotonic() + TTL_CONTEO, conteo)
+    return conteo
+
+
+def _vencido_por_contrato(ids, fin) -> dict:
+    """Suma de lo que falta por pagar de las cuotas abiertas vencidas hasta `fin`."""
+    filas = db.session.execute(
+        select(
+            CuotaContrato.contrato_id,
+            func.sum(CuotaContrato.monto - CuotaContrato.monto_pagado)
+        )
+        .where(
+            CuotaContrato.contrato_id.in_(ids),
+            CuotaContrato.estado.in_(CUOTAS_ABIERTAS),
+            CuotaContrato.fecha_vencimiento < fin
+        )
+        .group_by(CuotaContrato.contrato_id)
+    )
+    return dict(filas.all())
+
+
+def lista_de_cobranza(sucursal_id: int, limite: int, despues_de: list = None, ahora: datetime = None) -> tuple:
+    """
+    Una página de la lista de cobranza de la sucursal.
+
+    `despues_de` son los valores (dia_cobro, saldo_pendiente, id) de la
+    última fila de la página anterior.
+
+    Returns:
+        tuple: (filas, valores de la última fila si hay más páginas, o None).
+    """
+    inicio, fin = limites_del_dia(ahora)
+    hoy = fecha_mx(inicio)
+    c = ContratoCompraVenta
+    consulta = (
+        select(
+            c.id, c.cliente_id, c.empleado_id, c.estado_deuda, c.proximo_pago_fecha, c.dia_cobro,
+            c.pago_semanal, c.saldo_pendiente, c.num_pagos_semanales,
+            Usuario.primer_nombre, Usuario.apellido_paterno, Usuario.numero_telefonico
+        )
+        .join(Usuario, Usuario.id == c.cliente_id)
+        .where(_en_cobranza(sucursal_id, hoy))
+    )
+    if despues_de:
+        dia, saldo, ultimo_id = despues_de
+        consulta = consulta.where(
+            # Cota de rango para el índice; el OR solo descarta las filas del mismo día ya enviadas
+            c.dia_cobro >= dia,
+            or_(
+                c.dia_cobro > dia,
+                c.saldo_pendiente < saldo,
+                and_(c.saldo_pendiente == saldo, c.id > ultimo_id)
+            )
+        )
+
+    filas = db.session.execute(
+        consulta.order_by(c.dia_cobro, c.saldo_pendiente.desc(), c.id).limit(limite + 1)
+    ).all()
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+
+    vencido = _vencido_por_contrato([f.id for f in filas], fin) if filas else {}
+    resultado = [
+        {
+            'contrato_id': f.id,
+            'cliente_id': f.cliente_id,
+            'cliente': f"{f.primer_nombre} {f.apellido_paterno}",
+            'numero_telefonico': f.numero_telefonico,
+            'empleado_id': f.empleado_id,
+            'estado_deuda': f.estado_deuda.value,
+            'proximo_pago_fecha': f.proximo_pago_fecha.isoformat(),
+            'vence_hoy': f.dia_cobro == hoy,
+            'dias_atraso': (hoy - f.dia_cobro).days,
+            'pago_semanal': float(f.pago_semanal or 0),
+            'monto_vencido': float(vencido.get(f.id, 0)),
+            'saldo_pendiente': float(f.saldo_pendiente),
+            'pagos_restantes': f.num_pagos_semanales
+        }
+        for f in filas
+    ]
+    ultima = filas[-1] if hay_mas else None
+    return resultado, (
+        [ultima.dia_cobro.isoformat(), str(ultima.saldo_pendiente), ultima.id] if ultima else None
+    )
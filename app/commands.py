@@ -0,0 +1,152 @@
+import click
+from flask import Flask
+
+
+def register_commands(app: Flask) -> None:
+    """Registra los comandos `flask <comando>` de tareas programadas."""
+
+    @app.cli.command('actualizar-morosidad')
+    @click.option('--lote', default=1000, show_default=True, help='Contratos por UPDATE.')
+    def actualizar_morosidad_cmd(lote):
+        """Marca contratos vencidos como ATRASADO (pensado para cron cada pocos minutos)."""
+        from app.morosidad import actualizar_morosidad
+
+        resumen = actualizar_morosidad(lote=lote)
+        click.echo(
+            f"atrasados={resumen['atrasados']} regularizados={resumen['regularizados']} "
+            f"lotes={resumen['lotes']} segundos={resumen['segundos']}"
+        )
+
+    @app.cli.command('devengar-recargos')
+    @click.option('--fecha', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Fecha de devengo (por defecto hoy, hora de México).')
+    @click.option('--lote', default=1000, show_default=True, help='Contratos por lote.')
+    def devengar_recargos_cmd(fecha, lote):
+        """Genera los recargos de semanas vencidas (pensado para cron diario)."""
+        from app.recargos import devengar_recargos
+
+        resumen = devengar_recargos(fecha.date() if fecha else None, lote=lote)
+        click.echo(
+            f"fecha={resumen['fecha']} contratos={resumen['contratos']} recargos={resumen['recargos']} "
+            f"monto={resumen['monto_total']} lotes={resumen['lotes']} segundos={resumen['segundos']} "
+            f"filas_por_segundo={resumen['filas_por_segundo']}"
+        )
+
+    @app.cli.command('reconstruir-puntualidad')
+    @click.option('--lote', default=200, show_default=True, help='Clientes por transacción.')
+    def reconstruir_puntualidad_cmd(lote):
+        """Recalcula la puntualidad de los clientes desde el historial de pagos (una vez, tras la migración)."""
+        from app.puntualidad import reconstruir_puntualidad
+
+        resumen = reconstruir_puntualidad(lote=lote)
+        click.echo(f"clientes={resumen['clientes']} pagos={resumen['pagos']}")
+
+    @app.cli.command('abrir-libro')
+    def abrir_libro_cmd():
+        """Asiento de apertura para los contratos que no tienen asiento de contrato ni de apertura en el libro."""
+        from app.libro import abrir_libro
+
+        click.echo(f"contratos={abrir_libro()}")
+
+    @app.cli.command('corte-saldos')
+    @click.option('--fecha', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Día del corte, a las 00:00 hora de México (por defecto el primero del mes).')
+    def corte_saldos_cmd(fecha):
+        """Guarda el saldo de cada contrato al corte (pensado para cron mensual)."""
+        from datetime import datetime
+
+        from app.fechas import ZONA_MX
+        from app.libro import tomar_corte, inicio_del_dia
+
+        dia = fecha.date() if fecha else datetime.now(ZONA_MX).date().replace(day=1)
+        resumen = tomar_corte(inicio_del_dia(dia))
+        click.echo(
+            f"fecha_corte={resumen['fecha_corte']} contratos={resumen['contratos']} nuevo={resumen['nuevo']}"
+        )
+
+    @app.cli.command('migrar-contratos-html')
+    @click.option('--lote', default=200, show_default=True, help='Contratos por transacción.')
+    def migrar_contratos_html_cmd(lote):
+        """Pasa el contrato_html guardado en las tablas al almacén por hash y vacía la columna."""
+        from app.almacen_contratos import migrar_columna
+        from app.models import ContratoConsultaBuro, ContratoCompraVenta
+
+        for modelo in (ContratoConsultaBuro, ContratoCompraVenta):
+            resumen = migrar_columna(modelo, lote=lote)
+            click.echo(
+                f"{modelo.__tablename__}: migrados={resumen['migrados']} blobs_nuevos={resumen['nuevos']} "
+                f"hash_no_coincide={resumen['no_coinciden']}"
+            )
+
+    @app.cli.command('purgar-contratos-html')
+    @click.option('--horas', default=1.0, show_default=True, help='Antigüedad mínima de los blobs a borrar.')
+    def purgar_contratos_html_cmd(horas):
+        """Borra del almacén los HTML que ya no referencia ningún contrato (p. ej. tras volver a firmar)."""
+        from app import db
+        from app.almacen_contratos import purgar_huerfanos
+        from app.models import ContratoConsultaBuro, ContratoCompraVenta
+
+        en_uso = {
+            h for modelo in (ContratoConsultaBuro, ContratoCompraVenta)
+            for h, in db.session.query(modelo.hash_contrato).filter(modelo.hash_contrato.isnot(None))
+        }
+        click.echo(f"borrados={purgar_huerfanos(en_uso, antiguedad=horas * 3600)}")
+
+    @app.cli.command('reindexar-contratos')
+    @click.option('--lote', default=200, show_default=True, help='Documentos por transacción.')
+    def reindexar_contratos_cmd(lote):
+        """Reconstruye el índice de búsqueda con los archivos HTML y los contratos firmados."""
+        from app.indice_contratos import reconstruir
+
+        resumen = reconstruir(lote=lote)
+        click.echo(
+            f"archivos={resumen['archivos']} contratos={resumen['contratos']} "
+            f"terminos={resumen['terminos']} ignorados={resumen['ignorados']}"
+        )
+
+    @app.cli.command('importar-pagos')
+    @click.argument('archivo', type=click.File('rb'))
+    @click.option('--empleado-id', type=int, required=True, help='Empleado que registra los pagos.')
+    @click.option('--sucursal-id', type=int, default=None, help='Sucursal a la que se abonan.')
+    @click.option('--formato', type=click.Choice(['csv', 'ndjson']), default='csv', show_default=True)
+    @click.option('--lote', default=500, show_default=True, help='Filas por transacción.')
+    def importar_pagos_cmd(archivo, empleado_id, sucursal_id, formato, lote):
+        """Importa pagos desde un CSV/NDJSON; imprime los rechazos como NDJSON."""
+        import json
+
+        from app.importacion_pagos import leer_filas, importar_pagos
+
+        for evento in importar_pagos(leer_filas(archivo, formato), empleado_id, sucursal_id, lote):
+            click.echo(json.dumps(evento))
+
+    @app.cli.command('purgar-idempotencia')
+    @click.option('--horas', default=24, show_default=True, help='Antigüedad mínima de las llaves a borrar.')
+    def purgar_idempotencia_cmd(horas):
+        """Borra las llaves de idempotencia vencidas (pensado para cron cada hora)."""
+        from datetime import timedelta
+
+        from app.idempotencia import purgar_vencidas
+
+        click.echo(f"borradas={purgar_vencidas(timedelta(hours=horas))}")
+
+    @app.cli.command('despachar-outbox')
+    @click.option('--lote', default=100, show_default=True, help='Eventos por transacción.')
+    @click.option('--intervalo', default=5.0, show_default=True, help='Segundos de espera cuando no hay eventos.')
+    @click.option('--una-vez', is_flag=True, help='Procesa lo disponible y termina (para cron).')
+    def despachar_outbox_cmd(lote, intervalo, una_vez):
+        """Proceso que drena el outbox de eventos de pago."""
+        import time
+
+        from app.outbox import despachar
+
+        while True:
+            resumen = despachar(lote=lote)
+            if resumen['procesados']:
+                click.echo(
+                    f"enviados={resumen['enviados']} reintentos={resumen['reintentos']} "
+                    f"fallidos={resumen['fallidos']}"
+                )
+            if resumen['procesados'] < lote:
+                if una_vez:
+                    break
+                time.sleep(intervalo)
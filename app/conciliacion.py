@@ -0,0 +1,268 @@
+"""
+Conciliación de estados de cuenta de transferencias contra contratos abiertos.
+
+Los contratos abiertos se cargan a dos índices en memoria: por código de
+cliente (MP-XX0000) y por monto esperado en centavos (el saldo y, según el
+contrato, la suma de sus primeras cuotas abiertas o los múltiplos del pago
+semanal y el último pago). Cada línea del estado de cuenta se resuelve con
+búsquedas O(1) en esos índices, de modo que un archivo de decenas de miles de
+líneas se concilia en una sola pasada. Si un monto se acepta o no lo deciden
+las mismas reglas del motor de pagos (`validar_con_cuotas` y
+`validar_sin_cuotas`), para no conciliar un pago que luego se rechace al
+aplicarlo.
+"""
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import select, func
+
+from app import db
+from app.models import ContratoCompraVenta, Usuario, EstadoDeuda, CuotaContrato
+from app.cuotas import CUOTAS_ABIERTAS
+from app.dinero import a_centavos, a_float
+from app.motor_pagos import ErrorPago, validar_con_cuotas, validar_sin_cuotas
+
+
+PATRON_CODIGO = re.compile(r'\bMP-?([A-Z]{2}\d{4})\b', re.IGNORECASE)
+
+# Pagos de hasta N semanas juntas se buscan por monto aunque no traigan código
+MAX_SEMANAS_POR_MONTO = 4
+
+# Diferencia máxima entre la fecha de la transferencia y el próximo pago
+DIAS_TOLERANCIA = 7
+
+
+def extraer_codigo(referencia) -> Optional[str]:
+    """Código de cliente normalizado (MP-AB1234) contenido en la referencia, si hay."""
+    coincidencia = PATRON_CODIGO.search(referencia or '')
+    return f"MP-{coincidencia.group(1).upper()}" if coincidencia else None
+
+
+def _leer_fecha(valor) -> Optional[date]:
+    if not valor:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return datetime.fromisoformat(str(valor).strip()).date()
+
+
+class _Candidato:
+    __slots__ = (
+        'contrato_id', 'codigo', 'pago_semanal', 'ultimo_pago', 'saldo', 'proximo', 'primeras', 'en_cuotas'
+    )
+
+    def __init__(self, contrato_id, codigo, pago_semanal, ultimo_pago, saldo, proximo, primeras=(), en_cuotas=0):
+        self.contrato_id = contrato_id
+        self.codigo = codigo
+        self.pago_semanal = a_centavos(pago_semanal)
+        self.ultimo_pago = a_centavos(ultimo_pago)
+        self.saldo = a_centavos(saldo)
+        self.proximo = proximo.date() if proximo else None
+        # Lo que falta de las primeras cuotas abiertas y de todas ellas, en centavos
+        self.primeras = list(primeras)
+        self.en_cuotas = en_cuotas
+
+    def acepta_monto(self, monto: int) -> bool:
+        """Si el motor de pagos aceptaría `monto` para este contrato."""
+        try:
+            if self.primeras:
+                validar_con_cuotas(monto, self.saldo, self.primeras[0], self.en_cuotas)
+            else:
+                validar_sin_cuotas(monto, self.saldo, self.pago_semanal, self.ultimo_pago)
+        except ErrorPago:
+            return False
+        return True
+
+    def montos_esperados(self) -> set:
+        """Montos con que se busca el contrato cuando la transferencia no trae código."""
+        montos = {self.saldo}
+        if self.primeras:
+            acumulado = 0
+            for restante in self.primeras:
+                acumulado += restante
+                montos.add(acumulado)
+        else:
+            montos.add(self.ultimo_pago)
+            if self.pago_semanal > 0:
+                montos.update(
+                    self.pago_semanal * k for k in range(1, MAX_SEMANAS_POR_MONTO + 1)
+                    if self.pago_semanal * k <= self.saldo
+                )
+        return {monto for monto in montos if monto > 0 and self.acepta_monto(monto)}
+
+    def dias_a(self, fecha: Optional[date]) -> Optional[int]:
+        if fecha is None or self.proximo is None:
+            return None
+        return abs((self.proximo - fecha).days)
+
+
+class IndiceContratos:
+    """Índices hash de contratos abiertos por código de cliente y por monto esperado."""
+
+    def __init__(self, filas, cuotas=None):
+        """
+        `filas`: (contrato_id, codigo, pago_semanal, ultimo_pago, saldo,
+        proximo) de cada contrato. `cuotas`: contrato_id → (lo que falta de
+        sus primeras cuotas abiertas, lo que falta de todas) en centavos; los
+        contratos que no aparecen se validan como contratos sin cuotas.
+        """
+        cuotas = cuotas or {}
+        self.por_codigo = defaultdict(list)
+        self.por_monto = defaultdict(list)
+        self.total = 0
+
+        for fila in filas:
+            candidato = _Candidato(*fila, *cuotas.get(fila[0], ()))
+            self.total += 1
+            self.por_codigo[candidato.codigo].append(candidato)
+            for monto in candidato.montos_esperados():
+                self.por_monto[monto].append(candidato)
+
+    @staticmethod
+    def _cuotas_abiertas() -> dict:
+        """
+        Primeras MAX_SEMANAS_POR_MONTO cuotas abiertas de cada contrato no
+        liquidado y lo que falta de todas ellas, en una sola consulta.
+        """
+        restante = CuotaContrato.monto - CuotaContrato.monto_pagado
+        abiertas = (
+            select(
+                CuotaContrato.contrato_id,
+                restante.label('restante'),
+                func.row_number().over(
+                    partition_by=CuotaContrato.contrato_id, order_by=CuotaContrato.numero
+                ).label('orden'),
+                func.sum(restante).over(partition_by=CuotaContrato.contrato_id).label('en_cuotas')
+            )
+            .join(ContratoCompraVenta, ContratoCompraVenta.id == CuotaContrato.contrato_id)
+            .where(
+                CuotaContrato.estado.in_(CUOTAS_ABIERTAS),
+                ContratoCompraVenta.estado_deuda != EstadoDeuda.LIQUIDADO
+            )
+            .subquery()
+        )
+        cuotas = {}
+        for contrato_id, restante, en_cuotas in db.session.execute(
+            select(abiertas.c.contrato_id, abiertas.c.restante, abiertas.c.en_cuotas)
+            .where(abiertas.c.orden <= MAX_SEMANAS_POR_MONTO)
+            .order_by(abiertas.c.contrato_id, abiertas.c.orden)
+        ):
+            primeras, _ = cuotas.setdefault(contrato_id, ([], a_centavos(en_cuotas)))
+            primeras.append(a_centavos(restante))
+        return cuotas
+
+    @classmethod
+    def desde_bd(cls):
+        """Carga los contratos no liquidados y sus cuotas abiertas con dos consultas."""
+        cuotas = cls._cuotas_abiertas()
+        consulta = (
+            select(
+                ContratoCompraVenta.id,
+                Usuario.codigo,
+                ContratoCompraVenta.pago_semanal,
+                ContratoCompraVenta.ultimo_pago_semanal,
+                ContratoCompraVenta.saldo_pendiente,
+                ContratoCompraVenta.proximo_pago_fecha
+            )
+            .join(Usuario, Usuario.id == ContratoCompraVenta.cliente_id)
+            .where(ContratoCompraVenta.estado_deuda != EstadoDeuda.LIQUIDADO)
+            .execution_options(yield_per=2000)
+        )
+        return cls(db.session.execute(consulta), cuotas)
+
+
+def _por_fecha(candidatos: list, fecha: Optional[date]) -> list:
+    """Candidatos cuyo próximo pago cae dentro de la tolerancia, el más cercano primero."""
+    if fecha is None:
+        return candidatos
+    cercanos = sorted(
+        ((dias, c) for c in candidatos
+         if (dias := c.dias_a(fecha)) is not None and dias <= DIAS_TOLERANCIA),
+        key=lambda par: par[0]
+    )
+    if len(cercanos) > 1 and cercanos[0][0] < cercanos[1][0]:
+        return [cercanos[0][1]]
+    return [c for _, c in cercanos]
+
+
+def conciliar(filas, indice: IndiceContratos) -> dict:
+    """
+    Concilia `filas` (iterable de (linea, dict) con referencia, monto y fecha)
+    contra `indice`.
+
+    Returns:
+        dict: listas 'conciliados', 'ambiguos' y 'no_conciliados'. Cada
+        conciliado trae contrato_id y el criterio usado; cada ambiguo, los
+        contrato_id candidatos.
+    """
+    resultado = {'conciliados': [], 'ambiguos': [], 'no_conciliados': []}
+    # Un contrato conciliado solo por monto no se vuelve a usar para otra línea sin código
+    usados_por_monto = set()
+
+    for linea, fila in filas:
+        fila = fila or {}
+        entrada = {'linea': linea, 'referencia': fila.get('referencia'), 'monto': fila.get('monto')}
+        try:
+            monto = a_centavos(fila.get('monto'))
+            fecha = _leer_fecha(fila.get('fecha'))
+        except (TypeError, ValueError, ArithmeticError):
+            resultado['no_conciliados'].append({**entrada, 'motivo': 'monto o fecha inválidos'})
+            continue
+        if monto <= 0:
+            resultado['no_conciliados'].append({**entrada, 'motivo': 'monto inválido'})
+            continue
+
+        codigo = extraer_codigo(entrada['referencia'])
+        if codigo:
+            del_cliente = indice.por_codigo.get(codigo)
+            if not del_cliente:
+                resultado['no_conciliados'].append({**entrada, 'motivo': f"sin contratos abiertos para {codigo}"})
+                continue
+            candidatos = [c for c in del_cliente if c.acepta_monto(monto)]
+            if len(candidatos) > 1:
+                candidatos = _por_fecha(candidatos, fecha) or candidatos
+            criterio = 'codigo'
+            if not candidatos:
+                resultado['no_conciliados'].append(
+                    {**entrada, 'motivo': 'el monto no corresponde a ningún contrato del cliente'}
+                )
+                continue
+        else:
+            candidatos = _por_fecha(
+                [c for c in indice.por_monto.get(monto, []) if c.contrato_id not in usados_por_monto],
+                fecha
+            )
+            criterio = 'monto_fecha'
+            if not candidatos:
+                resultado['no_conciliados'].append({**entrada, 'motivo': 'sin código y sin contrato con ese monto'})
+                continue
+
+        if len(candidatos) > 1:
+            resultado['ambiguos'].append({**entrada, 'candidatos': [c.contrato_id for c in candidatos]})
+            continue
+
+        contrato_id = candidatos[0].contrato_id
+        if criterio == 'monto_fecha':
+            usados_por_monto.add(contrato_id)
+        resultado['conciliados'].append({
+            **entrada,
+            'monto': a_float(monto),
+            'contrato_id': contrato_id,
+            'criterio': criterio
+        })
+
+    return resultado
+
+
+def filas_para_aplicar(conciliados: list):
+    """Convierte los conciliados en filas para `importacion_pagos.importar_pagos`."""
+    for conciliado in conciliados:
+        yield conciliado['linea'], {
+            'contrato_id': conciliado['contrato_id'],
+            'monto': conciliado['monto'],
+            'metodo': 'TRANSFERENCIA'
+        }
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import insert, select
+
+from app import db
+from app.dinero import a_centavos, a_decimal, aplicar_pago
+from app.models import CuotaContrato, EstadoCuota
+
+
+CUOTAS_ABIERTAS = (EstadoCuota.PENDIENTE, EstadoCuota.PARCIAL)
+
+
+def generar_cuotas(contrato_id: int, montos_centavos, primer_vencimiento: datetime) -> None:
+    """
+    Inserta el calendario de cuotas del contrato con un solo INSERT masivo.
+    `montos_centavos` es la secuencia de cuotas en centavos.
+    La cuota `i` vence `i - 1` semanas después de `primer_vencimiento`.
+    No hace commit.
+    """
+    if len(montos_centavos) == 0:
+        return
+    db.session.execute(
+        insert(CuotaContrato),
+        [
+            {
+                'contrato_id': contrato_id,
+                'numero': numero,
+                'fecha_vencimiento': primer_vencimiento + timedelta(weeks=numero - 1),
+                'monto': a_decimal(monto),
+                'monto_pagado': a_decimal(0),
+                'estado': EstadoCuota.PENDIENTE
+            }
+            for numero, monto in enumerate(montos_centavos, start=1)
+        ]
+    )
+
+
+def cuotas_abiertas(contrato_id: int) -> list:
+    """Cuotas pendientes o parciales del contrato, de la más antigua a la más nueva."""
+    return db.session.execute(
+        select(CuotaContrato)
+        .where(
+            CuotaContrato.contrato_id == contrato_id,
+            CuotaContrato.estado.in_(CUOTAS_ABIERTAS)
+        )
+        .order_by(CuotaContrato.numero)
+    ).scalars().all()
+
+
+def restantes_centavos(cuotas: list) -> np.ndarray:
+    """Saldo por cubrir de cada cuota, en centavos."""
+    return np.array(
+        [a_centavos(c.monto) - a_centavos(c.monto_pagado or 0) for c in cuotas],
+        dtype=np.int64
+    )
+
+
+def aplicar_a_cuotas(cuotas: list, monto: int, liquidar: bool = False) -> int:
+    """
+    Reparte `monto` (centavos) sobre `cuotas` (abiertas y en orden) empezando
+    por la más antigua. Si `liquidar` es True, todas quedan pagadas aunque
+    sobre saldo de cuotas (pago del saldo total del contrato); si no, un
+    monto mayor que lo que falta de las cuotas lanza ValueError sin modificar
+    nada, para que el calendario y el saldo del contrato no se separen.
+
+    Returns:
+        int: número de cuotas que quedaron pagadas con este abono.
+    """
+    restantes = restantes_centavos(cuotas)
+    abonos, sobrante = aplicar_pago(restantes, monto)
+    if sobrante and not liquidar:
+        raise ValueError(f"El abono excede las cuotas abiertas por {sobrante} centavos")
+
+    pagadas = 0
+    for cuota, restante, abono in zip(cuotas, restantes.tolist(), abonos.tolist()):
+        if abono:
+            cuota.monto_pagado = a_decimal(a_centavos(cuota.monto_pagado or 0) + abono)
+        if liquidar or abono >= restante:
+            cuota.estado = EstadoCuota.PAGADA
+            pagadas += 1
+        elif abono:
+            cuota.estado = EstadoCuota.PARCIAL
+    return pagadas
@@ -0,0 +1,123 @@
+"""
+Aritmética de dinero en centavos enteros.
+
+Todos los cálculos de cotización y aplicación de pagos trabajan con `int`
+(centavos) o arreglos `numpy.int64`; solo se convierte a `Decimal` al
+escribir en columnas Numeric y a `float` al responder JSON.
+"""
+import math
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+
+CENTAVOS_POR_PESO = 100
+# Mayor monto que cabe en una columna Numeric(10, 2)
+MAX_CENTAVOS = 10 ** 10 - 1
+_UN_CENTAVO = Decimal('0.01')
+
+
+class MontoInvalido(ArithmeticError):
+    """Monto no finito (NaN, infinito) o fuera del rango de las columnas de dinero."""
+
+
+def _en_rango(centavos: int) -> int:
+    if abs(centavos) > MAX_CENTAVOS:
+        raise MontoInvalido(f"Monto fuera de rango: {a_float(centavos)}")
+    return centavos
+
+
+def a_centavos(valor) -> int:
+    """
+    Convierte int, float, Decimal o str a centavos (redondeo al centavo más
+    cercano, mitades hacia arriba en valor absoluto).
+
+    Lanza MontoInvalido (un ArithmeticError) si el valor no es finito o no
+    cabe en Numeric(10, 2), y TypeError si no es un monto.
+    """
+    if valor is None:
+        return 0
+    if isinstance(valor, bool):
+        raise TypeError('Un booleano no es un monto')
+    if isinstance(valor, int):
+        return _en_rango(valor * CENTAVOS_POR_PESO)
+    if isinstance(valor, float):
+        if not math.isfinite(valor):
+            raise MontoInvalido(f"Monto no finito: {valor!r}")
+        # Montos con 2 decimales quedan a ±1e-9 de un entero: redondear es exacto
+        centavos = valor * CENTAVOS_POR_PESO
+        return _en_rango(int(centavos + 0.5) if centavos >= 0 else -int(-centavos + 0.5))
+    if isinstance(valor, Decimal):
+        if not valor.is_finite():
+            raise MontoInvalido(f"Monto no finito: {valor!r}")
+        # Antes de escalar: un exponente enorme ('1e400') no llega a convertirse en entero
+        if valor.adjusted() >= 10:
+            raise MontoInvalido(f"Monto fuera de rango: {valor}")
+        return _en_rango(int(valor.scaleb(2).to_integral_value(rounding=ROUND_HALF_UP)))
+    if isinstance(valor, str):
+        return a_centavos(Decimal(valor.strip()))
+    raise TypeError(f"Monto no soportado: {valor!r}")
+
+
+def a_centavos_arreglo(valores) -> np.ndarray:
+    """Versión vectorizada de `a_centavos` para secuencias de montos numéricos."""
+    return np.rint(np.asarray(valores, dtype=np.float64) * CENTAVOS_POR_PESO).astype(np.int64)
+
+
+def a_decimal(centavos: int) -> Decimal:
+    """Centavos → Decimal con 2 decimales, para columnas Numeric(10, 2)."""
+    return Decimal(int(centavos)).scaleb(-2).quantize(_UN_CENTAVO)
+
+
+def a_float(centavos: int) -> float:
+    """Centavos → float, solo para respuestas JSON."""
+    return int(centavos) / CENTAVOS_POR_PESO
+
+
+def pesos_enteros(centavos: int) -> int:
+    """Parte entera en pesos (trunca hacia cero)."""
+    return int(centavos / CENTAVOS_POR_PESO)
+
+
+def aplicar_tasa(centavos: int, tasa_centesimas: int, unidad: int = CENTAVOS_POR_PESO) -> int:
+    """
+    Aplica una tasa de interés expresada en centésimas de punto porcentual
+    (10 % → 1000) y redondea, mitades hacia arriba, a múltiplos de `unidad`.
+    """
+    divisor = 10000 * unidad
+    bruto = centavos * (10000 + tasa_centesimas)
+    return ((bruto + divisor // 2) // divisor) * unidad
+
+
+def dividir_en_cuotas(total: int, n: int, unidad: int = CENTAVOS_POR_PESO) -> np.ndarray:
+    """
+    Divide `total` centavos en `n` cuotas iguales múltiplo de `unidad`; la
+    diferencia se suma a la última para que la suma sea exacta.
+    """
+    if n <= 0:
+        raise ValueError('El plan debe tener al menos 1 semana.')
+    base = (total // unidad // n) * unidad
+    cuotas = np.full(n, base, dtype=np.int64)
+    cuotas[-1] += total - base * n
+    return cuotas
+
+
+def aplicar_pago(restantes: np.ndarray, monto: int) -> tuple[np.ndarray, int]:
+    """
+    Reparte `monto` sobre `restantes` (saldo de cada cuota, de la más antigua
+    a la más nueva) llenando cada cuota antes de pasar a la siguiente.
+
+    Returns:
+        tuple: (abono por cuota, sobrante que no cupo en ninguna cuota).
+    """
+    restantes = np.asarray(restantes, dtype=np.int64)
+    if restantes.size == 0:
+        return restantes, int(monto)
+    cubierto = np.minimum(np.cumsum(restantes), monto)
+    abonos = np.diff(cubierto, prepend=0)
+    return abonos, int(monto - cubierto[-1])
+
+
+def residuo(monto: int, unidad: int) -> int:
+    """Lo que sobra de `monto` después de cubrir múltiplos completos de `unidad`."""
+    return monto % unidad if unidad else monto
@@ -0,0 +1,97 @@
+"""
+Entrega HTTP de los contratos firmados.
+
+La ETag es el `hash_contrato` (SHA-256 del HTML firmado), así que es fuerte
+y no hace falta leer ni renderizar el contrato para contestar 304 a un
+`If-None-Match` que coincide. El cuerpo sale del blob gzip del almacén por
+hash tal cual (`Content-Encoding: gzip`); los contratos con plantilla se
+renderizan una vez y se guardan como blob para las siguientes descargas. El
+archivo se envía con `send_file`, que usa el sendfile del servidor WSGI o
+`X-Sendfile` con `USE_X_SENDFILE`; con `CONTRATOS_X_ACCEL_PREFIX` solo se
+contesta la cabecera `X-Accel-Redirect` y nginx sirve el archivo.
+"""
+import os
+
+from flask import Response, current_app, jsonify, request, send_file, send_from_directory
+
+from app import db
+from app.almacen_contratos import directorio, existe, guardar, hash_de, hash_valido, html_de, leer, ruta_de
+from app.indice_contratos import MODELOS, archivo_de, carpeta
+from app.plantillas_contratos import PlantillaAlterada
+
+
+def _cabeceras(respuesta: Response, etag: str) -> Response:
+    respuesta.set_etag(etag)
+    # El mismo id puede volver a firmarse: el cliente guarda la copia pero revalida con la ETag
+    respuesta.cache_control.private = True
+    respuesta.cache_control.no_cache = True
+    respuesta.vary.add('Accept-Encoding')
+    return respuesta
+
+
+def _no_modificado(etag: str):
+    if request.if_none_match.contains_weak(etag):
+        return _cabeceras(Response(status=304), etag)
+    return None
+
+
+def _html(html: str, etag: str) -> Response:
+    return _no_modificado(etag) or _cabeceras(Response(html, mimetype='text/html'), etag)
+
+
+def _blob(hash_hex: str) -> Response:
+    prefijo = current_app.config.get('CONTRATOS_X_ACCEL_PREFIX')
+    if prefijo:
+        respuesta = Response(mimetype='text/html')
+        relativa = os.path.relpath(ruta_de(hash_hex), directorio()).replace(os.sep, '/')
+        respuesta.headers['X-Accel-Redirect'] = f"{prefijo.rstrip('/')}/{relativa}"
+    else:
+        respuesta = send_file(ruta_de(hash_hex), mimetype='text/html', conditional=False, etag=False)
+    respuesta.headers['Content-Encoding'] = 'gzip'
+    return _cabeceras(respuesta, f"{hash_hex}-gzip")
+
+
+def respuesta_de(contrato):
+    """
+    Respuesta con el HTML firmado del contrato, 304 si el cliente ya lo
+    tiene, 500 si su plantilla ya no reproduce el hash firmado, o None si no
+    tiene documento.
+    """
+    try:
+        return _respuesta_de(contrato)
+    except PlantillaAlterada as e:
+        current_app.logger.error('Contrato %s sin HTML: %s', contrato.id, e)
+        respuesta = jsonify({'error': 'El contrato firmado no se pudo reproducir; avisa a soporte'})
+        respuesta.status_code = 500
+        return respuesta
+
+
+def _respuesta_de(contrato):
+    hash_hex = contrato.hash_contrato
+    if not hash_valido(hash_hex) or contrato.contrato_html is not None:
+        # HTML en la columna (anterior al almacén): puede no coincidir con el hash guardado
+        html = html_de(contrato)
+        return None if html is None else _html(html, hash_de(html))
+
+    # La representación gzip lleva su propia ETag fuerte
+    con_gzip = request.accept_encodings['gzip'] > 0
+    no_modificado = _no_modificado(f"{hash_hex}-gzip" if con_gzip else hash_hex)
+    if no_modificado:
+        return no_modificado
+
+    if not existe(hash_hex):
+        # Con plantilla: se renderiza (verificando el hash) y queda como blob
+        html = html_de(contrato)
+        if html is None:
+            return None
+        guardar(html)
+    return _blob(hash_hex) if con_gzip else _html(leer(hash_hex), hash_hex)
+
+
+def respuesta_de_documento(tipo: str, contrato_id: int):
+    """Respuesta para un resultado del índice: el contrato firmado o su archivo en la carpeta."""
+    contrato = db.session.get(MODELOS[tipo], contrato_id)
+    respuesta = respuesta_de(contrato) if contrato else None
+    if respuesta is None and os.path.exists(os.path.join(carpeta(), archivo_de(tipo, contrato_id))):
+        respuesta = send_from_directory(carpeta(), archivo_de(tipo, contrato_id))
+    return respuesta
@@ -0,0 +1,10 @@
+"""Excepciones de reglas de negocio que las rutas convierten en respuestas HTTP."""
+
+
+class ErrorDeNegocio(Exception):
+    """Regla de negocio que no se cumple; lleva el mensaje y el código HTTP a devolver."""
+
+    def __init__(self, mensaje: str, status: int = 400):
+        super().__init__(mensaje)
+        self.mensaje = mensaje
+        self.status = status
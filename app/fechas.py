@@ -0,0 +1,24 @@
+"""
+Zona horaria del negocio.
+
+Las fechas de contratos, cuotas y libro se guardan en UTC sin zona horaria;
+los días (vencimientos, atrasos, cortes, recargos) se cuentan en hora de
+México.
+"""
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+
+ZONA_MX = ZoneInfo('America/Mexico_City')
+
+
+def fecha_mx(utc: datetime):
+    """Día en hora de México de una fecha en UTC sin zona horaria."""
+    return utc.replace(tzinfo=timezone.utc).astimezone(ZONA_MX).date()
+
+
+def a_utc(fecha: datetime) -> datetime:
+    """Fecha con o sin zona → UTC sin zona horaria, como se guardan las fechas."""
+    if fecha.tzinfo is None:
+        return fecha
+    return fecha.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,221 @@
+"""
+Soporte del encabezado `Idempotency-Key` para POST que crean pagos o contratos.
+
+La primera petición con una llave reserva una fila en `llave_idempotencia`,
+ejecuta la vista y guarda su respuesta. Los reintentos con la misma llave (por
+el mismo empleado y ruta) reciben la respuesta guardada sin volver a ejecutar
+la transacción. Las respuestas recientes se sirven desde un LRU en memoria,
+así un reintento no toca la base de datos.
+
+Mientras la vista corre, cada commit de la sesión marca la llave como
+`confirmada` en la misma transacción que el pago o contrato. Una reserva sin
+respuesta ni confirmación es un arriendo de `ARRIENDO`: si el proceso que la
+tomó murió a media petición, un reintento posterior toma la llave en lugar de
+recibir 409 hasta que venza el TTL. Una llave confirmada nunca se borra ni se
+toma antes del TTL, aunque su respuesta no se haya guardado: el reintento
+recibe 409 en lugar de repetir una transacción que ya se hizo.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import request, make_response, jsonify, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, select, delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import LlaveIdempotencia
+
+
+ENCABEZADO = 'Idempotency-Key'
+LARGO_MAXIMO = 255
+TTL = timedelta(hours=24)
+# Mayor que el timeout de los workers: una petición viva nunca lo excede
+ARRIENDO = timedelta(minutes=2)
+CAPACIDAD_CACHE = 10000
+# Llave de `Session.info` con la reserva de la petición en curso
+_RESERVA = 'llave_idempotencia'
+
+_cache = OrderedDict()
+_candado = threading.Lock()
+
+
+def _cache_leer(clave):
+    with _candado:
+        guardada = _cache.get(clave)
+        if guardada is None:
+            return None
+        if guardada['creada'] < _ahora() - TTL:
+            del _cache[clave]
+            return None
+        _cache.move_to_end(clave)
+        return guardada
+
+
+def _cache_guardar(clave, guardada):
+    with _candado:
+        _cache[clave] = guardada
+        _cache.move_to_end(clave)
+        while len(_cache) > CAPACIDAD_CACHE:
+            _cache.popitem(last=False)
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _reproducir(guardada, huella):
+    if guardada['huella'] != huella:
+        return jsonify({'error': f"La {ENCABEZADO} ya se usó con otro cuerpo de petición"}), 422
+    respuesta = Response(guardada['cuerpo'], status=guardada['status'], mimetype='application/json')
+    respuesta.headers['Idempotent-Replayed'] = 'true'
+    return respuesta
+
+
+def _como_guardada(fila: LlaveIdempotencia) -> dict:
+    return {'huella': fila.huella, 'status': fila.status, 'cuerpo': fila.respuesta, 'creada': fila.creada}
+
+
+def _reservar(clave, huella):
+    """
+    Reserva la llave. Devuelve (fila existente, None) si ya estaba terminada
+    o en proceso, o (None, fecha de la reserva) si la reserva es nuestra; la
+    fecha identifica la reserva al guardar la respuesta.
+    """
+    empleado_id, ruta, llave = clave
+    filtro = dict(empleado_id=empleado_id, ruta=ruta, llave=llave)
+    ahora = _ahora()
+    existente = db.session.execute(select(LlaveIdempotencia).filter_by(**filtro)).scalar_one_or_none()
+    if existente is not None:
+        vencida = existente.creada < ahora - TTL
+        abandonada = (
+            existente.status is None and not existente.confirmada and existente.creada < ahora - ARRIENDO
+        )
+        if not (vencida or abandonada):
+            return existente, None
+        # Vencida o abandonada por un proceso que murió: se toma si nadie la tomó ni la confirmó antes
+        tomada = db.session.execute(
+            update(LlaveIdempotencia)
+            .filter_by(id=existente.id, creada=existente.creada, confirmada=existente.confirmada)
+            .values(huella=huella, status=None, respuesta=None, confirmada=False, creada=ahora)
+        )
+        db.session.commit()
+        if tomada.rowcount == 1:
+            return None, ahora
+        db.session.expire_all()
+        return db.session.execute(select(LlaveIdempotencia).filter_by(**filtro)).scalar_one(), None
+
+    db.session.add(LlaveIdempotencia(huella=huella, creada=ahora, **filtro))
+    try:
+        db.session.commit()
+        return None, ahora
+    except IntegrityError:
+        # Otra petición con la misma llave la reservó al mismo tiempo
+        db.session.rollback()
+        return db.session.execute(select(LlaveIdempotencia).filter_by(**filtro)).scalar_one(), None
+
+
+def idempotente(fn):
+    """
+    Decorador para vistas POST protegidas con JWT (va debajo de @jwt_required).
+
+    Sin encabezado Idempotency-Key la vista se ejecuta normalmente. Se
+    guardan las respuestas 2xx y las de una vista que hizo commit; la llave
+    de una vista que falló sin hacer commit se libera para que el reintento
+    pueda volver a ejecutarse.
+    """
+    @wraps(fn)
+    def decorator(*args, **kwargs):
+        llave = request.headers.get(ENCABEZADO)
+        if not llave:
+            return fn(*args, **kwargs)
+        if len(llave) > LARGO_MAXIMO:
+            return jsonify({'error': f"{ENCABEZADO} no puede exceder {LARGO_MAXIMO} caracteres"}), 400
+
+        clave = (str(get_jwt_identity()), request.path, llave)
+        huella = hashlib.sha256(request.get_data()).hexdigest()
+
+        guardada = _cache_leer(clave)
+        if guardada is not None:
+            return _reproducir(guardada, huella)
+
+        existente, reservada = _reservar(clave, huella)
+        if existente is not None:
+            if existente.status is None and existente.confirmada:
+                return jsonify({
+                    'error': 'La petición con esta llave ya se confirmó pero no se guardó su respuesta; '
+                             'consulta el resultado en lugar de reintentar'
+                }), 409
+            if existente.status is None:
+                return jsonify({'error': 'Hay una petición con la misma llave en proceso'}), 409
+            guardada = _como_guardada(existente)
+            _cache_guardar(clave, guardada)
+            return _reproducir(guardada, huella)
+
+        empleado_id, ruta, _ = clave
+        # Solo nuestra reserva: si el arriendo venció y otro la tomó, no se toca la suya
+        filtro = dict(empleado_id=empleado_id, ruta=ruta, llave=llave, creada=reservada)
+        db.session.info[_RESERVA] = filtro
+        try:
+            respuesta = make_response(fn(*args, **kwargs))
+        except Exception:
+            db.session.info.pop(_RESERVA, None)
+            db.session.rollback()
+            # Libera la llave solo si la vista no llegó a confirmar nada
+            db.session.execute(delete(LlaveIdempotencia).filter_by(**filtro, confirmada=False))
+            db.session.commit()
+            raise
+        db.session.info.pop(_RESERVA, None)
+
+        cuerpo = respuesta.get_data(as_text=True)
+        exitosa = 200 <= respuesta.status_code < 300
+        try:
+            guardar = update(LlaveIdempotencia).values(status=respuesta.status_code, respuesta=cuerpo)
+            if exitosa:
+                db.session.execute(guardar.filter_by(**filtro).values(confirmada=True))
+            else:
+                db.session.execute(guardar.filter_by(**filtro, confirmada=True))
+                db.session.execute(delete(LlaveIdempotencia).filter_by(**filtro, confirmada=False))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if exitosa:
+            _cache_guardar(clave, {
+                'huella': huella, 'status': respuesta.status_code, 'cuerpo': cuerpo, 'creada': _ahora()
+            })
+        return respuesta
+
+    return decorator
+
+
+@event.listens_for(Session, 'before_commit')
+def _confirmar_reserva(sesion):
+    """Marca la llave en la misma transacción que confirma la vista."""
+    filtro = sesion.info.get(_RESERVA)
+    if filtro is not None:
+        sesion.execute(update(LlaveIdempotencia).filter_by(**filtro).values(confirmada=True))
+
+
+def purgar_vencidas(ttl: timedelta = TTL, lote: int = 1000) -> int:
+    """Borra en lotes las llaves más viejas que `ttl`. Devuelve cuántas borró."""
+    limite = _ahora() - ttl
+    borradas = 0
+    while True:
+        ids = select(LlaveIdempotencia.id).where(LlaveIdempotencia.creada < limite).limit(lote)
+        resultado = db.session.execute(
+            delete(LlaveIdempotencia).where(LlaveIdempotencia.id.in_(ids))
+        )
+        db.session.commit()
+        borradas += resultado.rowcount
+        if resultado.rowcount < lote:
+            break
+
+    with _candado:
+        for clave in [c for c, g in _cache.items() if g['creada'] < limite]:
+            del _cache[clave]
+    return borradas
@@ -0,0 +1,229 @@
+"""
+Importación masiva de pagos (p. ej. transferencias de un estado de cuenta).
+
+El archivo se lee fila por fila, sin cargarlo completo en memoria. Las filas
+se agrupan en lotes: cada lote bloquea sus contratos con un solo SELECT ...
+FOR UPDATE, aplica los pagos con las mismas reglas que /pagos/registrar,
+inserta todos los Pago con un INSERT masivo y hace un commit. Las filas que no
+pasan la validación se reportan una por una y no detienen la importación.
+"""
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.models import Pago, ContratoCompraVenta, CuotaContrato
+from app.caja import acumular_pago, METODOS_PAGO
+from app.cuotas import CUOTAS_ABIERTAS
+from app.dinero import a_centavos, a_decimal, a_float
+from app.fechas import ZONA_MX
+from app.outbox import eventos_de_pago, encolar, RECORDATORIO_PAGO
+from app.puntualidad import registrar_puntualidad, dias_de_atraso
+from app.libro import asentar, asiento_de_pago
+from app.motor_pagos import aplicar_monto, ErrorPago, MAX_REINTENTOS
+
+
+TAMANO_LOTE = 500
+FORMATOS = ('csv', 'ndjson')
+METODO_POR_DEFECTO = 'TRANSFERENCIA'
+
+
+def leer_filas(stream, formato: str = 'csv'):
+    """
+    Genera (numero_de_linea, dict) a partir de un stream binario.
+
+    CSV: la primera línea es el encabezado (contrato_id,monto[,metodo]).
+    NDJSON: un objeto JSON por línea; las líneas vacías se ignoran.
+    Una línea NDJSON mal formada se entrega como (linea, None).
+    """
+    lineas = (linea.decode('utf-8-sig') for linea in stream)
+
+    if formato == 'csv':
+        lector = csv.DictReader(lineas)
+        for fila in lector:
+            yield lector.line_num, fila
+        return
+
+    for numero, linea in enumerate(lineas, start=1):
+        if not linea.strip():
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError:
+            fila = None
+        yield numero, fila if isinstance(fila, dict) else None
+
+
+def _validar_fila(fila):
+    """Normaliza una fila → (contrato_id, monto en centavos, metodo). Lanza ErrorPago."""
+    if fila is None:
+        raise ErrorPago('Fila mal formada')
+    try:
+        contrato_id = int(fila.get('contrato_id'))
+        monto = a_centavos(fila.get('monto'))
+    except (TypeError, ValueError, ArithmeticError):
+        raise ErrorPago('contrato_id o monto inválido') from None
+    if monto <= 0:
+        raise ErrorPago('El monto debe ser mayor a 0')
+
+    metodo = fila.get('metodo') or METODO_POR_DEFECTO
+    if not isinstance(metodo, str):
+        raise ErrorPago(f"Método de pago inválido: {metodo!r}")
+    metodo = metodo.strip().upper()
+    if metodo not in METODOS_PAGO:
+        raise ErrorPago(f"Método de pago inválido: {metodo}")
+    return contrato_id, monto, metodo
+
+
+def _rechazo(linea, contrato_id, error: ErrorPago) -> dict:
+    return {'tipo': 'rechazo', 'linea': linea, 'contrato_id': contrato_id, 'error': error.mensaje}
+
+
+def _aplicar_lote(lote, empleado_id, sucursal_id):
+    """
+    Aplica un lote de filas ya validadas en una sola transacción.
+
+    Returns:
+        tuple: (pagos insertados, monto total en centavos, rechazos).
+    """
+    ids = sorted({contrato_id for _, contrato_id, _, _ in lote})
+
+    # 🔒 Un solo SELECT ... FOR UPDATE para todos los contratos del lote, en orden
+    # de id para que dos importaciones simultáneas no se bloqueen en cruz
+    contratos = {
+        c.id: c for c in db.session.execute(
+            select(ContratoCompraVenta)
+            .where(ContratoCompraVenta.id.in_(ids))
+            .order_by(ContratoCompraVenta.id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        ).scalars()
+    }
+    abiertas = defaultdict(list)
+    for cuota in db.session.execute(
+        select(CuotaContrato)
+        .where(CuotaContrato.contrato_id.in_(ids), CuotaContrato.estado.in_(CUOTAS_ABIERTAS))
+        .order_by(CuotaContrato.contrato_id, CuotaContrato.numero)
+    ).scalars():
+        abiertas[cuota.contrato_id].append(cuota)
+
+    ahora = datetime.now(ZONA_MX)
+    ahora_utc = ahora.astimezone(timezone.utc).replace(tzinfo=None)
+
+    pagos, rechazos = [], []
+    por_metodo = defaultdict(lambda: [0, 0])
+    # Días de atraso de cada pago aplicado, por cliente y en orden del archivo
+    atrasos = defaultdict(list)
+    for linea, contrato_id, monto, metodo in lote:
+        contrato = contratos.get(contrato_id)
+        try:
+            if contrato is None:
+                raise ErrorPago('Contrato no encontrado', 404)
+            estado_anterior = contrato.estado_deuda
+            vencimiento = contrato.proximo_pago_fecha
+            saldo_anterior = a_centavos(contrato.saldo_pendiente)
+            aplicar_monto(contrato, abiertas[contrato_id], monto, ahora_utc)
+        except ErrorPago as e:
+            rechazos.append(_rechazo(linea, contrato_id, e))
+            continue
+
+        # Un segundo pago del mismo contrato en el lote parte de lo que quedó abierto
+        abiertas[contrato_id] = [c for c in abiertas[contrato_id] if c.monto_restante > 0]
+        pagos.append(({
+            'sucursal_id': sucursal_id,
+            'contrato_id': contrato_id,
+            'empleado_id': empleado_id,
+            'monto': a_decimal(monto),
+            'metodo': metodo,
+            'fecha': ahora
+        }, contrato, estado_anterior, saldo_anterior - a_centavos(contrato.saldo_pendiente)))
+        por_metodo[metodo][0] += monto
+        por_metodo[metodo][1] += 1
+        atrasos[contrato.cliente_id].append(dias_de_atraso(vencimiento, ahora_utc))
+
+    if pagos:
+        ids = db.session.execute(
+            insert(Pago).returning(Pago.id, sort_by_parameter_order=True),
+            [pago for pago, _, _, _ in pagos]
+        ).scalars().all()
+        eventos, recordatorios, libro = [], {}, []
+        for pago_id, (pago, contrato, estado_anterior, aplicado) in zip(ids, pagos):
+            libro += asiento_de_pago(pago_id, contrato.id, ahora_utc, a_centavos(pago['monto']), aplicado)
+            for evento in eventos_de_pago({**pago, 'id': pago_id}, contrato, estado_anterior):
+                if evento['tipo'] == RECORDATORIO_PAGO:
+                    # Un solo recordatorio por contrato: el del último pago del lote
+                    recordatorios[contrato.id] = evento
+                else:
+                    eventos.append(evento)
+        encolar(eventos + list(recordatorios.values()))
+        asentar(libro)
+        for metodo, (total, transacciones) in por_metodo.items():
+            acumular_pago(empleado_id, sucursal_id, ahora.date(), metodo, a_decimal(total), transacciones)
+        for cliente_id, dias in atrasos.items():
+            registrar_puntualidad(cliente_id, dias, ahora_utc)
+
+    db.session.commit()
+    return len(pagos), sum(total for total, _ in por_metodo.values()), rechazos
+
+
+def _confirmar_lote(lote, empleado_id, sucursal_id):
+    """`_aplicar_lote` con reintento si otra transacción cambió un contrato primero."""
+    for _ in range(MAX_REINTENTOS):
+        try:
+            return _aplicar_lote(lote, empleado_id, sucursal_id)
+        except StaleDataError:
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+        finally:
+            # Suelta los contratos y cuotas del lote: la memoria no crece con el archivo
+            db.session.expunge_all()
+
+    error = ErrorPago('El contrato está siendo modificado, intenta de nuevo.', 409)
+    return 0, 0, [_rechazo(linea, contrato_id, error) for linea, contrato_id, _, _ in lote]
+
+
+def importar_pagos(filas, empleado_id, sucursal_id=None, tamano_lote: int = TAMANO_LOTE):
+    """
+    Importa los pagos de `filas` (iterable de (linea, dict), ver `leer_filas`).
+
+    Genera un dict {'tipo': 'rechazo', ...} por cada fila rechazada, en cuanto
+    se conoce, y al final un {'tipo': 'resumen', ...} con los totales.
+    """
+    inicio = datetime.now(timezone.utc)
+    resumen = {'tipo': 'resumen', 'filas': 0, 'aplicados': 0, 'rechazados': 0, 'lotes': 0, 'monto_total': 0}
+
+    def procesar(lote):
+        aplicados, monto, rechazos = _confirmar_lote(lote, empleado_id, sucursal_id)
+        resumen['lotes'] += 1
+        resumen['aplicados'] += aplicados
+        resumen['monto_total'] += monto
+        resumen['rechazados'] += len(rechazos)
+        return rechazos
+
+    lote = []
+    for linea, fila in filas:
+        resumen['filas'] += 1
+        try:
+            contrato_id, monto, metodo = _validar_fila(fila)
+        except ErrorPago as e:
+            resumen['rechazados'] += 1
+            yield _rechazo(linea, (fila or {}).get('contrato_id'), e)
+            continue
+
+        lote.append((linea, contrato_id, monto, metodo))
+        if len(lote) >= tamano_lote:
+            yield from procesar(lote)
+            lote = []
+
+    if lote:
+        yield from procesar(lote)
+
+    resumen['monto_total'] = a_float(resumen['monto_total'])
+    resumen['segundos'] = round((datetime.now(timezone.utc) - inicio).total_seconds(), 3)
+    yield resumen
@@ -0,0 +1,161 @@
+"""
+Índice invertido del texto de los contratos HTML.
+
+Al firmar un contrato se guardan sus términos (texto sin etiquetas, en
+minúsculas y sin acentos) con su frecuencia en `termino_contrato`; buscar es
+leer las listas de los términos pedidos en lugar de abrir todos los HTML.
+Un documento coincide si contiene todos los términos y se ordena por
+Σ frecuencia / documentos con el término, así pesan más los términos raros
+que el texto común a todos los contratos. `reconstruir` indexa los archivos
+de `static/contratos` y los contratos ya firmados.
+"""
+import html as html_lib
+import os
+import re
+import unicodedata
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy import case, delete, func, insert, select
+
+from app import db
+from app.models import TerminoContrato, ContratoConsultaBuro, ContratoCompraVenta
+from app.almacen_contratos import html_disponible
+
+
+BURO = 'BURO'
+COMPRA_VENTA = 'COMPRA_VENTA'
+MODELOS = {BURO: ContratoConsultaBuro, COMPRA_VENTA: ContratoCompraVenta}
+PREFIJOS = {BURO: 'contrato_', COMPRA_VENTA: 'contrato_compra_venta_'}
+LARGO_MAXIMO = 64
+LIMITE_POR_DEFECTO = 20
+
+_ETIQUETAS = re.compile(r'<(script|style)\b.*?</\1\s*>|<[^>]*>', re.S | re.I)
+_PALABRA = re.compile(r'\w+')
+_ARCHIVO = re.compile(r'^contrato_(compra_venta_)?(\d+)\.html$')
+
+
+def carpeta() -> str:
+    """Carpeta de los contratos HTML anteriores al almacén por hash."""
+    return os.path.join(current_app.static_folder, 'contratos')
+
+
+def terminos(texto: str) -> list:
+    """Palabras de `texto` en minúsculas y sin acentos."""
+    normal = unicodedata.normalize('NFKD', texto.casefold())
+    normal = ''.join(c for c in normal if not unicodedata.combining(c))
+    return [t for t in _PALABRA.findall(normal) if len(t) <= LARGO_MAXIMO]
+
+
+def terminos_de_html(contenido: str) -> Counter:
+    return Counter(terminos(html_lib.unescape(_ETIQUETAS.sub(' ', contenido))))
+
+
+def archivo_de(tipo: str, contrato_id: int) -> str:
+    return f"{PREFIJOS[tipo]}{contrato_id}.html"
+
+
+def documento_de_archivo(nombre: str):
+    """'contrato_compra_venta_7.html' → (COMPRA_VENTA, 7); None si no sigue el formato."""
+    coincide = _ARCHIVO.match(nombre)
+    if not coincide:
+        return None
+    return (COMPRA_VENTA if coincide.group(1) else BURO), int(coincide.group(2))
+
+
+def indexar(tipo: str, contrato_id: int, contenido: str) -> int:
+    """Reemplaza los términos del documento. No hace commit. Devuelve cuántos términos distintos tiene."""
+    db.session.execute(
+        delete(TerminoContrato).where(TerminoContrato.tipo == tipo, TerminoContrato.contrato_id == contrato_id)
+    )
+    conteo = terminos_de_html(contenido)
+    if conteo:
+        db.session.execute(insert(TerminoContrato), [
+            {'termino': termino, 'tipo': tipo, 'contrato_id': contrato_id, 'frecuencia': frecuencia}
+            for termino, frecuencia in conteo.items()
+        ])
+    return len(conteo)
+
+
+def buscar(consulta: str, limite: int = LIMITE_POR_DEFECTO) -> list:
+    """Documentos que contienen todos los términos de `consulta`, el más relevante primero."""
+    buscados = sorted(set(terminos(consulta)))
+    if not buscados:
+        return []
+
+    documentos_por_termino = dict(db.session.execute(
+        select(TerminoContrato.termino, func.count())
+        .where(TerminoContrato.termino.in_(buscados))
+        .group_by(TerminoContrato.termino)
+    ).all())
+    if len(documentos_por_termino) < len(buscados):
+        return []
+
+    peso = case(
+        {t: 1.0 / documentos_por_termino[t] for t in buscados},
+        value=TerminoContrato.termino
+    )
+    puntaje = func.sum(TerminoContrato.frecuencia * peso)
+    filas = db.session.execute(
+        select(TerminoContrato.tipo, TerminoContrato.contrato_id, puntaje.label('puntaje'))
+        .where(TerminoContrato.termino.in_(buscados))
+        .group_by(TerminoContrato.tipo, TerminoContrato.contrato_id)
+        .having(func.count() == len(buscados))
+        .order_by(puntaje.desc(), TerminoContrato.tipo, TerminoContrato.contrato_id)
+        .limit(limite)
+    ).all()
+    return [
+        {
+            'tipo': tipo,
+            'contrato_id': contrato_id,
+            'archivo': archivo_de(tipo, contrato_id),
+            'puntaje': round(float(valor), 4)
+        }
+        for tipo, contrato_id, valor in filas
+    ]
+
+
+def reconstruir(lote: int = 200) -> dict:
+    """
+    Vacía el índice y lo vuelve a llenar con los archivos de la carpeta y
+    los contratos firmados (estos reemplazan al archivo del mismo contrato).
+    Un commit por lote.
+    """
+    db.session.execute(delete(TerminoContrato))
+    resumen = {'archivos': 0, 'contratos': 0, 'terminos': 0, 'ignorados': []}
+
+    nombres = sorted(os.listdir(carpeta())) if os.path.isdir(carpeta()) else []
+    for i, nombre in enumerate(nombres, 1):
+        documento = documento_de_archivo(nombre)
+        if documento is None:
+            resumen['ignorados'].append(nombre)
+            continue
+        with open(os.path.join(carpeta(), nombre), 'r', encoding='utf-8') as f:
+            resumen['terminos'] += indexar(*documento, f.read())
+        resumen['archivos'] += 1
+        if i % lote == 0:
+            db.session.commit()
+    db.session.commit()
+
+    for tipo, modelo in MODELOS.items():
+        ultimo_id = 0
+        while True:
+            filas = db.session.execute(
+                select(
+                    modelo.id, modelo.hash_contrato, modelo.contrato_html,
+                    modelo.plantilla, modelo.plantilla_version, modelo.variables
+                )
+                .where(modelo.id > ultimo_id, modelo.hash_contrato.is_not(None))
+                .order_by(modelo.id)
+                .limit(lote)
+            ).all()
+            if not filas:
+                break
+            for fila in filas:
+                html = html_disponible(fila)
+                if html is not None:
+                    resumen['terminos'] += indexar(tipo, fila.id, html)
+                    resumen['contratos'] += 1
+            db.session.commit()
+            ultimo_id = filas[-1].id
+    return resumen
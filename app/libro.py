@@ -0,0 +1,283 @@
+"""
+Libro de partida doble de los contratos y cortes de saldo.
+
+`ContratoCompraVenta.saldo_pendiente` es el saldo actual; el libro guarda
+cómo se llegó a él. Cada contrato nuevo y cada pago agrega un asiento en
+`movimiento_libro` (nunca se modifica ni se borra una línea) dentro de la
+misma transacción que lo origina. `tomar_corte` guarda el saldo por cobrar de
+todos los contratos a una fecha con un solo INSERT ... SELECT que parte del
+corte anterior, así el saldo de un contrato a cualquier fecha es su corte más
+reciente más los movimientos posteriores, y el reporte de fin de mes lee solo
+los cortes.
+"""
+from datetime import date, datetime, time, timezone
+
+from sqlalchemy import event, insert, select, func, literal, union_all, exists, and_, case, bindparam
+
+from app import db
+from app.models import MovimientoLibro, SaldoContratoCorte, ContratoCompraVenta, Empleado
+from app.dinero import a_decimal, a_float, a_centavos
+from app.fechas import ZONA_MX, a_utc
+
+
+CUENTAS_POR_COBRAR = 'CUENTAS_POR_COBRAR'
+CAJA = 'CAJA'
+VENTAS = 'VENTAS'
+ENGANCHES = 'ENGANCHES'
+SALDO_A_FAVOR = 'SALDO_A_FAVOR'
+SALDOS_INICIALES = 'SALDOS_INICIALES'
+
+CONTRATO, PAGO, APERTURA = 'CONTRATO', 'PAGO', 'APERTURA'
+
+_SIN_CORTE = datetime(1900, 1, 1)
+
+
+def inicio_del_dia(fecha: date) -> datetime:
+    """00:00 de `fecha` en hora de México, en UTC sin zona horaria."""
+    return a_utc(datetime.combine(fecha, time.min, tzinfo=ZONA_MX))
+
+
+def asiento(referencia_tipo: str, referencia_id: int, contrato_id: int, fecha: datetime, lineas) -> list:
+    """
+    Filas de un asiento. `lineas` son (cuenta, debe, haber) en centavos; las
+    líneas en cero se omiten. Lanza ValueError si el asiento no cuadra.
+    """
+    if sum(debe for _, debe, _ in lineas) != sum(haber for _, _, haber in lineas):
+        raise ValueError(f"Asiento {referencia_tipo} {referencia_id} no cuadra: {lineas}")
+    fecha = a_utc(fecha)
+    return [
+        {
+            'contrato_id': contrato_id,
+            'fecha': fecha,
+            'cuenta': cuenta,
+            'debe': a_decimal(debe),
+            'haber': a_decimal(haber),
+            'referencia_tipo': referencia_tipo,
+            'referencia_id': referencia_id
+        }
+        for cuenta, debe, haber in lineas if debe or haber
+    ]
+
+
+def asiento_de_contrato(contrato_id: int, fecha: datetime, monto_total: int, pago_inicial: int) -> list:
+    """La venta a crédito; el enganche no reduce el saldo del contrato."""
+    return asiento(CONTRATO, contrato_id, contrato_id, fecha, [
+        (CUENTAS_POR_COBRAR, monto_total, 0),
+        (VENTAS, 0, monto_total),
+        (CAJA, pago_inicial, 0),
+        (ENGANCHES, 0, pago_inicial)
+    ])
+
+
+def asiento_de_pago(pago_id: int, contrato_id: int, fecha: datetime, monto: int, aplicado: int) -> list:
+    """Lo cobrado entra a caja; lo que excede el saldo queda como saldo a favor."""
+    return asiento(PAGO, pago_id, contrato_id, fecha, [
+        (CAJA, monto, 0),
+        (CUENTAS_POR_COBRAR, 0, aplicado),
+        (SALDO_A_FAVOR, 0, monto - aplicado)
+    ])
+
+
+def asentar(filas: list) -> None:
+    """Inserta las líneas con un solo INSERT. No hace commit."""
+    if filas:
+        db.session.execute(insert(MovimientoLibro), filas)
+
+
+@event.listens_for(MovimientoLibro, 'before_update')
+@event.listens_for(MovimientoLibro, 'before_delete')
+def _solo_agregar(mapper, connection, movimiento):
+    raise RuntimeError('El libro solo admite nuevas líneas; corrige con un asiento nuevo.')
+
+
+def abrir_libro() -> int:
+    """
+    Asiento de apertura (saldo contra SALDOS_INICIALES) para los contratos
+    sin asiento de CONTRATO ni de APERTURA, con un solo INSERT ... SELECT.
+
+    La migración del libro ya abre los contratos que existían; esto repara
+    los que quedaron fuera. Si el contrato ya tiene pagos en el libro, la
+    apertura es su `saldo_pendiente` más lo que esos pagos abonaron, con la
+    fecha de su primer movimiento (o la del último corte, si es posterior,
+    para que los cortes siguientes la incluyan); sin movimientos, con la
+    fecha actual. Su saldo histórico anterior a la apertura es 0.
+    """
+    ahora = a_utc(datetime.now(timezone.utc))
+    ultimo_corte = db.session.execute(select(func.max(SaldoContratoCorte.fecha_corte))).scalar()
+
+    libro = (
+        select(
+            MovimientoLibro.contrato_id,
+            func.sum(
+                case(
+                    (MovimientoLibro.cuenta == CUENTAS_POR_COBRAR, MovimientoLibro.debe - MovimientoLibro.haber),
+                    else_=0
+                )
+            ).label('por_cobrar'),
+            func.min(MovimientoLibro.fecha).label('primero')
+        )
+        .group_by(MovimientoLibro.contrato_id)
+        .subquery()
+    )
+    apertura = ContratoCompraVenta.saldo_pendiente - func.coalesce(libro.c.por_cobrar, 0)
+    fecha = func.coalesce(libro.c.primero, ahora)
+    if ultimo_corte is not None:
+        fecha = case((fecha < ultimo_corte, ultimo_corte), else_=fecha)
+    sin_apertura = and_(
+        apertura > 0,
+        ~exists().where(
+            MovimientoLibro.contrato_id == ContratoCompraVenta.id,
+            MovimientoLibro.referencia_tipo.in_([CONTRATO, APERTURA])
+        )
+    )
+
+    def lineas(cuenta, debe, haber):
+        return (
+            select(
+                ContratoCompraVenta.id, fecha, literal(cuenta), debe, haber,
+                literal(APERTURA), ContratoCompraVenta.id
+            )
+            .outerjoin(libro, libro.c.contrato_id == ContratoCompraVenta.id)
+            .where(sin_apertura)
+        )
+
+    cero = literal(a_decimal(0))
+    resultado = db.session.execute(
+        insert(MovimientoLibro).from_select(
+            ['contrato_id', 'fecha', 'cuenta', 'debe', 'haber', 'referencia_tipo', 'referencia_id'],
+            union_all(
+                lineas(CUENTAS_POR_COBRAR, apertura, cero),
+                lineas(SALDOS_INICIALES, cero, apertura)
+            )
+        )
+    )
+    db.session.commit()
+    return resultado.rowcount // 2
+
+
+def _corte_anterior(fecha: datetime):
+    return db.session.execute(
+        select(func.max(SaldoContratoCorte.fecha_corte)).where(SaldoContratoCorte.fecha_corte < fecha)
+    ).scalar()
+
+
+def tomar_corte(fecha_corte: datetime) -> dict:
+    """
+    Guarda el saldo por cobrar de cada contrato a `fecha_corte` (UTC sin
+    zona): saldo del corte anterior + movimientos entre ambos cortes, con un
+    solo INSERT ... SELECT. Si el corte ya existe no hace nada.
+    """
+    if fecha_corte > a_utc(datetime.now(timezone.utc)):
+        raise ValueError('La fecha de corte no puede estar en el futuro')
+    ya_existe = db.session.execute(
+        select(func.count()).where(SaldoContratoCorte.fecha_corte == fecha_corte)
+    ).scalar()
+    if ya_existe:
+        return {'fecha_corte': fecha_corte.isoformat(), 'contratos': ya_existe, 'nuevo': False}
+
+    anterior = _corte_anterior(fecha_corte)
+    tramo = [MovimientoLibro.cuenta == CUENTAS_POR_COBRAR, MovimientoLibro.fecha < fecha_corte]
+    if anterior is not None:
+        tramo.append(MovimientoLibro.fecha >= anterior)
+    partes = [
+        select(MovimientoLibro.contrato_id, (MovimientoLibro.debe - MovimientoLibro.haber).label('monto'))
+        .where(*tramo)
+    ]
+    if anterior is not None:
+        partes.append(
+            select(SaldoContratoCorte.contrato_id, SaldoContratoCorte.saldo.label('monto'))
+            .where(SaldoContratoCorte.fecha_corte == anterior)
+        )
+    movimientos = union_all(*partes).subquery()
+    saldo = func.sum(movimientos.c.monto)
+
+    resultado = db.session.execute(
+        insert(SaldoContratoCorte).from_select(
+            ['contrato_id', 'fecha_corte', 'saldo'],
+            select(movimientos.c.contrato_id, literal(fecha_corte), saldo)
+            .group_by(movimientos.c.contrato_id)
+            .having(saldo != 0)
+        )
+    )
+    db.session.commit()
+    return {
+        'fecha_corte': fecha_corte.isoformat(),
+        'corte_anterior': anterior.isoformat() if anterior else None,
+        'contratos': resultado.rowcount,
+        'nuevo': True
+    }
+
+
+# Consultas de `saldo_al` armadas una sola vez: por contrato, el costo de
+# construir la sentencia supera al de ejecutarla.
+_CORTE_DEL_CONTRATO = (
+    select(SaldoContratoCorte.fecha_corte, SaldoContratoCorte.saldo)
+    .where(
+        SaldoContratoCorte.contrato_id == bindparam('contrato_id'),
+        SaldoContratoCorte.fecha_corte <= bindparam('fecha')
+    )
+    .order_by(SaldoContratoCorte.fecha_corte.desc())
+    .limit(1)
+)
+_COLA_DEL_CONTRATO = (
+    select(
+        func.coalesce(func.sum(MovimientoLibro.debe - MovimientoLibro.haber), 0).label('cola'),
+        func.count(MovimientoLibro.id).label('movimientos')
+    ).where(
+        MovimientoLibro.contrato_id == bindparam('contrato_id'),
+        MovimientoLibro.cuenta == CUENTAS_POR_COBRAR,
+        MovimientoLibro.fecha >= bindparam('desde'),
+        MovimientoLibro.fecha < bindparam('fecha')
+    )
+)
+
+
+def saldo_al(contrato_id: int, fecha: datetime) -> dict:
+    """
+    Saldo por cobrar del contrato justo antes de `fecha` (UTC sin zona): su
+    corte más reciente anterior a la fecha más los movimientos posteriores.
+
+    El corte se busca entre los del contrato por su llave (contrato, fecha);
+    si el contrato no tiene fila en el último corte global (saldo cero), su
+    corte anterior más la cola desde ahí da el mismo saldo.
+    """
+    corte = db.session.execute(_CORTE_DEL_CONTRATO, {'contrato_id': contrato_id, 'fecha': fecha}).first()
+    cola = db.session.execute(_COLA_DEL_CONTRATO, {
+        'contrato_id': contrato_id,
+        'fecha': fecha,
+        # Sin corte anterior, la cola es todo el historial
+        'desde': corte.fecha_corte if corte else _SIN_CORTE
+    }).one()
+    base = a_centavos(corte.saldo) if corte else 0
+    return {
+        'contrato_id': contrato_id,
+        'fecha': fecha.isoformat(),
+        'saldo': a_float(base + a_centavos(cola.cola)),
+        'corte': corte.fecha_corte.isoformat() if corte else None,
+        'movimientos_despues_del_corte': cola.movimientos
+    }
+
+
+def reporte_de_corte(fecha_corte: datetime) -> dict:
+    """Saldo por cobrar al corte, total y por sucursal, leyendo solo los cortes."""
+    filas = db.session.execute(
+        select(
+            Empleado.sucursal_id,
+            func.count(SaldoContratoCorte.contrato_id),
+            func.sum(SaldoContratoCorte.saldo)
+        )
+        .join(ContratoCompraVenta, ContratoCompraVenta.id == SaldoContratoCorte.contrato_id)
+        .outerjoin(Empleado, Empleado.id == ContratoCompraVenta.empleado_id)
+        .where(SaldoContratoCorte.fecha_corte == fecha_corte)
+        .group_by(Empleado.sucursal_id)
+    ).all()
+    por_sucursal = [
+        {'sucursal_id': sucursal_id, 'contratos': contratos, 'saldo': float(saldo)}
+        for sucursal_id, contratos, saldo in filas
+    ]
+    return {
+        'fecha_corte': fecha_corte.isoformat(),
+        'contratos': sum(s['contratos'] for s in por_sucursal),
+        'saldo_total': round(sum(s['saldo'] for s in por_sucursal), 2),
+        'por_sucursal': por_sucursal
+    }
@@ -14,14 +14,22 @@ from sqlalchemy import (
     Text,
     text,
     func,
-    Numeric
+    Numeric,
+    Date,
+    UniqueConstraint,
+    Index,
+    event,
+    inspect,
+    select
 )
 from zoneinfo import ZoneInfo
-from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy.orm import Mapped, mapped_column, relationship, column_property
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from app import db  # importa la instancia creada en app/__init__.py
+from app.almacen_contratos import html_disponible
+from app.fechas import fecha_mx
 
 
 # ──────────────────────────────────────────────
@@ -76,6 +84,18 @@ class EstadoDeuda(PyEnum):
     LIQUIDADO = 'LIQUIDADO'
 
 
+class EstadoCuota(PyEnum):
+    PENDIENTE = 'PENDIENTE'
+    PARCIAL = 'PARCIAL'
+    PAGADA = 'PAGADA'
+
+
+class EstadoEvento(PyEnum):
+    PENDIENTE = 'PENDIENTE'
+    ENVIADO = 'ENVIADO'
+    FALLIDO = 'FALLIDO'
+
+
 class EstadoCorte(PyEnum):
     DECLARADO = 'DECLARADO'
     COMPLETO = 'COMPLETO'
@@ -99,58 +119,7 @@ def actualizar_fecha_proxima_pago(contrato):
         contrato.fecha_proximo_pago += timedelta(days=15)
     elif ciclo == 'mensual':
         contrato.fecha_proximo_pago += relativedelta(months=1)
-    db.session.commit()
-
-
-def calcular_plan_pago(plan: 'PlanPago', monto_total: Decimal):
-    """
-    Calcula los pagos semanales de un plan, evitando centavos.
-
-    Args:
-        plan (PlanPago): instancia del plan de pago.
-        monto_total (Decimal): precio total del dispositivo.
-
-    Returns:
-        dict: información del plan con las cuotas calculadas.
-    """
-    # ✅ Validaciones básicas
-    if plan.duracion_semanas <= 0:
-        raise ValueError('El plan debe tener al menos 1 semana.')
-    if monto_total <= 0:
-        raise ValueError('El monto total debe ser mayor a 0.')
-    # ✅ Restar pago inicial (si lo hay)
-    monto_financiar = monto_total - plan.pago_inicial
-
-    # ✅ Aplicar interés si existe
-    if plan.tasa_interes > 0:
-        monto_financiar += monto_financiar * (plan.tasa_interes / 100)
-    # ✅ Calcular cuota semanal base
-    cuota_base = monto_financiar / plan.duracion_semanas
-
-    # ✅ Convertir a Decimal y redondear hacia abajo (sin centavos)
-    cuota_entera = cuota_base.quantize(Decimal('1'), rounding=ROUND_DOWN)
-
-    # ✅ Recalcular total pagado en cuotas y ajustar última cuota
-    total_cuotas = cuota_entera * plan.duracion_semanas
-    diferencia = monto_financiar - total_cuotas
-
-    # Ajustar la última cuota para compensar los centavos perdidos
-    ultima_cuota = cuota_entera + diferencia
-
-    # ✅ Crear lista de pagos
-    cuotas = [int(cuota_entera)] * (plan.duracion_semanas - 1) + [int(ultima_cuota)]
-
-    return {
-        'nombre_plan': plan.nombre_plan,
-        'duracion_semanas': plan.duracion_semanas,
-        'tasa_interes': plan.tasa_interes,
-        'pago_inicial': float(plan.pago_inicial),
-        'monto_total': float(monto_total),
-        'monto_financiar': float(monto_financiar),
-        'cuota_semanal': int(cuota_entera),
-        'cuotas': cuotas,
-        'total_pagado': float(plan.pago_inicial + sum(cuotas))
-    }
+    # El commit queda a cargo de quien llama, para poder actualizar contratos en lote
 
 
 # ──────────────────────────────────────────────
@@ -227,7 +196,8 @@ class Usuario(db.Model):
     rfc: Mapped[str] = mapped_column(String(13), unique=True, nullable=True)
     nacionalidad: Mapped[str] = mapped_column(String(50), nullable=True)
     numero_telefonico_adicional: Mapped[str] = mapped_column(String(12), nullable=True)
-    numero_telefonico: Mapped[str] = mapped_column(String(12), nullable=True)
+    # Búsqueda de cliente en mostrador por teléfono
+    numero_telefonico: Mapped[str] = mapped_column(String(12), nullable=True, index=True)
     tipo_identificacion: Mapped[TipoIdentificacion] = mapped_column(
         SqlEnum(
             TipoIdentificacion,
@@ -637,7 +607,12 @@ class ContratoConsultaBuro(db.Model):
     )
     contrato_url: Mapped[str] = mapped_column(String(550), nullable=False)
     hash_contrato: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
-    contrato_html: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Diferido: los SELECT del modelo no lo traen; ver serialize(incluir_html=True)
+    contrato_html: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
+    # Generado con plantilla (app/plantillas_contratos.py): el HTML se renderiza al abrirlo
+    plantilla: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+    plantilla_version: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    variables: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     estado_contrato: Mapped[EstadoContrato] = mapped_column(
         db.Enum(
@@ -656,19 +631,23 @@ class ContratoConsultaBuro(db.Model):
     nombre: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
     apellido: Mapped[Optional[str]] = mapped_column(String(120), nullable=True)
 
-    def serialize(self) -> dict:
-        return {
+    def serialize(self, incluir_html: bool = False) -> dict:
+        datos = {
             'id': self.id,
             'cliente_id': self.cliente_id,
             'empleado_id': self.empleado_id,
             'contrato_url': self.contrato_url,
             'hash_contrato': self.hash_contrato,
-            'contrato_html': self.contrato_html,
+            'plantilla': self.plantilla,
+            'plantilla_version': self.plantilla_version,
             'estado_contrato': self.estado_contrato.value
             if self.estado_contrato
             else None,
             'fecha_firma': self.fecha_firma.isoformat() if self.fecha_firma else None
         }
+        if incluir_html:
+            datos['contrato_html'] = html_disponible(self)
+        return datos
 
 
 # ──────────────────────────────────────────────
@@ -745,7 +724,12 @@ class ContratoCompraVenta(db.Model):
     )
     contrato_url: Mapped[Optional[str]] = mapped_column(String(550), nullable=True)
     hash_contrato: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
-    contrato_html: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Diferido: los SELECT del modelo no lo traen; ver serialize(incluir_html=True)
+    contrato_html: Mapped[Optional[str]] = mapped_column(Text, nullable=True, deferred=True)
+    # Generado con plantilla (app/plantillas_contratos.py): el HTML se renderiza al abrirlo
+    plantilla: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+    plantilla_version: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    variables: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     estado_contrato: Mapped[EstadoContrato] = mapped_column(
         db.Enum(
             EstadoContrato,
@@ -777,16 +761,41 @@ class ContratoCompraVenta(db.Model):
     proximo_pago_fecha: Mapped[Optional[datetime]] = mapped_column(
         DateTime, nullable=True
     )
+    # Lista de cobranza (app/cobranza.py); los mantiene _columnas_de_cobranza al guardar.
+    # Sucursal del empleado que firmó, y día (hora de México) de proximo_pago_fecha
+    # o NULL si el contrato ya no se cobra.
+    sucursal_id: Mapped[Optional[int]] = mapped_column(ForeignKey('sucursal.id'), nullable=True)
+    dia_cobro: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
 
     dispositivos = relationship(
         'Dispositivo', back_populates='contrato', cascade='all, delete-orphan'
     )
     pagos = relationship('Pago', backref='contrato', cascade='all, delete-orphan')
+    cuotas = relationship(
+        'CuotaContrato',
+        backref='contrato',
+        cascade='all, delete-orphan',
+        order_by='CuotaContrato.numero'
+    )
     modelo: Mapped['Catalogo_Modelos'] = relationship(back_populates='contratos')
     saldo_pendiente = db.Column(db.Numeric(10, 2), nullable=False, default=0)
 
-    def serialize(self) -> dict:
-        return {
+    # Control de concurrencia optimista: cada UPDATE incrementa la versión
+    version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=1, server_default=text('1')
+    )
+
+    __mapper_args__ = {'version_id_col': version}
+
+    __table_args__ = (
+        # Búsqueda de contratos vencidos por el job de morosidad
+        Index('ix_contrato_cv_estado_deuda_proximo_pago', 'estado_deuda', 'proximo_pago_fecha'),
+        # Saldo por cliente (/users/saldo y /users/buscar)
+        Index('ix_contrato_cv_cliente_id', 'cliente_id'),
+    )
+
+    def serialize(self, incluir_html: bool = False) -> dict:
+        datos = {
             'id': self.id,
             'cliente_id': self.cliente_id,
             'modelo_id': self.modelo_id,
@@ -797,7 +806,8 @@ class ContratoCompraVenta(db.Model):
             'empleado_id': self.empleado_id,
             'contrato_url': self.contrato_url,
             'hash_contrato': self.hash_contrato,
-            'contrato_html': self.contrato_html,
+            'plantilla': self.plantilla,
+            'plantilla_version': self.plantilla_version,
             'estado_deuda': self.estado_deuda.value if self.estado_deuda else None,
             'estado_contrato': self.estado_contrato.value
             if self.estado_contrato
@@ -818,6 +828,9 @@ class ContratoCompraVenta(db.Model):
             else None,
             'saldo_pendiente': self.saldo_pendiente
         }
+        if incluir_html:
+            datos['contrato_html'] = html_disponible(self)
+        return datos
 
     def __repr__(self):
         return (
@@ -827,6 +840,30 @@ class ContratoCompraVenta(db.Model):
         )
 
 
+
+# Lista de cobranza por sucursal: filtro y orden (día de cobro, saldo DESC, id) salen del índice
+Index(
+    'ix_contrato_cv_cobranza',
+    ContratoCompraVenta.sucursal_id,
+    ContratoCompraVenta.dia_cobro,
+    ContratoCompraVenta.saldo_pendiente.desc(),
+    ContratoCompraVenta.id
+)
+
+
+@event.listens_for(ContratoCompraVenta, 'before_insert')
+@event.listens_for(ContratoCompraVenta, 'before_update')
+def _columnas_de_cobranza(mapper, connection, contrato):
+    if contrato.estado_deuda == EstadoDeuda.LIQUIDADO or contrato.proximo_pago_fecha is None:
+        contrato.dia_cobro = None
+    else:
+        contrato.dia_cobro = fecha_mx(contrato.proximo_pago_fecha)
+    if inspect(contrato).attrs.empleado_id.history.has_changes():
+        contrato.sucursal_id = None if contrato.empleado_id is None else connection.scalar(
+            select(Empleado.sucursal_id).where(Empleado.id == contrato.empleado_id)
+        )
+
+
 # ──────────────────────────────────────────────
 #  Plan de Pago
 # ──────────────────────────────────────────────
@@ -865,6 +902,59 @@ class PlanPago(db.Model):
         }
 
 
+class CuotaContrato(db.Model):
+    """Una cuota semanal del plan de pagos de un contrato de compra-venta."""
+    __tablename__ = 'cuota_contrato'
+    __table_args__ = (
+        UniqueConstraint('contrato_id', 'numero', name='uq_cuota_contrato_numero'),
+        # Cuota abierta más antigua de un contrato
+        Index('ix_cuota_contrato_estado_numero', 'contrato_id', 'estado', 'numero'),
+        # "¿Qué vence esta semana?"
+        Index('ix_cuota_contrato_vencimiento_estado', 'fecha_vencimiento', 'estado'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    contrato_id: Mapped[int] = mapped_column(
+        ForeignKey('contrato_compra_venta.id', ondelete='CASCADE'), nullable=False
+    )
+    numero: Mapped[int] = mapped_column(Integer, nullable=False)
+    # En UTC sin zona horaria, igual que ContratoCompraVenta.proximo_pago_fecha
+    fecha_vencimiento: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    monto: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    monto_pagado: Mapped[Decimal] = mapped_column(
+        Numeric(10, 2), nullable=False, default=0, server_default=text('0')
+    )
+    estado: Mapped[EstadoCuota] = mapped_column(
+        SqlEnum(
+            EstadoCuota,
+            name='estado_cuota_enum',
+            native_enum=False,
+            validate_strings=True
+        ),
+        default=EstadoCuota.PENDIENTE,
+        server_default=text("'PENDIENTE'"),
+        nullable=False
+    )
+
+    @property
+    def monto_restante(self) -> Decimal:
+        return Decimal(self.monto) - Decimal(self.monto_pagado or 0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'contrato_id': self.contrato_id,
+            'numero': self.numero,
+            'fecha_vencimiento': self.fecha_vencimiento.isoformat(),
+            'monto': float(self.monto),
+            'monto_pagado': float(self.monto_pagado or 0),
+            'estado': self.estado.value
+        }
+
+    def __repr__(self):
+        return f"<Cuota {self.numero} - Contrato {self.contrato_id} - {self.estado.value}>"
+
+
 class Pago(db.Model):
     __tablename__ = 'pago'
 
@@ -905,6 +995,10 @@ class Pago(db.Model):
         return f"<Pago {self.id} - Contrato {self.contrato_id} - Monto {self.monto}>"
 
 
+# Historial por contrato paginado por cursor (fecha DESC, id DESC)
+Index('ix_pago_contrato_fecha_id', Pago.contrato_id, Pago.fecha.desc(), Pago.id.desc())
+
+
 class UserDocument(db.Model):
     __tablename__ = 'user_documents'
 
@@ -914,9 +1008,12 @@ class UserDocument(db.Model):
     # INE, PASAPORTE, etc.
     type = db.Column(db.String(50), nullable=False)
 
-    # ENCRIPTADOS
-    front_image = db.Column(db.LargeBinary, nullable=True)
-    back_image = db.Column(db.LargeBinary, nullable=True)
+    # ENCRIPTADOS; diferidos: solo se leen con .options(undefer_group('imagenes'))
+    front_image = mapped_column(db.LargeBinary, nullable=True, deferred=True, deferred_group='imagenes')
+    back_image = mapped_column(db.LargeBinary, nullable=True, deferred=True, deferred_group='imagenes')
+    # Se calculan en el mismo SELECT sin traer las imágenes
+    has_front_image = column_property(front_image.column.is_not(None))
+    has_back_image = column_property(back_image.column.is_not(None))
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -925,8 +1022,8 @@ class UserDocument(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'type': self.type,
-            'has_front_image': self.front_image is not None,
-            'has_back_image': self.back_image is not None,
+            'has_front_image': self.has_front_image,
+            'has_back_image': self.has_back_image,
             'created_at': self.created_at.isoformat()
         }
 
@@ -935,13 +1032,16 @@ class PendingIdentityDocument(db.Model):
     __tablename__ = 'pending_identity_documents'
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String, unique=True)
-    encrypted_front = db.Column(db.LargeBinary)
-    encrypted_back = db.Column(db.LargeBinary)
+    encrypted_front = mapped_column(db.LargeBinary, deferred=True, deferred_group='imagenes')
+    encrypted_back = mapped_column(db.LargeBinary, deferred=True, deferred_group='imagenes')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 class CorteCaja(db.Model):
     __tablename__ = 'corte_caja'
+    __table_args__ = (
+        Index('ix_corte_caja_fecha_sucursal', 'fecha_corte', 'sucursal_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -1013,4 +1113,241 @@ class CorteCaja(db.Model):
 
             "estado": self.estado.value,
             "observaciones": self.observaciones
-        }
\ No newline at end of file
+        }
+
+
+class TotalCajaDiario(db.Model):
+    """Acumulado por empleado, sucursal, día (hora de México) y método de pago.
+
+    Se actualiza en la misma transacción que inserta cada Pago, así abrir un
+    corte de caja solo lee unas cuantas filas.
+    """
+    __tablename__ = 'total_caja_diario'
+    __table_args__ = (
+        UniqueConstraint(
+            'empleado_id', 'sucursal_id', 'fecha', 'metodo',
+            name='uq_total_caja_diario_clave'
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    empleado_id: Mapped[int] = mapped_column(ForeignKey('empleado.id'), nullable=False)
+    sucursal_id: Mapped[int] = mapped_column(ForeignKey('sucursal.id'), nullable=False)
+    fecha: Mapped[date] = mapped_column(Date, nullable=False)
+    metodo: Mapped[str] = mapped_column(String(50), nullable=False)
+    total: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    transacciones: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'empleado_id': self.empleado_id,
+            'sucursal_id': self.sucursal_id,
+            'fecha': str(self.fecha),
+            'metodo': self.metodo,
+            'total': float(self.total),
+            'transacciones': self.transacciones
+        }
+
+
+class LlaveIdempotencia(db.Model):
+    """Respuesta guardada de un POST enviado con encabezado Idempotency-Key.
+
+    `status` es NULL mientras la petición original sigue en proceso.
+    `confirmada` se marca en la misma transacción que el commit de la vista:
+    una llave confirmada ya no se libera ni la toma un reintento.
+    """
+    __tablename__ = 'llave_idempotencia'
+    __table_args__ = (
+        UniqueConstraint('empleado_id', 'ruta', 'llave', name='uq_llave_idempotencia'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    empleado_id: Mapped[str] = mapped_column(String(50), nullable=False)
+    ruta: Mapped[str] = mapped_column(String(200), nullable=False)
+    llave: Mapped[str] = mapped_column(String(255), nullable=False)
+    huella: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    respuesta: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    confirmada: Mapped[bool] = mapped_column(
+        Boolean, default=False, server_default=text('false'), nullable=False
+    )
+    creada: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=lambda: datetime.now(timezone.utc), index=True
+    )
+
+
+class EventoOutbox(db.Model):
+    """Efecto posterior a un pago (recibo, recordatorio, desbloqueo).
+
+    Se inserta en la misma transacción que el Pago y lo procesa después el
+    despachador (`flask despachar-outbox`), nunca la petición del cajero.
+    """
+    __tablename__ = 'evento_outbox'
+    __table_args__ = (
+        Index('ix_evento_outbox_estado_disponible', 'estado', 'disponible_en'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    tipo: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    estado: Mapped[EstadoEvento] = mapped_column(
+        SqlEnum(
+            EstadoEvento,
+            name='estado_evento_enum',
+            native_enum=False,
+            validate_strings=True
+        ),
+        default=EstadoEvento.PENDIENTE,
+        server_default=text("'PENDIENTE'"),
+        nullable=False
+    )
+    intentos: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default=text('0'))
+    ultimo_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # No se procesa antes de esta fecha (UTC): reintentos con espera y recordatorios
+    disponible_en: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
+    )
+    creado: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
+    )
+    procesado: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class PuntualidadCliente(db.Model):
+    """Puntualidad de pago acumulada por cliente, para decidir crédito.
+
+    Se actualiza en la misma transacción que inserta cada Pago (ver
+    app/puntualidad.py); nunca se recalcula desde el historial de pagos.
+    """
+    __tablename__ = 'puntualidad_cliente'
+
+    cliente_id: Mapped[int] = mapped_column(
+        ForeignKey('usuario.id', ondelete='CASCADE'), primary_key=True
+    )
+    pagos: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    pagos_a_tiempo: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Pagos a tiempo seguidos, contando desde el último pago atrasado
+    racha_actual: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    racha_maxima: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    dias_atraso_total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    dias_atraso_max: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    ultimo_pago: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'cliente_id': self.cliente_id,
+            'pagos': self.pagos,
+            'pagos_a_tiempo': self.pagos_a_tiempo,
+            'razon_a_tiempo': round(self.pagos_a_tiempo / self.pagos, 4) if self.pagos else None,
+            'racha_actual': self.racha_actual,
+            'racha_maxima': self.racha_maxima,
+            'promedio_dias_atraso': round(self.dias_atraso_total / self.pagos, 2) if self.pagos else None,
+            'dias_atraso_max': self.dias_atraso_max,
+            'ultimo_pago': self.ultimo_pago.isoformat() if self.ultimo_pago else None
+        }
+
+
+class Recargo(db.Model):
+    """Recargo por semanas de pago vencidas de un contrato (ver app/recargos.py).
+
+    A lo más uno por contrato y fecha de devengo: repetir el job del día no
+    vuelve a cobrar. Es informativo: no forma parte de `saldo_pendiente`, de
+    las cuotas ni del libro.
+    """
+    __tablename__ = 'recargo'
+    __table_args__ = (
+        UniqueConstraint('contrato_id', 'fecha_devengo', name='uq_recargo_contrato_fecha'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    contrato_id: Mapped[int] = mapped_column(
+        ForeignKey('contrato_compra_venta.id', ondelete='CASCADE'), nullable=False
+    )
+    fecha_devengo: Mapped[date] = mapped_column(Date, nullable=False)
+    semanas: Mapped[int] = mapped_column(Integer, nullable=False)
+    monto: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    # Vencimiento (UTC) de la última semana cobrada; la siguiente corrida parte de ahí
+    vencimiento_hasta: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    creado: Mapped[datetime] = mapped_column(
+        DateTime, nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'contrato_id': self.contrato_id,
+            'fecha_devengo': str(self.fecha_devengo),
+            'semanas': self.semanas,
+            'monto': float(self.monto),
+            'vencimiento_hasta': self.vencimiento_hasta.isoformat()
+        }
+
+
+class MovimientoLibro(db.Model):
+    """Línea del libro de partida doble de los contratos (ver app/libro.py).
+
+    Solo se agregan filas: un pago o un contrato nuevo generan un asiento
+    cuyas líneas suman lo mismo al debe que al haber. El saldo de un
+    contrato en CUENTAS_POR_COBRAR es la suma de debe - haber de sus líneas.
+    """
+    __tablename__ = 'movimiento_libro'
+    __table_args__ = (
+        # Saldo histórico: la cola de movimientos de un contrato después de su corte
+        Index('ix_movimiento_libro_contrato_cuenta_fecha', 'contrato_id', 'cuenta', 'fecha'),
+        # Cortes de saldo de toda la cartera
+        Index('ix_movimiento_libro_cuenta_fecha', 'cuenta', 'fecha'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    contrato_id: Mapped[int] = mapped_column(ForeignKey('contrato_compra_venta.id'), nullable=False)
+    # En UTC sin zona horaria, igual que ContratoCompraVenta.proximo_pago_fecha
+    fecha: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    cuenta: Mapped[str] = mapped_column(String(40), nullable=False)
+    debe: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    haber: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    # Qué originó el asiento: CONTRATO, PAGO o APERTURA, y su id
+    referencia_tipo: Mapped[str] = mapped_column(String(20), nullable=False)
+    referencia_id: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'contrato_id': self.contrato_id,
+            'fecha': self.fecha.isoformat(),
+            'cuenta': self.cuenta,
+            'debe': float(self.debe),
+            'haber': float(self.haber),
+            'referencia_tipo': self.referencia_tipo,
+            'referencia_id': self.referencia_id
+        }
+
+
+class SaldoContratoCorte(db.Model):
+    """Saldo por cobrar de un contrato a una fecha de corte (fin de mes).
+
+    Los contratos con saldo cero no tienen fila: su saldo al corte es 0.
+    """
+    __tablename__ = 'saldo_contrato_corte'
+
+    contrato_id: Mapped[int] = mapped_column(ForeignKey('contrato_compra_venta.id'), primary_key=True)
+    fecha_corte: Mapped[datetime] = mapped_column(DateTime, primary_key=True, index=True)
+    saldo: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)
+
+
+class TerminoContrato(db.Model):
+    """Índice invertido del texto de los contratos HTML (ver app/indice_contratos.py).
+
+    Una fila por término distinto de cada documento, con cuántas veces aparece.
+    `tipo` es BURO o COMPRA_VENTA; no hay llave foránea porque también se
+    indexan archivos de la carpeta de contratos sin fila en la base.
+    """
+    __tablename__ = 'termino_contrato'
+    __table_args__ = (
+        # Reindexar un contrato al firmarlo: borrar sus términos anteriores
+        Index('ix_termino_contrato_documento', 'tipo', 'contrato_id'),
+    )
+
+    termino: Mapped[str] = mapped_column(String(64), primary_key=True)
+    tipo: Mapped[str] = mapped_column(String(20), primary_key=True)
+    contrato_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    frecuencia: Mapped[int] = mapped_column(Integer, nullable=False)
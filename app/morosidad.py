@@ -0,0 +1,84 @@
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from app import db
+from app.models import ContratoCompraVenta, EstadoDeuda
+
+
+LOTE_POR_DEFECTO = 1000
+
+# Estados que pasan a ATRASADO cuando vence `proximo_pago_fecha`
+ESTADOS_VIGENTES = (EstadoDeuda.AL_DIA, EstadoDeuda.PENDIENTE)
+
+
+def _actualizar_en_lotes(condicion, nuevo_estado: EstadoDeuda, lote: int) -> tuple[int, int]:
+    """
+    Cambia `estado_deuda` de los contratos que cumplen `condicion` con un
+    UPDATE por lote y un commit por lote, para no retener bloqueos sobre
+    miles de filas. Devuelve (filas_cambiadas, lotes).
+    """
+    cambiadas = 0
+    lotes = 0
+    while True:
+        ids = (
+            select(ContratoCompraVenta.id)
+            .where(condicion)
+            .limit(lote)
+            # Las filas bloqueadas por un cobro en curso se toman en la siguiente corrida
+            .with_for_update(skip_locked=True)
+        )
+        resultado = db.session.execute(
+            update(ContratoCompraVenta)
+            .where(ContratoCompraVenta.id.in_(ids.scalar_subquery()))
+            # Solo estados abiertos: dia_cobro y sucursal_id (lista de cobranza) no cambian
+            .values(
+                estado_deuda=nuevo_estado,
+                version=ContratoCompraVenta.version + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        lotes += 1
+        cambiadas += resultado.rowcount
+        if resultado.rowcount < lote:
+            return cambiadas, lotes
+
+
+def actualizar_morosidad(ahora: datetime = None, lote: int = LOTE_POR_DEFECTO) -> dict:
+    """
+    Marca como ATRASADO todo contrato vigente cuyo `proximo_pago_fecha` ya
+    pasó, y regresa a AL_DIA los atrasados que ya se pusieron al corriente.
+
+    Ambas búsquedas usan el índice (estado_deuda, proximo_pago_fecha).
+
+    Returns:
+        dict: filas cambiadas por tipo, lotes ejecutados y duración.
+    """
+    # proximo_pago_fecha se guarda en UTC sin zona horaria
+    ahora = ahora or datetime.now(timezone.utc).replace(tzinfo=None)
+    inicio = time.perf_counter()
+
+    atrasados, lotes_atraso = _actualizar_en_lotes(
+        ContratoCompraVenta.estado_deuda.in_(ESTADOS_VIGENTES)
+        & (ContratoCompraVenta.proximo_pago_fecha < ahora),
+        EstadoDeuda.ATRASADO,
+        lote
+    )
+    regularizados, lotes_regularizacion = _actualizar_en_lotes(
+        (ContratoCompraVenta.estado_deuda == EstadoDeuda.ATRASADO)
+        & (ContratoCompraVenta.proximo_pago_fecha >= ahora),
+        EstadoDeuda.AL_DIA,
+        lote
+    )
+
+    resumen = {
+        'atrasados': atrasados,
+        'regularizados': regularizados,
+        'lotes': lotes_atraso + lotes_regularizacion,
+        'segundos': round(time.perf_counter() - inicio, 3)
+    }
+    current_app.logger.info('Morosidad actualizada: %s', resumen)
+    return resumen
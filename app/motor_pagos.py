@@ -0,0 +1,211 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm.exc import StaleDataError
+
+from app import db
+from app.models import Pago, ContratoCompraVenta, EstadoDeuda, EstadoCuota
+from app.caja import acumular_pago
+from app.cuotas import cuotas_abiertas, aplicar_a_cuotas, restantes_centavos
+from app.outbox import eventos_de_pago, encolar
+from app.puntualidad import registrar_puntualidad, dias_de_atraso
+from app.libro import asentar, asiento_de_pago
+from app.errores import ErrorDeNegocio
+from app.dinero import a_centavos, a_decimal, a_float, residuo
+from app.fechas import ZONA_MX
+
+
+# Reintentos cuando otra transacción modificó el contrato primero
+# (solo ocurre en motores sin SELECT ... FOR UPDATE, p. ej. SQLite).
+MAX_REINTENTOS = 5
+
+
+class ErrorPago(ErrorDeNegocio):
+    """Error de validación al aplicar un pago."""
+
+
+def validar_sin_cuotas(monto: int, saldo: int, pago_semanal: int, ultimo_pago: int) -> None:
+    """
+    Reglas de monto (centavos) de un contrato sin cuotas: el saldo completo, o
+    al menos un pago semanal en múltiplos de él o igual al último pago.
+    Lanza ErrorPago si el monto no se acepta.
+    """
+    if monto == saldo:
+        return
+    if monto < pago_semanal:
+        raise ErrorPago(f"El monto mínimo es {a_float(pago_semanal)}")
+    if residuo(monto, pago_semanal) != 0 and monto != ultimo_pago:
+        raise ErrorPago('El monto debe ser múltiplo del pago semanal o igual al último pago.')
+
+
+def validar_con_cuotas(monto: int, saldo: int, minimo: int, en_cuotas: int) -> bool:
+    """
+    Reglas de monto (centavos) de un contrato con cuotas: desde lo que falta de
+    la cuota abierta más antigua (`minimo`) hasta lo que falta de todas las
+    abiertas (`en_cuotas`), o el saldo completo para liquidar. Devuelve si el
+    pago liquida el contrato; lanza ErrorPago si el monto no se acepta.
+    """
+    liquidar = monto >= saldo
+    if not liquidar and monto < minimo:
+        raise ErrorPago(f"El monto mínimo es {a_float(minimo)}")
+    # Lo que exceda las cuotas no quedaría en ninguna: solo se acepta liquidando el saldo
+    if not liquidar and monto > en_cuotas:
+        raise ErrorPago(
+            f"El monto excede lo que falta de las cuotas ({a_float(en_cuotas)}); "
+            f"para liquidar paga el saldo pendiente ({a_float(saldo)})."
+        )
+    return liquidar
+
+
+def _aplicar_sin_cuotas(contrato: ContratoCompraVenta, monto: int, ahora_utc: datetime) -> int:
+    """Contratos anteriores al calendario de cuotas: semanas por múltiplos del pago semanal."""
+    pago_semanal = a_centavos(contrato.pago_semanal)
+    ultimo_pago = a_centavos(contrato.ultimo_pago_semanal)
+    saldo_pendiente = a_centavos(contrato.saldo_pendiente)
+    validar_sin_cuotas(monto, saldo_pendiente, pago_semanal, ultimo_pago)
+
+    # ✔ Si paga el total
+    if monto == saldo_pendiente:
+        pagos_cubiertos = contrato.num_pagos_semanales
+    else:
+        pagos_cubiertos = monto // pago_semanal
+
+    # Actualizar semanas
+    if monto == saldo_pendiente or monto == ultimo_pago:
+        contrato.num_pagos_semanales = 0
+    else:
+        contrato.num_pagos_semanales = max(
+            contrato.num_pagos_semanales - pagos_cubiertos, 0
+        )
+
+    semanas_por_sumar = pagos_cubiertos if pagos_cubiertos > 0 else 1
+    if contrato.proximo_pago_fecha is None:
+        contrato.proximo_pago_fecha = ahora_utc
+    contrato.proximo_pago_fecha += timedelta(days=7 * semanas_por_sumar)
+    return pagos_cubiertos
+
+
+def _aplicar_con_cuotas(contrato: ContratoCompraVenta, abiertas: list, monto: int) -> int:
+    """Abona a la cuota abierta más antigua y sigue con las siguientes."""
+    restantes = restantes_centavos(abiertas)
+    liquidar = validar_con_cuotas(
+        monto, a_centavos(contrato.saldo_pendiente), int(restantes[0]), int(restantes.sum())
+    )
+
+    pagos_cubiertos = aplicar_a_cuotas(abiertas, monto, liquidar=liquidar)
+
+    pendientes = [c for c in abiertas if c.estado != EstadoCuota.PAGADA]
+    contrato.num_pagos_semanales = len(pendientes)
+    if pendientes:
+        contrato.proximo_pago_fecha = pendientes[0].fecha_vencimiento
+    return pagos_cubiertos
+
+
+def aplicar_monto(contrato: ContratoCompraVenta, abiertas: list, monto: int, ahora_utc: datetime) -> int:
+    """
+    Valida `monto` (centavos) contra el contrato y, si es válido, actualiza en
+    memoria el contrato y sus cuotas abiertas. No inserta el Pago ni hace
+    commit; si lanza ErrorPago no modificó nada.
+
+    Returns:
+        int: semanas (cuotas) cubiertas por el pago.
+    """
+    if contrato.estado_deuda == EstadoDeuda.LIQUIDADO:
+        raise ErrorPago('El contrato ya está liquidado', 409)
+
+    saldo_pendiente = a_centavos(contrato.saldo_pendiente)
+    if abiertas:
+        pagos_cubiertos = _aplicar_con_cuotas(contrato, abiertas, monto)
+    else:
+        pagos_cubiertos = _aplicar_sin_cuotas(contrato, monto, ahora_utc)
+
+    # Actualizar saldo
+    contrato.saldo_pendiente = a_decimal(max(saldo_pendiente - monto, 0))
+
+    # Si ya terminó
+    if contrato.saldo_pendiente <= 0 or contrato.num_pagos_semanales == 0:
+        contrato.estado_deuda = EstadoDeuda.LIQUIDADO
+    elif (
+        contrato.estado_deuda == EstadoDeuda.ATRASADO
+        and contrato.proximo_pago_fecha >= ahora_utc
+    ):
+        contrato.estado_deuda = EstadoDeuda.AL_DIA
+    return pagos_cubiertos
+
+
+def _aplicar_pago(contrato_id, monto: int, metodo, sucursal_id, empleado_id):
+    # 🔒 Bloquea solo la fila del contrato hasta el commit
+    contrato = db.session.execute(
+        db.select(ContratoCompraVenta)
+        .where(ContratoCompraVenta.id == contrato_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    if not contrato:
+        raise ErrorPago('Contrato no encontrado', 404)
+
+    ahora = datetime.now(ZONA_MX)
+    # proximo_pago_fecha se guarda en UTC sin zona, igual que al crear el contrato
+    ahora_utc = ahora.astimezone(timezone.utc).replace(tzinfo=None)
+    estado_anterior = contrato.estado_deuda
+    vencimiento = contrato.proximo_pago_fecha
+    saldo_anterior = a_centavos(contrato.saldo_pendiente)
+    pagos_cubiertos = aplicar_monto(contrato, cuotas_abiertas(contrato.id), monto, ahora_utc)
+
+    pago = Pago(
+        sucursal_id=sucursal_id,
+        contrato_id=contrato.id,
+        empleado_id=empleado_id,
+        monto=a_decimal(monto),
+        metodo=metodo,
+        fecha=ahora
+    )
+    db.session.add(pago)
+    db.session.flush()
+    acumular_pago(empleado_id, sucursal_id, ahora.date(), metodo, a_decimal(monto))
+    registrar_puntualidad(contrato.cliente_id, [dias_de_atraso(vencimiento, ahora_utc)], ahora_utc)
+    asentar(asiento_de_pago(
+        pago.id, contrato.id, ahora_utc, monto, saldo_anterior - a_centavos(contrato.saldo_pendiente)
+    ))
+    # Recibo, recordatorio y desbloqueo los procesa el despachador del outbox
+    encolar(eventos_de_pago(
+        {'id': pago.id, 'contrato_id': contrato.id, 'monto': pago.monto, 'metodo': metodo, 'fecha': ahora},
+        contrato,
+        estado_anterior
+    ))
+
+    db.session.commit()
+    return pago, contrato, pagos_cubiertos
+
+
+def registrar_pago_contrato(contrato_id, monto, metodo, sucursal_id, empleado_id):
+    """
+    Aplica un pago a un contrato en una sola transacción corta.
+
+    La fila del contrato se bloquea con SELECT ... FOR UPDATE, de modo que dos
+    cajeros que cobran el mismo contrato se serializan entre sí sin bloquear
+    al resto de la tabla. En motores que ignoran FOR UPDATE, la columna
+    `version` del contrato detecta la escritura concurrente y se reintenta.
+
+    Returns:
+        tuple: (pago, contrato, pagos_cubiertos) ya confirmados.
+
+    Raises:
+        ErrorPago: si el contrato no existe o el monto no es válido.
+    """
+    try:
+        monto = a_centavos(monto)
+    except (TypeError, ArithmeticError):
+        raise ErrorPago('Monto inválido') from None
+    if monto <= 0:
+        raise ErrorPago('El monto debe ser mayor a 0')
+
+    for _ in range(MAX_REINTENTOS):
+        try:
+            return _aplicar_pago(contrato_id, monto, metodo, sucursal_id, empleado_id)
+        except StaleDataError:
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    raise ErrorPago('El contrato está siendo modificado, intenta de nuevo.', 409)
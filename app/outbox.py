@@ -0,0 +1,195 @@
+"""
+Outbox transaccional para los efectos posteriores a un pago.
+
+El motor de pagos solo inserta filas en `evento_outbox` dentro de la misma
+transacción que el Pago; el despachador (`flask despachar-outbox`) las toma
+por lotes, ejecuta el manejador de cada tipo y reintenta con espera
+exponencial las que fallan. Así la petición del cajero no espera al SMTP.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import insert, select, update
+
+from app import db
+from app.models import (
+    EventoOutbox, EstadoEvento, ContratoCompraVenta, Usuario, Dispositivo,
+    EstadoDispositivo, EstadoDeuda
+)
+from app.utils import send_email
+
+
+RECIBO_PAGO = 'RECIBO_PAGO'
+RECORDATORIO_PAGO = 'RECORDATORIO_PAGO'
+DESBLOQUEO_DISPOSITIVO = 'DESBLOQUEO_DISPOSITIVO'
+
+LOTE_POR_DEFECTO = 100
+MAX_INTENTOS = 6
+# Un lote reclamado no lo ve otro despachador durante este plazo; debe
+# alcanzar para procesar el lote completo. Si el despachador muere, los
+# eventos que no alcanzó vuelven a estar disponibles al vencer.
+PLAZO_RECLAMO = timedelta(minutes=10)
+
+# El recordatorio sale un día antes del próximo pago
+ANTICIPACION_RECORDATORIO = timedelta(days=1)
+
+_manejadores = {}
+
+
+def _ahora():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def manejador(tipo: str):
+    """Registra la función que procesa los eventos de `tipo`."""
+    def registrar(fn):
+        _manejadores[tipo] = fn
+        return fn
+    return registrar
+
+
+def eventos_de_pago(pago: dict, contrato: ContratoCompraVenta, estado_anterior) -> list:
+    """
+    Filas de outbox que genera un pago ya aplicado a `contrato`.
+    `pago` necesita id, contrato_id, monto, metodo y fecha.
+    """
+    ahora = _ahora()
+    base = {
+        'pago_id': pago['id'],
+        'contrato_id': pago['contrato_id'],
+        'monto': str(pago['monto']),
+        'metodo': pago['metodo'],
+        'fecha': pago['fecha'].isoformat()
+    }
+    eventos = [{'tipo': RECIBO_PAGO, 'payload': json.dumps(base), 'disponible_en': ahora}]
+
+    if contrato.estado_deuda != EstadoDeuda.LIQUIDADO and contrato.proximo_pago_fecha:
+        proximo = contrato.proximo_pago_fecha
+        eventos.append({
+            'tipo': RECORDATORIO_PAGO,
+            'payload': json.dumps({**base, 'proximo_pago': proximo.isoformat()}),
+            'disponible_en': max(proximo - ANTICIPACION_RECORDATORIO, ahora)
+        })
+
+    if estado_anterior == EstadoDeuda.ATRASADO and contrato.estado_deuda != EstadoDeuda.ATRASADO:
+        eventos.append({'tipo': DESBLOQUEO_DISPOSITIVO, 'payload': json.dumps(base), 'disponible_en': ahora})
+    return eventos
+
+
+def encolar(eventos: list) -> None:
+    """Inserta los eventos con un solo INSERT. No hace commit."""
+    if eventos:
+        db.session.execute(
+            insert(EventoOutbox),
+            [{**e, 'estado': EstadoEvento.PENDIENTE, 'intentos': 0, 'creado': _ahora()} for e in eventos]
+        )
+
+
+def _cliente(contrato_id):
+    return db.session.execute(
+        select(Usuario)
+        .join(ContratoCompraVenta, ContratoCompraVenta.cliente_id == Usuario.id)
+        .where(ContratoCompraVenta.id == contrato_id)
+    ).scalar_one_or_none()
+
+
+@manejador(RECIBO_PAGO)
+def _enviar_recibo(datos):
+    cliente = _cliente(datos['contrato_id'])
+    if cliente is None or not cliente.correo:
+        return
+    send_email(
+        f"Recibo de pago #{datos['pago_id']}",
+        f"<p>Recibimos tu pago de ${datos['monto']} ({datos['metodo']}) "
+        f"para el contrato {datos['contrato_id']} el {datos['fecha'][:10]}.</p>",
+        cliente.correo
+    )
+
+
+@manejador(RECORDATORIO_PAGO)
+def _enviar_recordatorio(datos):
+    contrato = db.session.get(ContratoCompraVenta, datos['contrato_id'])
+    # Si después de este pago hubo otro, el recordatorio ya no aplica
+    if (
+        contrato is None
+        or contrato.estado_deuda == EstadoDeuda.LIQUIDADO
+        or contrato.proximo_pago_fecha is None
+        or contrato.proximo_pago_fecha.isoformat() != datos['proximo_pago']
+    ):
+        return
+    cliente = _cliente(contrato.id)
+    if cliente is None or not cliente.correo:
+        return
+    send_email(
+        'Recordatorio de pago',
+        f"<p>Tu próximo pago de ${contrato.pago_semanal} para el contrato {contrato.id} "
+        f"vence el {datos['proximo_pago'][:10]}.</p>",
+        cliente.correo
+    )
+
+
+@manejador(DESBLOQUEO_DISPOSITIVO)
+def _desbloquear_dispositivos(datos):
+    resultado = db.session.execute(
+        update(Dispositivo)
+        .where(
+            Dispositivo.contrato_id == datos['contrato_id'],
+            Dispositivo.estado == EstadoDispositivo.BLOQUEADO
+        )
+        .values(estado=EstadoDispositivo.ACTIVO)
+    )
+    current_app.logger.info(
+        f"Contrato {datos['contrato_id']}: {resultado.rowcount} dispositivo(s) desbloqueado(s)"
+    )
+
+
+def despachar(lote: int = LOTE_POR_DEFECTO) -> dict:
+    """
+    Procesa un lote de eventos pendientes y disponibles.
+
+    Primero reclama el lote en una transacción corta (FOR UPDATE SKIP LOCKED
+    y `disponible_en` movido `PLAZO_RECLAMO` hacia adelante) y después
+    confirma cada evento en su propia transacción al terminar su manejador,
+    así una caída a media tanda no vuelve a enviar los recibos ya enviados.
+    Un evento que falla se reprograma con espera exponencial y se marca
+    FALLIDO al llegar a MAX_INTENTOS.
+    """
+    ahora = _ahora()
+    ids = db.session.execute(
+        select(EventoOutbox.id)
+        .where(EventoOutbox.estado == EstadoEvento.PENDIENTE, EventoOutbox.disponible_en <= ahora)
+        .order_by(EventoOutbox.disponible_en, EventoOutbox.id)
+        .limit(lote)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if ids:
+        db.session.execute(
+            update(EventoOutbox).where(EventoOutbox.id.in_(ids)).values(disponible_en=ahora + PLAZO_RECLAMO)
+        )
+    db.session.commit()
+
+    resumen = {'procesados': len(ids), 'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+    for evento in db.session.execute(
+        select(EventoOutbox).where(EventoOutbox.id.in_(ids)).order_by(EventoOutbox.id)
+    ).scalars().all():
+        try:
+            with db.session.begin_nested():
+                _manejadores[evento.tipo](json.loads(evento.payload))
+        except Exception as e:
+            evento.intentos += 1
+            evento.ultimo_error = f"{type(e).__name__}: {e}"
+            if evento.intentos >= MAX_INTENTOS:
+                evento.estado = EstadoEvento.FALLIDO
+                resumen['fallidos'] += 1
+            else:
+                evento.disponible_en = _ahora() + timedelta(minutes=2 ** evento.intentos)
+                resumen['reintentos'] += 1
+            current_app.logger.warning(f"Evento {evento.id} ({evento.tipo}) falló: {evento.ultimo_error}")
+        else:
+            evento.estado = EstadoEvento.ENVIADO
+            evento.procesado = _ahora()
+            resumen['enviados'] += 1
+        db.session.commit()
+
+    return resumen
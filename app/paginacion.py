@@ -0,0 +1,32 @@
+import base64
+import json
+from datetime import datetime
+
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+
+def codificar_cursor(*valores) -> str:
+    """Cursor opaco (base64 URL-safe) con los valores de la última fila enviada."""
+    serializables = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    crudo = json.dumps(serializables, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor: str) -> list:
+    """Inverso de `codificar_cursor`. Lanza ValueError si el cursor no es válido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Cursor inválido') from e
+    if not isinstance(valores, list):
+        raise ValueError('Cursor inválido')
+    return valores
+
+
+def leer_limite(args) -> int:
+    """Lee `?limite=` de la petición acotándolo a [1, LIMITE_MAXIMO]."""
+    limite = args.get('limite', LIMITE_POR_DEFECTO, type=int)
+    return max(1, min(limite or LIMITE_POR_DEFECTO, LIMITE_MAXIMO))
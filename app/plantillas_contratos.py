@@ -0,0 +1,173 @@
+"""
+Plantillas versionadas de los contratos.
+
+Un contrato generado con plantilla se guarda como (plantilla, versión,
+variables en JSON canónico, hash) en lugar del HTML completo: el servidor
+renderiza el HTML al firmar para validar el hash que vio el cliente, y lo
+vuelve a renderizar cuando alguien abre el contrato.
+
+Una versión publicada no se modifica nunca: `PLANTILLAS` guarda el SHA-256
+de cada archivo y la plantilla no se compila si no coincide. Para cambiar el
+texto se agrega una versión nueva; los contratos anteriores siguen con la
+suya. Cada plantilla se compila una sola vez por proceso y los HTML ya
+renderizados se guardan en un caché LRU por hash, que es también la
+verificación de que el render reproduce exactamente lo que se firmó.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, TemplateError
+
+from app.errores import ErrorDeNegocio
+
+
+CARPETA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'contratos')
+
+# nombre → versión → (archivo, SHA-256 del archivo). .gitattributes los marca
+# -text para que git no les cambie los fines de línea al hacer checkout.
+PLANTILLAS = {
+    'compra_venta': {
+        1: ('compra_venta_v1.html', 'e18dcbda50950ad9c6ba213c88ad72804615aec25ec64b53ba7fb3582cac1a13'),
+    },
+    'consulta_buro': {
+        1: ('consulta_buro_v1.html', '6c6ecbba2bf123e90a931936c1bc0a0bd03c721b631ae18d46e60ca899f04c56'),
+    },
+}
+MAX_RENDERS = 256
+
+
+class ErrorPlantilla(ErrorDeNegocio):
+    """Plantilla o variables inválidas."""
+
+
+class PlantillaAlterada(RuntimeError):
+    """La plantilla publicada cambió o su render ya no reproduce el hash firmado."""
+
+
+def _pesos(valor) -> str:
+    try:
+        monto = Decimal(str(valor))
+    except (InvalidOperation, ValueError):
+        monto = None
+    if isinstance(valor, bool) or monto is None or not monto.is_finite():
+        raise ErrorPlantilla(f"No se pudo generar el contrato: {valor!r} no es un monto válido")
+    return f"${monto:,.2f}"
+
+
+_entorno = Environment(
+    loader=FileSystemLoader(CARPETA),
+    autoescape=True,
+    undefined=StrictUndefined,
+    # Compilada una vez; las versiones publicadas no cambian
+    auto_reload=False,
+    keep_trailing_newline=True
+)
+_entorno.filters['pesos'] = _pesos
+
+_compiladas = {}
+_renders = OrderedDict()
+_candado = threading.Lock()
+
+
+def version_vigente(nombre: str) -> int:
+    if nombre not in PLANTILLAS:
+        raise ErrorPlantilla(f"Plantilla {nombre!r} no existe", 404)
+    return max(PLANTILLAS[nombre])
+
+
+def catalogo() -> list:
+    return [
+        {'plantilla': nombre, 'versiones': sorted(versiones), 'vigente': max(versiones)}
+        for nombre, versiones in sorted(PLANTILLAS.items())
+    ]
+
+
+def _plantilla(nombre: str, version: int):
+    clave = (nombre, version)
+    compilada = _compiladas.get(clave)
+    if compilada is not None:
+        return compilada
+    try:
+        archivo, hash_esperado = PLANTILLAS[nombre][version]
+    except KeyError:
+        raise ErrorPlantilla(f"Plantilla {nombre!r} versión {version} no existe", 404) from None
+    with open(os.path.join(CARPETA, archivo), 'rb') as f:
+        if hashlib.sha256(f.read()).hexdigest() != hash_esperado:
+            raise PlantillaAlterada(
+                f"La plantilla {archivo} cambió después de publicarse; agrega una versión nueva"
+            )
+    compilada = _entorno.get_template(archivo)
+    with _candado:
+        _compiladas[clave] = compilada
+    return compilada
+
+
+def variables_canonicas(variables) -> str:
+    """JSON con llaves ordenadas y sin espacios: las mismas variables dan siempre el mismo texto."""
+    if not isinstance(variables, dict):
+        raise ErrorPlantilla('variables debe ser un objeto JSON')
+    return json.dumps(variables, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def _renderizar(nombre: str, version: int, variables_json: str) -> str:
+    try:
+        return _plantilla(nombre, version).render(json.loads(variables_json))
+    except TemplateError as e:
+        # StrictUndefined: falta una variable de la plantilla
+        raise ErrorPlantilla(f"No se pudo generar el contrato: {e}") from None
+
+
+def _recordar(hash_hex: str, html: str) -> None:
+    with _candado:
+        _renders[hash_hex] = html
+        _renders.move_to_end(hash_hex)
+        while len(_renders) > MAX_RENDERS:
+            _renders.popitem(last=False)
+
+
+def renderizar(nombre: str, version, variables) -> dict:
+    """
+    HTML del contrato a partir de la plantilla (versión vigente si `version`
+    es None) y sus variables. Devuelve plantilla, versión, variables
+    canónicas, HTML y hash.
+
+    Raises:
+        ErrorPlantilla: si la plantilla no existe, faltan variables o un
+            monto no es numérico.
+    """
+    try:
+        version = version_vigente(nombre) if version is None else int(version)
+    except (TypeError, ValueError):
+        raise ErrorPlantilla('version debe ser un entero') from None
+    variables_json = variables_canonicas(variables)
+    html = _renderizar(nombre, version, variables_json)
+    hash_hex = hashlib.sha256(html.encode('utf-8')).hexdigest()
+    _recordar(hash_hex, html)
+    return {
+        'plantilla': nombre,
+        'version': version,
+        'variables': variables_json,
+        'contrato_html': html,
+        'hash_contrato': hash_hex
+    }
+
+
+def html_guardado(nombre: str, version: int, variables_json: str, hash_contrato: str) -> str:
+    """
+    HTML de un contrato firmado con plantilla, desde el caché o renderizado
+    de nuevo. Lanza PlantillaAlterada si el render ya no reproduce el hash firmado.
+    """
+    with _candado:
+        html = _renders.get(hash_contrato)
+        if html is not None:
+            _renders.move_to_end(hash_contrato)
+            return html
+    html = _renderizar(nombre, version, variables_json)
+    if hashlib.sha256(html.encode('utf-8')).hexdigest() != hash_contrato:
+        raise PlantillaAlterada(f"El contrato con plantilla {nombre} v{version} ya no reproduce su hash firmado")
+    _recordar(hash_contrato, html)
+    return html
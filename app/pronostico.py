@@ -0,0 +1,160 @@
+"""
+Pronóstico semanal de cobranza de los contratos abiertos.
+
+Los datos de cada contrato (pago semanal, último pago, pagos restantes,
+próximo pago, sucursal y plan) se cargan una vez en arreglos NumPy y se
+guardan en memoria por `TTL_SEGUNDOS`. Cada pronóstico es aritmética sobre
+esos arreglos: cuotas de cada contrato se acumulan por semana con arreglos de
+diferencias y `np.bincount`, sin recorrer contratos en Python.
+"""
+import threading
+import time
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select
+
+from app import db
+from app.models import ContratoCompraVenta, Empleado, EstadoDeuda
+from app.cartera import probabilidad_incumplimiento
+from app.dinero import a_centavos_arreglo
+
+
+TTL_SEGUNDOS = 300
+MAX_SEMANAS = 104
+AGRUPACIONES = {'sucursal': 'sucursal_id', 'plan': 'plan_pago_id'}
+SIN_GRUPO = -1
+
+_base = {'arreglos': None, 'vence': 0.0}
+_candado = threading.Lock()
+
+
+def _cargar_arreglos() -> dict:
+    consulta = (
+        select(
+            Empleado.sucursal_id,
+            ContratoCompraVenta.plan_pago_id,
+            ContratoCompraVenta.pago_semanal,
+            ContratoCompraVenta.ultimo_pago_semanal,
+            ContratoCompraVenta.num_pagos_semanales,
+            ContratoCompraVenta.proximo_pago_fecha
+        )
+        .outerjoin(Empleado, Empleado.id == ContratoCompraVenta.empleado_id)
+        .where(
+            ContratoCompraVenta.estado_deuda != EstadoDeuda.LIQUIDADO,
+            ContratoCompraVenta.num_pagos_semanales > 0,
+            ContratoCompraVenta.proximo_pago_fecha.isnot(None)
+        )
+        .execution_options(yield_per=10000)
+    )
+    columnas = list(zip(*db.session.execute(consulta))) or [()] * 6
+    sucursal, plan, semanal, ultimo, restantes, proximo = columnas
+
+    semanal = a_centavos_arreglo([v or 0 for v in semanal])
+    ultimo = a_centavos_arreglo([v or 0 for v in ultimo])
+    return {
+        'sucursal_id': np.array([SIN_GRUPO if v is None else v for v in sucursal], dtype=np.int64),
+        'plan_pago_id': np.array([SIN_GRUPO if v is None else v for v in plan], dtype=np.int64),
+        'semanal': semanal,
+        # Sin último pago registrado, la última cuota es una cuota normal
+        'ultimo': np.where(ultimo > 0, ultimo, semanal),
+        'restantes': np.array(restantes, dtype=np.int64),
+        'proximo': np.array(proximo, dtype='datetime64[D]')
+    }
+
+
+def arreglos_base(refrescar: bool = False) -> dict:
+    """Arreglos de los contratos abiertos, desde el caché si no han vencido."""
+    with _candado:
+        if refrescar or _base['arreglos'] is None or _base['vence'] < time.monotonic():
+            _base['arreglos'] = _cargar_arreglos()
+            _base['vence'] = time.monotonic() + TTL_SEGUNDOS
+        return _base['arreglos']
+
+
+def _por_semana(semanal, ultimo, s, fin, grupos, num_grupos: int, semanas: int) -> np.ndarray:
+    """
+    Suma por grupo y semana de las cuotas que caen en las `semanas` visibles.
+
+    La cuota j de un contrato cae en la semana `s + j`; las cuotas 0..n-2 valen
+    `semanal` y la n-1 (semana `fin`) vale `ultimo`. Las cuotas normales se
+    suman con un arreglo de diferencias: +semanal en la primera semana visible
+    y -semanal después de la última, y luego una suma acumulada.
+    """
+    ancho = semanas + 1
+    inicio_n = np.maximum(s, 0)
+    fin_n = np.minimum(fin - 1, semanas - 1)
+    hay = inicio_n <= fin_n
+    base = grupos[hay] * ancho
+    diferencias = np.bincount(base + inicio_n[hay], weights=semanal[hay], minlength=num_grupos * ancho)
+    diferencias -= np.bincount(base + fin_n[hay] + 1, weights=semanal[hay], minlength=num_grupos * ancho)
+    total = np.cumsum(diferencias.reshape(num_grupos, ancho), axis=1)[:, :semanas]
+
+    visible = (fin >= 0) & (fin < semanas)
+    total += np.bincount(
+        grupos[visible] * semanas + fin[visible], weights=ultimo[visible], minlength=num_grupos * semanas
+    ).reshape(num_grupos, semanas)
+    return total
+
+
+def pronosticar(desde: date, semanas: int, por: str = None, refrescar: bool = False) -> dict:
+    """
+    Cobranza programada y esperada por semana para las `semanas` que empiezan
+    en `desde`, opcionalmente por sucursal o por plan (`por`).
+
+    Esperado = programado × (1 - probabilidad de incumplimiento del tramo de
+    atraso actual del contrato). `vencido` es lo que debió cobrarse antes de
+    `desde` y sigue pendiente.
+    """
+    a = arreglos_base(refrescar)
+    if por is not None:
+        claves, grupos = np.unique(a[AGRUPACIONES[por]], return_inverse=True)
+    else:
+        claves, grupos = np.array([SIN_GRUPO]), np.zeros(len(a['semanal']), dtype=np.int64)
+    num_grupos = len(claves)
+
+    inicio = np.datetime64(desde, 'D')
+    s = (a['proximo'] - inicio).astype(np.int64) // 7
+    fin = s + a['restantes'] - 1
+
+    programado = _por_semana(a['semanal'], a['ultimo'], s, fin, grupos, num_grupos, semanas)
+    dias_atraso = np.clip((inicio - a['proximo']).astype(np.int64), 0, None)
+    cumplimiento = 1.0 - probabilidad_incumplimiento(dias_atraso)
+    esperado = _por_semana(
+        a['semanal'] * cumplimiento, a['ultimo'] * cumplimiento, s, fin, grupos, num_grupos, semanas
+    )
+
+    normales_vencidas = np.clip(np.minimum(fin - 1, -1) - s + 1, 0, None)
+    vencido = np.bincount(
+        grupos,
+        weights=a['semanal'] * normales_vencidas + np.where(fin < 0, a['ultimo'], 0),
+        minlength=num_grupos
+    )
+
+    fechas = [str(inicio + np.timedelta64(7 * w, 'D')) for w in range(semanas)]
+
+    def pesos(centavos):
+        return [round(float(c) / 100, 2) for c in centavos]
+
+    series = []
+    for i, clave in enumerate(claves.tolist()):
+        serie = {
+            'semanas': [
+                {'inicio': f, 'programado': p, 'esperado': e}
+                for f, p, e in zip(fechas, pesos(programado[i]), pesos(esperado[i]))
+            ],
+            'total_programado': round(float(programado[i].sum()) / 100, 2),
+            'total_esperado': round(float(esperado[i].sum()) / 100, 2),
+            'vencido': round(float(vencido[i]) / 100, 2)
+        }
+        if por is not None:
+            serie[AGRUPACIONES[por]] = None if clave == SIN_GRUPO else clave
+        series.append(serie)
+
+    resultado = {'desde': str(inicio), 'semanas': semanas, 'contratos': int(len(a['semanal']))}
+    if por is None:
+        resultado.update(series[0])
+    else:
+        resultado['por'] = por
+        resultado['grupos'] = series
+    return resultado
@@ -0,0 +1,217 @@
+"""
+Estadísticas de puntualidad de pago por cliente (tabla puntualidad_cliente).
+
+Cada pago se compara contra el vencimiento que cubre (el `proximo_pago_fecha`
+del contrato antes de aplicarlo) y suma a los contadores del cliente con un
+solo UPSERT en la transacción del pago. Leer la puntualidad de un cliente es
+leer una fila; nunca se recorre su historial de pagos.
+
+`reconstruir_puntualidad` (comando `flask reconstruir-puntualidad`) recalcula
+la tabla desde los pagos guardados; se corre una vez al crearla para que los
+pagos anteriores cuenten.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import update, case, select, delete, insert
+
+from app import db
+from app.models import PuntualidadCliente, ContratoCompraVenta, CuotaContrato, Pago
+from app.caja import insert_upsert
+from app.fechas import fecha_mx
+
+
+def dias_de_atraso(vencimiento: datetime, ahora_utc: datetime) -> int:
+    """
+    Días naturales (hora de México) entre el vencimiento y el pago; 0 si se
+    pagó a tiempo o el contrato no tenía vencimiento. Ambas fechas en UTC sin
+    zona horaria, como `proximo_pago_fecha`.
+    """
+    if vencimiento is None:
+        return 0
+    return max((fecha_mx(ahora_utc) - fecha_mx(vencimiento)).days, 0)
+
+
+def _resumir(dias: list) -> dict:
+    """Contadores de una secuencia de pagos en orden (días de atraso de cada uno)."""
+    rachas = [0]
+    for d in dias:
+        rachas.append(rachas[-1] + 1 if d == 0 else 0)
+    a_tiempo = sum(1 for d in dias if d == 0)
+    return {
+        'pagos': len(dias),
+        'pagos_a_tiempo': a_tiempo,
+        'dias_atraso_total': sum(dias),
+        'dias_atraso_max': max(dias),
+        # Pagos a tiempo antes del primer atraso: alargan la racha que ya traía el cliente
+        'racha_inicial': next((i for i, d in enumerate(dias) if d > 0), len(dias)),
+        'racha_final': rachas[-1],
+        'racha_maxima': max(rachas),
+        'todos_a_tiempo': a_tiempo == len(dias)
+    }
+
+
+def _mayor(a, b):
+    return case((a > b, a), else_=b)
+
+
+def registrar_puntualidad(cliente_id: int, dias: list, fecha: datetime) -> None:
+    """
+    Suma a las estadísticas del cliente los pagos con esos `dias` de atraso
+    (en el orden en que se hicieron). No hace commit: debe llamarse en la
+    misma transacción que inserta los Pago.
+    """
+    if cliente_id is None or not dias:
+        return
+
+    r = _resumir(dias)
+    p = PuntualidadCliente
+    # Las expresiones del SET leen los valores que tenía la fila antes del UPDATE
+    cambios = {
+        'pagos': p.pagos + r['pagos'],
+        'pagos_a_tiempo': p.pagos_a_tiempo + r['pagos_a_tiempo'],
+        'dias_atraso_total': p.dias_atraso_total + r['dias_atraso_total'],
+        'dias_atraso_max': _mayor(p.dias_atraso_max, r['dias_atraso_max']),
+        'racha_actual': p.racha_actual + r['pagos'] if r['todos_a_tiempo'] else r['racha_final'],
+        'racha_maxima': _mayor(_mayor(p.racha_maxima, p.racha_actual + r['racha_inicial']), r['racha_maxima']),
+        'ultimo_pago': fecha
+    }
+    nueva = {
+        'cliente_id': cliente_id,
+        'pagos': r['pagos'],
+        'pagos_a_tiempo': r['pagos_a_tiempo'],
+        'dias_atraso_total': r['dias_atraso_total'],
+        'dias_atraso_max': r['dias_atraso_max'],
+        'racha_actual': r['racha_final'],
+        'racha_maxima': r['racha_maxima'],
+        'ultimo_pago': fecha
+    }
+
+    insert_dialecto = insert_upsert()
+    if insert_dialecto is not None:
+        db.session.execute(
+            insert_dialecto(PuntualidadCliente).values(**nueva)
+            .on_conflict_do_update(index_elements=['cliente_id'], set_=cambios)
+        )
+        return
+
+    resultado = db.session.execute(update(PuntualidadCliente).filter_by(cliente_id=cliente_id).values(cambios))
+    if resultado.rowcount == 0:
+        db.session.add(PuntualidadCliente(**nueva))
+
+
+def _vencimientos(contrato, cuotas: list, pagos: list) -> list:
+    """
+    Vencimiento que cubrió cada pago del contrato, en el orden de `pagos`.
+
+    Con cuotas es el de la cuota más antigua que seguía abierta cuando llegó
+    el pago. Sin cuotas se retroceden desde `proximo_pago_fecha` las semanas
+    que avanzó cada pago (una por cada pago semanal completo, al menos una).
+    """
+    if cuotas:
+        cubierto = list(accumulate(c.monto for c in cuotas))
+        vencimientos, pagado, i = [], 0, 0
+        for pago in pagos:
+            while i < len(cuotas) and cubierto[i] <= pagado:
+                i += 1
+            vencimientos.append(cuotas[i].fecha_vencimiento if i < len(cuotas) else None)
+            pagado += pago.monto
+        return vencimientos
+
+    if contrato.proximo_pago_fecha is None or not contrato.pago_semanal:
+        return [None] * len(pagos)
+    semanas = [max(int(pago.monto // contrato.pago_semanal), 1) for pago in pagos]
+    vencimiento = contrato.proximo_pago_fecha - timedelta(weeks=sum(semanas))
+    vencimientos = []
+    for avance in semanas:
+        vencimientos.append(vencimiento)
+        vencimiento += timedelta(weeks=avance)
+    return vencimientos
+
+
+def reconstruir_puntualidad(lote: int = 200) -> dict:
+    """
+    Recalcula `puntualidad_cliente` desde la tabla de pagos, por lotes de
+    clientes con un commit por lote. Reemplaza las filas de cada cliente, así
+    que debe correr sin pagos entrando (p. ej. justo después de la migración).
+    Las fechas de pago se leen en UTC, como en `Pago.to_dict`.
+    """
+    resumen = {'clientes': 0, 'pagos': 0}
+    ultimo_cliente = 0
+    while True:
+        clientes = db.session.execute(
+            select(ContratoCompraVenta.cliente_id)
+            .where(ContratoCompraVenta.cliente_id > ultimo_cliente)
+            .group_by(ContratoCompraVenta.cliente_id)
+            .order_by(ContratoCompraVenta.cliente_id)
+            .limit(lote)
+        ).scalars().all()
+        if not clientes:
+            break
+
+        contratos = db.session.execute(
+            select(
+                ContratoCompraVenta.id, ContratoCompraVenta.cliente_id,
+                ContratoCompraVenta.proximo_pago_fecha, ContratoCompraVenta.pago_semanal
+            ).where(ContratoCompraVenta.cliente_id.in_(clientes))
+        ).all()
+        ids = [c.id for c in contratos]
+        cuotas, pagos = defaultdict(list), defaultdict(list)
+        for cuota in db.session.execute(
+            select(CuotaContrato.contrato_id, CuotaContrato.fecha_vencimiento, CuotaContrato.monto)
+            .where(CuotaContrato.contrato_id.in_(ids))
+            .order_by(CuotaContrato.contrato_id, CuotaContrato.numero)
+        ):
+            cuotas[cuota.contrato_id].append(cuota)
+        for pago in db.session.execute(
+            select(Pago.contrato_id, Pago.id, Pago.fecha, Pago.monto)
+            .where(Pago.contrato_id.in_(ids))
+            .order_by(Pago.contrato_id, Pago.fecha, Pago.id)
+        ):
+            pagos[pago.contrato_id].append(pago)
+
+        # (fecha, id del pago, días de atraso) de todos los contratos de cada cliente
+        por_cliente = defaultdict(list)
+        for contrato in contratos:
+            del_contrato = pagos[contrato.id]
+            for pago, vencimiento in zip(del_contrato, _vencimientos(contrato, cuotas[contrato.id], del_contrato)):
+                por_cliente[contrato.cliente_id].append((pago.fecha, pago.id, dias_de_atraso(vencimiento, pago.fecha)))
+
+        filas = []
+        for cliente_id, historial in por_cliente.items():
+            if not historial:
+                continue
+            historial.sort()
+            r = _resumir([dias for _, _, dias in historial])
+            filas.append({
+                'cliente_id': cliente_id,
+                'pagos': r['pagos'],
+                'pagos_a_tiempo': r['pagos_a_tiempo'],
+                'dias_atraso_total': r['dias_atraso_total'],
+                'dias_atraso_max': r['dias_atraso_max'],
+                'racha_actual': r['racha_final'],
+                'racha_maxima': r['racha_maxima'],
+                'ultimo_pago': historial[-1][0]
+            })
+            resumen['pagos'] += r['pagos']
+
+        db.session.execute(delete(PuntualidadCliente).where(PuntualidadCliente.cliente_id.in_(clientes)))
+        if filas:
+            db.session.execute(insert(PuntualidadCliente), filas)
+        db.session.commit()
+
+        resumen['clientes'] += len(filas)
+        ultimo_cliente = clientes[-1]
+    return resumen
+
+
+def puntualidad_de_cliente(cliente_id: int) -> dict:
+    """Estadísticas del cliente; en cero si todavía no tiene pagos registrados."""
+    fila = db.session.get(PuntualidadCliente, cliente_id)
+    if fila is None:
+        fila = PuntualidadCliente(
+            cliente_id=cliente_id, pagos=0, pagos_a_tiempo=0, racha_actual=0,
+            racha_maxima=0, dias_atraso_total=0, dias_atraso_max=0
+        )
+    return fila.to_dict()
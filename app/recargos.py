@@ -0,0 +1,163 @@
+"""
+Devengo de recargos por semana de pago vencida.
+
+Cada semana vencida de un contrato abierto genera un recargo de
+`TASA_RECARGO` × pago semanal, una sola vez: cada fila de `recargo` guarda el
+vencimiento de la última semana que cobró (`vencimiento_hasta`) y la
+siguiente corrida solo cobra las semanas posteriores. El job recorre los
+contratos vencidos por lotes de id; por lote hace un SELECT con el último
+vencimiento ya cobrado de cada contrato, calcula las semanas con NumPy e
+inserta todos los recargos con un INSERT masivo. Un contrato tiene a lo más
+un recargo por fecha de devengo, así que repetir la corrida de un día no
+vuelve a cobrar.
+
+Los recargos son informativos: no se suman a `saldo_pendiente` ni a las
+cuotas, el motor de pagos no los cobra, el simulador no los incluye en el
+monto para liquidar y no generan asiento en el libro (ni cuenta por cobrar ni
+ingreso). Sirven para consultar en GET /<id>/recargos cuánto se habría
+cobrado por atraso; cobrarlos requiere primero llevarlos al motor de pagos.
+"""
+import time as reloj
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, func, insert, exists
+
+from app import db
+from app.models import ContratoCompraVenta, Recargo, EstadoDeuda
+from app.caja import insert_upsert
+from app.dinero import a_centavos, a_centavos_arreglo, a_decimal, a_float
+from app.fechas import ZONA_MX
+
+
+LOTE_POR_DEFECTO = 1000
+TASA_RECARGO = 0.05
+SEMANA = np.timedelta64(7, 'D')
+
+
+def _corte(fecha: date) -> datetime:
+    """Fin del día `fecha` en hora de México, en UTC sin zona horaria."""
+    fin = datetime.combine(fecha + timedelta(days=1), time.min, tzinfo=ZONA_MX)
+    return fin.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _lote_vencido(fecha: date, corte: datetime, despues_de: int, lote: int):
+    """Contratos vencidos con id > `despues_de`, sin recargo de `fecha`, con su último vencimiento cobrado."""
+    # Usa el índice único (contrato_id, fecha_devengo) de recargo
+    cobrado = (
+        select(func.max(Recargo.vencimiento_hasta))
+        .where(Recargo.contrato_id == ContratoCompraVenta.id)
+        .scalar_subquery()
+    )
+    return db.session.execute(
+        select(
+            ContratoCompraVenta.id,
+            ContratoCompraVenta.pago_semanal,
+            ContratoCompraVenta.proximo_pago_fecha,
+            cobrado.label('hasta')
+        )
+        .where(
+            ContratoCompraVenta.id > despues_de,
+            ContratoCompraVenta.estado_deuda != EstadoDeuda.LIQUIDADO,
+            ContratoCompraVenta.proximo_pago_fecha < corte,
+            ~exists().where(Recargo.contrato_id == ContratoCompraVenta.id, Recargo.fecha_devengo == fecha)
+        )
+        .order_by(ContratoCompraVenta.id)
+        .limit(lote)
+    ).all()
+
+
+def calcular_recargos(filas, corte: datetime, tasa: float = TASA_RECARGO) -> dict:
+    """
+    Semanas por cobrar y monto (centavos) de cada contrato del lote.
+
+    Las semanas vencidas son los vencimientos `proximo + 7k` anteriores al
+    corte; de ellas se descuentan las que ya cubre el último recargo.
+    """
+    ids, semanal, proximo, hasta = zip(*filas)
+    proximo = np.array(proximo, dtype='datetime64[s]')
+    hasta = np.array([np.datetime64('NaT') if h is None else h for h in hasta], dtype='datetime64[s]')
+
+    # Primera semana vencida que no se ha cobrado
+    nuevo_atraso = np.isnat(hasta) | (hasta < proximo)
+    primera = np.where(nuevo_atraso, proximo, hasta + SEMANA)
+    dias = (np.datetime64(corte, 's') - primera) / np.timedelta64(1, 'D')
+    semanas = np.where(dias > 0, np.ceil(dias / 7), 0).astype(np.int64)
+    cargo = np.rint(a_centavos_arreglo([s or 0 for s in semanal]) * tasa).astype(np.int64)
+
+    return {
+        'contrato_id': np.array(ids, dtype=np.int64),
+        'semanas': semanas,
+        'monto': semanas * cargo,
+        'vencimiento_hasta': primera + (semanas - 1) * SEMANA
+    }
+
+
+def _insertar(recargos: dict, fecha: date) -> tuple:
+    """Inserta los recargos con monto > 0 en un solo INSERT. Devuelve (filas, centavos)."""
+    cobrar = recargos['monto'] > 0
+    if not cobrar.any():
+        return 0, 0
+    ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+    filas = [
+        {
+            'contrato_id': int(contrato_id),
+            'fecha_devengo': fecha,
+            'semanas': int(semanas),
+            'monto': a_decimal(monto),
+            'vencimiento_hasta': hasta.item(),
+            'creado': ahora
+        }
+        for contrato_id, semanas, monto, hasta in zip(
+            recargos['contrato_id'][cobrar], recargos['semanas'][cobrar],
+            recargos['monto'][cobrar], recargos['vencimiento_hasta'][cobrar]
+        )
+    ]
+    insert_dialecto = insert_upsert()
+    if insert_dialecto is not None:
+        # Otra corrida simultánea del mismo día pudo insertar primero
+        stmt = insert_dialecto(Recargo).on_conflict_do_nothing(index_elements=['contrato_id', 'fecha_devengo'])
+    else:
+        stmt = insert(Recargo)
+    # Solo cuentan las filas que sí se insertaron
+    insertados = db.session.execute(stmt.returning(Recargo.monto), filas).scalars().all()
+    return len(insertados), sum(a_centavos(monto) for monto in insertados)
+
+
+def devengar_recargos(fecha: date = None, lote: int = LOTE_POR_DEFECTO, tasa: float = TASA_RECARGO) -> dict:
+    """
+    Genera los recargos de las semanas vencidas hasta el fin de `fecha` (hoy
+    en hora de México por defecto). Un commit por lote.
+
+    Returns:
+        dict: contratos revisados, recargos insertados, monto, lotes, duración
+        y filas por segundo.
+    """
+    fecha = fecha or datetime.now(ZONA_MX).date()
+    corte = _corte(fecha)
+    inicio = reloj.perf_counter()
+    resumen = {'fecha': fecha.isoformat(), 'contratos': 0, 'recargos': 0, 'monto_total': 0, 'lotes': 0}
+
+    ultimo_id = 0
+    while True:
+        filas = _lote_vencido(fecha, corte, ultimo_id, lote)
+        if not filas:
+            break
+        insertados, monto = _insertar(calcular_recargos(filas, corte, tasa), fecha)
+        resumen['recargos'] += insertados
+        resumen['monto_total'] += monto
+        db.session.commit()
+
+        resumen['contratos'] += len(filas)
+        resumen['lotes'] += 1
+        ultimo_id = filas[-1].id
+        if len(filas) < lote:
+            break
+
+    segundos = reloj.perf_counter() - inicio
+    resumen['monto_total'] = a_float(resumen['monto_total'])
+    resumen['segundos'] = round(segundos, 3)
+    resumen['filas_por_segundo'] = round(resumen['recargos'] / segundos) if segundos else 0
+    current_app.logger.info('Recargos devengados: %s', resumen)
+    return resumen
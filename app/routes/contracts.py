@@ -1,5 +1,12 @@
-from flask import Blueprint, request, jsonify, send_from_directory, abort, current_app
+from flask import Blueprint, request, jsonify, send_from_directory, abort, current_app, url_for
 from app.models import ContratoConsultaBuro, EstadoContrato, db
+from app.almacen_contratos import guardar
+from app.indice_contratos import indexar, buscar, BURO
+from app.entrega_contratos import respuesta_de, respuesta_de_documento
+from app.plantillas_contratos import renderizar, catalogo, ErrorPlantilla
+from app.paginacion import leer_limite
+from app.utils import incluye
+from sqlalchemy.orm import undefer
 from datetime import datetime
 import os
 import hashlib
@@ -7,7 +14,7 @@ import hashlib
 # Blueprint
 contratos_bp = Blueprint('contratos', __name__, url_prefix='/api/contratos')
 
-# Carpeta donde se guardarán todos los contratos HTML
+# Carpeta de los contratos HTML firmados antes del almacén por hash (app/almacen_contratos.py)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 CONTRATOS_DIR = os.path.join(BASE_DIR, '../static/contratos')
 os.makedirs(CONTRATOS_DIR, exist_ok=True)
@@ -56,8 +63,12 @@ def crear_contrato():
 # -----------------------------
 @contratos_bp.route('/todos', methods=['GET'])
 def obtener_todos_contratos():
-    contratos = ContratoConsultaBuro.query.all()
-    return jsonify({'contratos': [c.serialize() for c in contratos]}), 200
+    # contrato_html solo con ?include=html; sin él la consulta no lo lee
+    con_html = incluye(request.args, 'html')
+    consulta = ContratoConsultaBuro.query
+    if con_html:
+        consulta = consulta.options(undefer(ContratoConsultaBuro.contrato_html))
+    return jsonify({'contratos': [c.serialize(incluir_html=con_html) for c in consulta.all()]}), 200
 
 
 # -----------------------------
@@ -68,7 +79,7 @@ def obtener_contrato_por_id(contrato_id):
     contrato = ContratoConsultaBuro.query.get(contrato_id)
     if not contrato:
         return jsonify({'error': 'Contrato no encontrado'}), 404
-    return jsonify({'contrato': contrato.serialize()}), 200
+    return jsonify({'contrato': contrato.serialize(incluir_html=incluye(request.args, 'html'))}), 200
 
 
 # -----------------------------
@@ -81,6 +92,15 @@ def firmar_contrato():
     contrato_html = data.get('contrato_html')
     hash_contrato = data.get('hash_contrato')
 
+    # Con plantilla el servidor genera el HTML; el cliente solo manda las variables
+    generado = None
+    if data.get('plantilla'):
+        try:
+            generado = renderizar(data['plantilla'], data.get('version'), data.get('variables'))
+        except ErrorPlantilla as e:
+            return jsonify({'error': e.mensaje}), e.status
+        contrato_html = generado['contrato_html']
+
     if not all([contrato_id, contrato_html, hash_contrato]):
         return jsonify({'error': 'Faltan datos para firmar el contrato'}), 400
 
@@ -89,23 +109,28 @@ def firmar_contrato():
     if hash_servidor != hash_contrato:
         return jsonify({'success': False, 'message': 'El hash no coincide. El contrato fue alterado.'}), 400
 
-    # Guardar archivo HTML
-    ruta_archivo = os.path.join(CONTRATOS_DIR, f'contrato_{contrato_id}.html')
-    with open(ruta_archivo, 'w', encoding='utf-8') as f:
-        f.write(contrato_html)
-
-    contrato_url = f"{request.host_url}static/contratos/contrato_{contrato_id}.html"
-
     contrato = ContratoConsultaBuro.query.get(contrato_id)
     if not contrato:
         return jsonify({'error': 'Contrato no encontrado'}), 404
 
+    # Con plantilla se guardan sus variables; si no, el HTML comprimido en el almacén por hash
+    if generado:
+        contrato.plantilla = generado['plantilla']
+        contrato.plantilla_version = generado['version']
+        contrato.variables = generado['variables']
+    else:
+        guardar(contrato_html)
+        contrato.plantilla = contrato.plantilla_version = contrato.variables = None
+    contrato_url = request.host_url.rstrip('/') + url_for('contratos.abrir_contrato', contrato_id=contrato.id)
+
     # Actualizar campos de firma
     contrato.fecha_firma = data.get('fecha_firma', datetime.utcnow())
     contrato.estado_contrato = EstadoContrato.FIRMADO.value
-    contrato.contrato_html = contrato_html
+    contrato.contrato_html = None
     contrato.hash_contrato = hash_contrato
     contrato.contrato_url = contrato_url
+    # Términos del contrato para la búsqueda por contenido
+    indexar(BURO, contrato.id, contrato_html)
 
     db.session.commit()
 
@@ -113,15 +138,54 @@ def firmar_contrato():
 
 
 # -----------------------------
-# Listar archivos HTML en carpeta
+# Plantillas de contrato
+# -----------------------------
+@contratos_bp.route('/plantillas', methods=['GET'])
+def listar_plantillas():
+    return jsonify({'plantillas': catalogo()}), 200
+
+
+@contratos_bp.route('/plantillas/<nombre>/vista-previa', methods=['POST'])
+def vista_previa_plantilla(nombre):
+    # El cliente muestra este HTML y firma con su hash_contrato
+    data = request.get_json() or {}
+    try:
+        generado = renderizar(nombre, data.get('version'), data.get('variables'))
+    except ErrorPlantilla as e:
+        return jsonify({'error': e.mensaje}), e.status
+    return jsonify({
+        'plantilla': generado['plantilla'],
+        'version': generado['version'],
+        'hash_contrato': generado['hash_contrato'],
+        'contrato_html': generado['contrato_html']
+    }), 200
+
+
+# -----------------------------
+# Listar contratos HTML disponibles
 # -----------------------------
 @contratos_bp.route('/contratos', methods=['GET'])
 def listar_contratos():
     if not os.path.exists(CONTRATOS_DIR):
         return {"error": "La carpeta de contratos no existe"}, 404
 
-    contratos = [f for f in os.listdir(CONTRATOS_DIR) if f.endswith('.html')]
-    return {"contratos_disponibles": contratos}
+    contratos = {f for f in os.listdir(CONTRATOS_DIR) if f.endswith('.html')}
+    # Firmados en el almacén por hash: no tienen archivo en la carpeta
+    firmados = db.session.query(ContratoConsultaBuro.id).filter(ContratoConsultaBuro.hash_contrato.isnot(None))
+    contratos.update(f"contrato_{contrato_id}.html" for contrato_id, in firmados)
+    return {"contratos_disponibles": sorted(contratos)}
+
+
+# -----------------------------
+# Buscar contratos por contenido (índice invertido)
+# -----------------------------
+@contratos_bp.route('/buscar', methods=['GET'])
+def buscar_contratos():
+    consulta = request.args.get('q', '').strip()
+    if not consulta:
+        return jsonify({'error': 'El parámetro q es requerido'}), 400
+
+    return jsonify({'consulta': consulta, 'resultados': buscar(consulta, leer_limite(request.args))}), 200
 
 
 # -----------------------------
@@ -129,6 +193,13 @@ def listar_contratos():
 # -----------------------------
 @contratos_bp.route('/contratos/<contrato_id>', methods=['GET'])
 def abrir_contrato(contrato_id):
+    # Contrato firmado: ETag = su hash (304 sin leerlo) y el blob gzip sin descomprimir
+    if contrato_id.isdigit():
+        contrato = ContratoConsultaBuro.query.get(int(contrato_id))
+        respuesta = respuesta_de(contrato) if contrato else None
+        if respuesta is not None:
+            return respuesta
+
     # Buscamos coincidencia exacta
     archivo = f"contrato_{contrato_id}.html"
     ruta_archivo = os.path.join(CONTRATOS_DIR, archivo)
@@ -136,21 +207,16 @@ def abrir_contrato(contrato_id):
     if os.path.exists(ruta_archivo):
         return send_from_directory(CONTRATOS_DIR, archivo)
 
-    # Si no existe, buscamos por contenido dentro de los HTML
-    encontrados = []
-    for f in os.listdir(CONTRATOS_DIR):
-        if f.endswith('.html'):
-            with open(os.path.join(CONTRATOS_DIR, f), 'r', encoding='utf-8') as file:
-                if contrato_id in file.read():
-                    encontrados.append(f)
-
+    # Si no existe, buscamos por contenido en el índice invertido
+    encontrados = buscar(contrato_id, limite=1)
     if encontrados:
-        # Devuelve el primero que coincida por contenido
-        return send_from_directory(CONTRATOS_DIR, encontrados[0])
+        # Devuelve el de mayor puntaje
+        respuesta = respuesta_de_documento(encontrados[0]['tipo'], encontrados[0]['contrato_id'])
+        if respuesta is not None:
+            return respuesta
 
-    # Si no hay coincidencias, devolvemos error con lista de archivos existentes
-    contratos_existentes = [f for f in os.listdir(CONTRATOS_DIR) if f.endswith('.html')]
+    # Sin coincidencias; la lista de contratos está en /contratos
     return jsonify({
         "error": f"Contrato {contrato_id} no encontrado",
-        "contratos_disponibles": contratos_existentes
+        "contratos_disponibles": url_for('contratos.listar_contratos')
     }), 404
@@ -1,16 +1,33 @@
-from flask import Blueprint, request, jsonify, send_from_directory
-from app.models import ContratoCompraVenta, Usuario, PlanPago, db, Pago
+from flask import Blueprint, request, jsonify, send_from_directory, url_for
+from app.models import ContratoCompraVenta, Usuario, PlanPago, db, Pago, CuotaContrato, Empleado, Recargo
 from app.utils import calcular_plan_pago
-from decimal import Decimal
-from datetime import datetime, timedelta
+from app.cuotas import generar_cuotas, CUOTAS_ABIERTAS
+from app.dinero import a_centavos, a_decimal, CENTAVOS_POR_PESO
+from app.idempotencia import idempotente
+from app.decoradores import roles_required
+from app.cartera import analizar_cartera, PERIODO_ROLL_DIAS
+from app.pronostico import pronosticar, AGRUPACIONES, MAX_SEMANAS
+from app.cobranza import lista_de_cobranza, contar
+from app.simulador import simular, ErrorSimulacion
+from app.libro import asentar, asiento_de_contrato, saldo_al, reporte_de_corte, inicio_del_dia
+from app.fechas import a_utc
+from app.almacen_contratos import guardar
+from app.entrega_contratos import respuesta_de
+from app.indice_contratos import indexar, COMPRA_VENTA
+from app.utils import incluye
+from app.plantillas_contratos import renderizar, ErrorPlantilla
+from sqlalchemy.orm import undefer
+from app.paginacion import codificar_cursor, decodificar_cursor, leer_limite
+from datetime import datetime, timedelta, date
 from zoneinfo import ZoneInfo
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from decimal import Decimal, InvalidOperation
 import hashlib
 import os
 
 contratos_cv_bp = Blueprint('contratos_cv', __name__, url_prefix='/api/contratos/compra-venta')
 
-# 📂 Carpeta donde se guardarán los contratos HTML
+# 📂 Carpeta de los contratos HTML firmados antes del almacén por hash (app/almacen_contratos.py)
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 CONTRATOS_DIR = os.path.join(BASE_DIR, '../static/contratos')
 os.makedirs(CONTRATOS_DIR, exist_ok=True)
@@ -21,6 +38,7 @@ os.makedirs(CONTRATOS_DIR, exist_ok=True)
 # ------------------------------------------------------------
 @contratos_cv_bp.route('/crear', methods=['POST'])
 @jwt_required()
+@idempotente
 def crear_contrato_compra_venta():
     user_id = get_jwt_identity()
     data = request.get_json()
@@ -58,46 +76,53 @@ def crear_contrato_compra_venta():
         }), 400
 
     try:
-        monto_total_dec = Decimal(str(monto_total))
-        monto_base_dec = Decimal(str(monto_base)) if monto_base else monto_total_dec
-        pago_inicial_dec = Decimal(str(pago_inicial))
+        monto_total_c = a_centavos(monto_total)
+        monto_base_c = a_centavos(monto_base) if monto_base else monto_total_c
+        pago_inicial_c = a_centavos(pago_inicial)
 
         # Validación
-        if pago_inicial_dec < 0 or pago_inicial_dec > (monto_base_dec / 2):
+        if pago_inicial_c < 0 or pago_inicial_c * 2 > monto_base_c:
             return jsonify({"error": "Pago inicial inválido"}), 400
 
-        resultado_plan = calcular_plan_pago(plan, monto_total_dec, pago_inicial_dec, monto_base_dec)
+        resultado_plan = calcular_plan_pago(plan, monto_total, pago_inicial, monto_base or monto_total)
         ultima_cuota = resultado_plan["cuotas"][-1] if resultado_plan["cuotas"] else 0
+        cuotas_c = [c * CENTAVOS_POR_PESO for c in resultado_plan["cuotas"]]
 
         # Actualizar plan
         plan.ultima_cuota_semanal = ultima_cuota
         db.session.commit()
 
         # Crear contrato
+        primer_vencimiento = datetime.utcnow() + timedelta(weeks=1)
         contrato = ContratoCompraVenta(
             cliente_id=cliente_id,
             modelo_id=modelo_id,  # 🔥 NUEVO
-            precio_total=monto_total_dec,
-            pago_inicial=pago_inicial_dec,
+            precio_total=a_decimal(monto_total_c),
+            pago_inicial=a_decimal(pago_inicial_c),
             plan_pago_id=plan.id,
-            pago_semanal=Decimal(str(resultado_plan["cuota_semanal"])),
-            ultimo_pago_semanal=Decimal(str(ultima_cuota)),
+            pago_semanal=a_decimal(resultado_plan["cuota_semanal"] * CENTAVOS_POR_PESO),
+            ultimo_pago_semanal=a_decimal(ultima_cuota * CENTAVOS_POR_PESO),
             num_pagos_semanales=plan.duracion_semanas,
-            proximo_pago_fecha=datetime.utcnow() + timedelta(weeks=1),
+            proximo_pago_fecha=primer_vencimiento,
             estado_contrato="PENDIENTE",
-            saldo_pendiente=monto_total_dec   # 🔥 NO SE RESTA EL INICIAL
+            saldo_pendiente=a_decimal(monto_total_c)   # 🔥 NO SE RESTA EL INICIAL
         )
 
         db.session.add(contrato)
         db.session.flush()  # 🔥 Necesario para obtener contrato.id antes de commit
 
+        # 📅 Calendario de cuotas en un solo INSERT
+        generar_cuotas(contrato.id, cuotas_c, primer_vencimiento)
+        # 📒 Asiento de la venta (y del enganche) en el libro
+        asentar(asiento_de_contrato(contrato.id, datetime.utcnow(), monto_total_c, pago_inicial_c))
+
         # ---------------------------------------
         # 🔥 REGISTRAR PAGO INICIAL SIN AFECTAR DEUDA
         # ---------------------------------------
-        if pago_inicial_dec > 0:
+        if pago_inicial_c > 0:
             pago = Pago(
                 contrato_id=contrato.id,
-                monto=pago_inicial_dec,
+                monto=a_decimal(pago_inicial_c),
                 metodo=metodo_inicial,
                 empleado_id=user_id,  # Opcional
                 fecha=datetime.now(ZoneInfo("America/Mexico_City"))  # 🔥 FECHA LOCAL
@@ -109,7 +134,7 @@ def crear_contrato_compra_venta():
         return jsonify({
             "mensaje": "Contrato de compra-venta creado correctamente",
             "contrato": contrato.serialize(),
-            "pago_inicial_registrado": True if pago_inicial_dec > 0 else False,
+            "pago_inicial_registrado": pago_inicial_c > 0,
             "plan_actualizado": {
                 "id": plan.id,
                 "nombre_plan": plan.nombre_plan,
@@ -128,8 +153,12 @@ def crear_contrato_compra_venta():
 # ------------------------------------------------------------
 @contratos_cv_bp.route('/todos', methods=['GET'])
 def obtener_todos_compra_venta():
-    contratos = ContratoCompraVenta.query.all()
-    return jsonify({"contratos": [c.serialize() for c in contratos]}), 200
+    # contrato_html solo con ?include=html; sin él la consulta no lo lee
+    con_html = incluye(request.args, 'html')
+    consulta = ContratoCompraVenta.query
+    if con_html:
+        consulta = consulta.options(undefer(ContratoCompraVenta.contrato_html))
+    return jsonify({"contratos": [c.serialize(incluir_html=con_html) for c in consulta.all()]}), 200
 
 
 # ------------------------------------------------------------
@@ -140,7 +169,181 @@ def obtener_compra_venta_por_id(contrato_id):
     contrato = ContratoCompraVenta.query.get(contrato_id)
     if not contrato:
         return jsonify({"error": "Contrato no encontrado"}), 404
-    return jsonify({"contrato": contrato.serialize()}), 200
+    return jsonify({"contrato": contrato.serialize(incluir_html=incluye(request.args, 'html'))}), 200
+
+
+# ------------------------------------------------------------
+# 2️⃣.1 Antigüedad y riesgo de la cartera
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/cartera/riesgo', methods=['GET'])
+@roles_required({'GERENTE', 'ADMIN'})
+def riesgo_cartera():
+    try:
+        corte = a_utc(datetime.fromisoformat(request.args["corte"])) if "corte" in request.args else None
+        periodo_dias = int(request.args.get("periodo_dias", PERIODO_ROLL_DIAS))
+    except ValueError:
+        return jsonify({"error": "corte debe ser fecha ISO y periodo_dias un entero"}), 400
+    if periodo_dias <= 0:
+        return jsonify({"error": "periodo_dias debe ser mayor a 0"}), 400
+
+    return jsonify(analizar_cartera(corte, periodo_dias)), 200
+
+
+# ------------------------------------------------------------
+# 2️⃣.2 Pronóstico semanal de cobranza
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/cartera/pronostico', methods=['GET'])
+@roles_required({'GERENTE', 'ADMIN'})
+def pronostico_cobranza():
+    try:
+        desde = date.fromisoformat(request.args["desde"]) if "desde" in request.args else datetime.utcnow().date()
+        semanas = int(request.args.get("semanas", 12))
+    except ValueError:
+        return jsonify({"error": "desde debe ser fecha ISO y semanas un entero"}), 400
+    if not 1 <= semanas <= MAX_SEMANAS:
+        return jsonify({"error": f"semanas debe estar entre 1 y {MAX_SEMANAS}"}), 400
+
+    por = request.args.get("por")
+    if por is not None and por not in AGRUPACIONES:
+        return jsonify({"error": "por debe ser sucursal o plan"}), 400
+
+    return jsonify(pronosticar(desde, semanas, por, refrescar=request.args.get("refrescar") == "1")), 200
+
+
+# ------------------------------------------------------------
+# 2️⃣.3 Lista de cobranza de la sucursal (vencen hoy o atrasados)
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/cobranza', methods=['GET'])
+@jwt_required()
+def lista_cobranza():
+    empleado = db.session.get(Empleado, int(get_jwt_identity()))
+    if empleado is None:
+        return jsonify({"error": "Empleado no encontrado"}), 404
+
+    # Solo gerentes y administradores pueden ver otras sucursales
+    sucursal_id = request.args.get("sucursal_id", empleado.sucursal_id, type=int)
+    if sucursal_id != empleado.sucursal_id and get_jwt().get("role", "").upper() not in {'GERENTE', 'ADMIN'}:
+        return jsonify({"error": "No puedes ver la cobranza de otra sucursal"}), 403
+
+    despues_de = None
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            dia_iso, saldo, ultimo_id = decodificar_cursor(cursor)
+            despues_de = [date.fromisoformat(dia_iso), Decimal(saldo), int(ultimo_id)]
+        except (ValueError, TypeError, InvalidOperation):
+            return jsonify({"error": "Cursor inválido"}), 400
+
+    contratos, ultima = lista_de_cobranza(sucursal_id, leer_limite(request.args), despues_de)
+    return jsonify({
+        "sucursal_id": sucursal_id,
+        "conteo": contar(sucursal_id),
+        "contratos": contratos,
+        "siguiente_cursor": codificar_cursor(*ultima) if ultima else None
+    }), 200
+
+
+# ------------------------------------------------------------
+# 2️⃣.4 Saldo por cobrar al corte de mes (solo lee los cortes)
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/saldos/corte', methods=['GET'])
+@roles_required({'GERENTE', 'ADMIN'})
+def reporte_corte_saldos():
+    try:
+        fecha = date.fromisoformat(request.args["fecha"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "fecha es requerida (YYYY-MM-DD)"}), 400
+    return jsonify(reporte_de_corte(inicio_del_dia(fecha))), 200
+
+
+# ------------------------------------------------------------
+# 3️⃣.1 Calendario de cuotas del contrato
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/<int:contrato_id>/cuotas', methods=['GET'])
+def obtener_cuotas_contrato(contrato_id):
+    cuotas = (
+        CuotaContrato.query.filter_by(contrato_id=contrato_id)
+        .order_by(CuotaContrato.numero)
+        .all()
+    )
+    return jsonify({"contrato_id": contrato_id, "cuotas": [c.to_dict() for c in cuotas]}), 200
+
+
+# ------------------------------------------------------------
+# 3️⃣.2 Cuotas abiertas que vencen en un rango (por defecto, esta semana)
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/cuotas/por-vencer', methods=['GET'])
+def cuotas_por_vencer():
+    try:
+        desde = datetime.fromisoformat(request.args["desde"]) if "desde" in request.args else datetime.utcnow()
+        hasta = datetime.fromisoformat(request.args["hasta"]) if "hasta" in request.args else desde + timedelta(weeks=1)
+    except ValueError:
+        return jsonify({"error": "desde y hasta deben ser fechas ISO"}), 400
+
+    cuotas = (
+        CuotaContrato.query.filter(
+            CuotaContrato.fecha_vencimiento >= desde,
+            CuotaContrato.fecha_vencimiento < hasta,
+            CuotaContrato.estado.in_(CUOTAS_ABIERTAS)
+        )
+        .order_by(CuotaContrato.fecha_vencimiento)
+        .all()
+    )
+    return jsonify({"cuotas": [c.to_dict() for c in cuotas]}), 200
+
+
+# ------------------------------------------------------------
+# 3️⃣.3 Recargos devengados del contrato (informativos: no se suman
+#      al saldo ni los cobra el motor de pagos)
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/<int:contrato_id>/recargos', methods=['GET'])
+def obtener_recargos_contrato(contrato_id):
+    recargos = (
+        Recargo.query.filter_by(contrato_id=contrato_id)
+        .order_by(Recargo.fecha_devengo)
+        .all()
+    )
+    return jsonify({
+        "contrato_id": contrato_id,
+        "recargos": [r.to_dict() for r in recargos],
+        "total": float(sum((r.monto for r in recargos), 0))
+    }), 200
+
+
+# ------------------------------------------------------------
+# 3️⃣.4 Simulador: liquidar hoy, adelantar cuotas o cambiar de plan
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/<int:contrato_id>/simular', methods=['POST'])
+@jwt_required()
+def simular_contrato(contrato_id):
+    contrato = db.session.get(ContratoCompraVenta, contrato_id)
+    if not contrato:
+        return jsonify({"error": "Contrato no encontrado"}), 404
+
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(simular(contrato, data.get("escenarios"))), 200
+    except ErrorSimulacion as e:
+        return jsonify({"error": e.mensaje}), e.status
+
+
+# ------------------------------------------------------------
+# 3️⃣.5 Saldo del contrato a una fecha (libro + cortes)
+# ------------------------------------------------------------
+@contratos_cv_bp.route('/<int:contrato_id>/saldo-historico', methods=['GET'])
+def saldo_historico_contrato(contrato_id):
+    if not db.session.get(ContratoCompraVenta, contrato_id):
+        return jsonify({"error": "Contrato no encontrado"}), 404
+    try:
+        texto = request.args["fecha"]
+        # Una fecha sin hora es el saldo al cierre de ese día (hora de México)
+        fecha = (
+            inicio_del_dia(date.fromisoformat(texto) + timedelta(days=1))
+            if len(texto) == 10 else datetime.fromisoformat(texto)
+        )
+    except (KeyError, ValueError):
+        return jsonify({"error": "fecha es requerida (YYYY-MM-DD o fecha ISO; sin zona horaria se toma como UTC)"}), 400
+    return jsonify(saldo_al(contrato_id, a_utc(fecha))), 200
 
 
 # ------------------------------------------------------------
@@ -154,6 +357,15 @@ def firmar_contrato_compra_venta():
     hash_contrato = data.get("hash_contrato")
     empleado_id = data.get("empleado_id")
 
+    # 🧩 Con plantilla el servidor genera el HTML; el cliente solo manda las variables
+    generado = None
+    if data.get("plantilla"):
+        try:
+            generado = renderizar(data["plantilla"], data.get("version"), data.get("variables"))
+        except ErrorPlantilla as e:
+            return jsonify({"error": e.mensaje}), e.status
+        contrato_html = generado["contrato_html"]
+
     if not all([contrato_id, contrato_html, hash_contrato]):
         return jsonify({"error": "Faltan datos para firmar el contrato"}), 400
 
@@ -162,23 +374,30 @@ def firmar_contrato_compra_venta():
     if hash_servidor != hash_contrato:
         return jsonify({"success": False, "message": "El hash no coincide. El contrato fue alterado."}), 400
 
-    # 🧾 Guardar contrato HTML en carpeta
-    ruta_archivo = os.path.join(CONTRATOS_DIR, f'contrato_compra_venta_{contrato_id}.html')
-    with open(ruta_archivo, 'w', encoding='utf-8') as f:
-        f.write(contrato_html)
-
-    contrato_url = f"{request.host_url}static/contratos/contrato_compra_venta_{contrato_id}.html"
-
     contrato = ContratoCompraVenta.query.get(contrato_id)
     if not contrato:
         return jsonify({'error': 'Contrato no encontrado'}), 404
 
+    # 🧾 Con plantilla se guardan sus variables; si no, el HTML comprimido en el almacén por hash
+    if generado:
+        contrato.plantilla = generado["plantilla"]
+        contrato.plantilla_version = generado["version"]
+        contrato.variables = generado["variables"]
+    else:
+        guardar(contrato_html)
+        contrato.plantilla = contrato.plantilla_version = contrato.variables = None
+    contrato_url = request.host_url.rstrip('/') + url_for(
+        'contratos_cv.abrir_contrato_compra_venta', contrato_id=contrato.id
+    )
+
     contrato.fecha_firma = datetime.utcnow()
     contrato.empleado_id = empleado_id
     contrato.estado_contrato = "FIRMADO"
     contrato.hash_contrato = hash_contrato
-    contrato.contrato_html = contrato_html
+    contrato.contrato_html = None
     contrato.contrato_url = contrato_url
+    # 🔎 Términos del contrato para la búsqueda por contenido
+    indexar(COMPRA_VENTA, contrato.id, contrato_html)
 
     db.session.commit()
 
@@ -197,8 +416,11 @@ def listar_archivos_contratos_cv():
     if not os.path.exists(CONTRATOS_DIR):
         return {"error": "La carpeta de contratos no existe"}, 404
 
-    archivos = [f for f in os.listdir(CONTRATOS_DIR) if f.startswith('contrato_compra_venta_')]
-    return {"contratos_disponibles": archivos}
+    archivos = {f for f in os.listdir(CONTRATOS_DIR) if f.startswith('contrato_compra_venta_')}
+    # Firmados en el almacén por hash: no tienen archivo en la carpeta
+    firmados = db.session.query(ContratoCompraVenta.id).filter(ContratoCompraVenta.hash_contrato.isnot(None))
+    archivos.update(f"contrato_compra_venta_{contrato_id}.html" for contrato_id, in firmados)
+    return {"contratos_disponibles": sorted(archivos)}
 
 
 # ------------------------------------------------------------
@@ -206,15 +428,21 @@ def listar_archivos_contratos_cv():
 # ------------------------------------------------------------
 @contratos_cv_bp.route('/archivos/<contrato_id>', methods=['GET'])
 def abrir_contrato_compra_venta(contrato_id):
+    # Contrato firmado: ETag = su hash (304 sin leerlo) y el blob gzip sin descomprimir
+    if contrato_id.isdigit():
+        contrato = db.session.get(ContratoCompraVenta, int(contrato_id))
+        respuesta = respuesta_de(contrato) if contrato else None
+        if respuesta is not None:
+            return respuesta
+
     archivo = f"contrato_compra_venta_{contrato_id}.html"
     ruta_archivo = os.path.join(CONTRATOS_DIR, archivo)
 
     if os.path.exists(ruta_archivo):
         return send_from_directory(CONTRATOS_DIR, archivo)
 
-    # Si no existe el archivo
-    archivos = [f for f in os.listdir(CONTRATOS_DIR) if f.endswith('.html')]
+    # Si no existe el archivo; la lista de contratos está en /archivos
     return jsonify({
         "error": f"Contrato {contrato_id} no encontrado",
-        "contratos_disponibles": archivos
+        "contratos_disponibles": url_for('contratos_cv.listar_archivos_contratos_cv')
     }), 404
\ No newline at end of file
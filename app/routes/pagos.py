@@ -1,15 +1,27 @@
-from flask import Blueprint, request, jsonify, abort
+from flask import Blueprint, request, jsonify, abort, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timedelta, date, time
+from datetime import datetime, date
 from werkzeug.security import check_password_hash
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
 from zoneinfo import ZoneInfo
 from numbers import Number
+import csv
+import io
+import itertools
+import json
+from sqlalchemy import and_, or_
 
 
 from app import db
-from app.models import Pago, ContratoCompraVenta, EstadoDeuda, CorteCaja, Empleado, EstadoCorte, RolesEmpleado
+from app.models import Pago, CorteCaja, Empleado, EstadoCorte, RolesEmpleado
+from app.motor_pagos import registrar_pago_contrato, ErrorPago
+from app.caja import totales_del_dia, consulta_reporte_cortes, comparar_cortes, cerrar_cortes, ErrorCortes
+from app.conciliacion import IndiceContratos, conciliar, filas_para_aplicar
+from app.importacion_pagos import leer_filas, importar_pagos, TAMANO_LOTE, FORMATOS as FORMATOS_IMPORTACION
+from app.decoradores import roles_required
+from app.idempotencia import idempotente
+from app.paginacion import codificar_cursor, decodificar_cursor, leer_limite
 
 
 pagos_bp = Blueprint('pagos_bp', __name__, url_prefix='/pagos')
@@ -28,6 +40,7 @@ def validar_corte_editable(corte):
 
 @pagos_bp.post('/registrar')
 @jwt_required()
+@idempotente
 def registrar_pago():
     user_id = get_jwt_identity()
     data = request.get_json()
@@ -39,69 +52,13 @@ def registrar_pago():
 
     if not contrato_id or monto is None:
         return {'success': False, 'message': 'Faltan datos obligatorios'}, 400
-    contrato = ContratoCompraVenta.query.get(contrato_id)
-    if not contrato:
-        return {'success': False, 'message': 'Contrato no encontrado'}, 404
-    pago_semanal = float(contrato.pago_semanal)
-    ultimo_pago = float(contrato.ultimo_pago_semanal)
-    saldo_pendiente = float(contrato.saldo_pendiente)
-    monto = float(monto)
-
-    # ✔ Si paga el total
-    if monto == saldo_pendiente:
-        pagos_cubiertos = contrato.num_pagos_semanales
-    else:
-        if monto < pago_semanal:
-            return {
-                'success': False,
-                'message': f"El monto mínimo es {pago_semanal}"
-            }, 400
-        if monto % pago_semanal != 0 and monto != ultimo_pago:
-            return {
-                'success': False,
-                'message': 'El monto debe ser múltiplo del pago semanal o igual al último pago.'
-            }, 400
-        pagos_cubiertos = int(monto // pago_semanal)
-    # 🟩 Registrar el pago CON FECHA DE MÉXICO
-    pago = Pago(
-        sucursal_id=sucursal_id,
-        contrato_id=contrato.id,
-        empleado_id=user_id,
-        monto=monto,
-        metodo=metodo,
-        fecha=datetime.now(ZoneInfo('America/Mexico_City'))
-    )
 
-    db.session.add(pago)
-
-    # Actualizar saldo
-    contrato.saldo_pendiente = Decimal(str(saldo_pendiente - monto))
-    if contrato.saldo_pendiente < 0:
-        contrato.saldo_pendiente = Decimal('0')
-    # Actualizar semanas
-    if monto == saldo_pendiente or monto == ultimo_pago:
-        contrato.num_pagos_semanales = 0
-    else:
-        contrato.num_pagos_semanales -= pagos_cubiertos
-        if contrato.num_pagos_semanales < 0:
-            contrato.num_pagos_semanales = 0
-    # Actualizar fecha de próximo pago → también con horario de México
-    hoy = datetime.now(ZoneInfo('America/Mexico_City'))
-    semanas_por_sumar = pagos_cubiertos if pagos_cubiertos > 0 else 1
-
-    if contrato.proximo_pago_fecha is None:
-        contrato.proximo_pago_fecha = hoy
-    contrato.proximo_pago_fecha += timedelta(days=7 * semanas_por_sumar)
-
-    # Si ya terminó
-    if contrato.saldo_pendiente <= 0 or contrato.num_pagos_semanales == 0:
-        contrato.estado_deuda = EstadoDeuda.LIQUIDADO.value
-    db.session.commit()
-
-    # Historial actualizado
-    historial = (
-        Pago.query.filter_by(contrato_id=contrato.id).order_by(Pago.fecha.desc()).all()
-    )
+    try:
+        pago, contrato, pagos_cubiertos = registrar_pago_contrato(
+            contrato_id, monto, metodo, sucursal_id, user_id
+        )
+    except ErrorPago as e:
+        return {'success': False, 'message': e.mensaje}, e.status
 
     return {
         'success': True,
@@ -110,17 +67,40 @@ def registrar_pago():
         'saldo_pendiente': float(contrato.saldo_pendiente),
         'pagos_restantes': contrato.num_pagos_semanales,
         'proximo_pago': contrato.proximo_pago_fecha.isoformat(),
-        'historial_pago': [p.to_dict() for p in historial]
+        'pago': pago.to_dict(),
+        # Para pedir el resto del historial: /historial/<contrato_id>?cursor=...
+        'historial_cursor': codificar_cursor(pago.fecha, pago.id)
     }, 200
 
 
 @pagos_bp.get('/historial/<int:contrato_id>')
 def historial_pagos(contrato_id):
-    pagos = (
-        Pago.query.filter_by(contrato_id=contrato_id).order_by(Pago.fecha.desc()).all()
-    )
+    limite = leer_limite(request.args)
+    query = Pago.query.filter(Pago.contrato_id == contrato_id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            fecha_iso, ultimo_id = decodificar_cursor(cursor)
+            ultima_fecha = datetime.fromisoformat(fecha_iso)
+        except (ValueError, TypeError):
+            return {'success': False, 'message': 'Cursor inválido'}, 400
+        query = query.filter(
+            or_(
+                Pago.fecha < ultima_fecha,
+                and_(Pago.fecha == ultima_fecha, Pago.id < ultimo_id)
+            )
+        )
 
-    return {'success': True, 'historial': [p.to_dict() for p in pagos]}, 200
+    pagos = query.order_by(Pago.fecha.desc(), Pago.id.desc()).limit(limite + 1).all()
+    hay_mas = len(pagos) > limite
+    pagos = pagos[:limite]
+
+    return {
+        'success': True,
+        'historial': [p.to_dict() for p in pagos],
+        'siguiente_cursor': codificar_cursor(pagos[-1].fecha, pagos[-1].id) if hay_mas else None
+    }, 200
 
 
 @pagos_bp.get('/al-corte/<int:empleado_id>')
@@ -151,37 +131,20 @@ def abrir_corte():
     empleado_id = data.get('empleado_id')
     sucursal_id = data.get('sucursal_id')
 
-    # O usuario_id si así está en tu DB
-
-    hoy = date.today()
-
-    inicio = datetime.combine(hoy, time.min)
-    fin = datetime.combine(hoy, time.max)
+    hoy = datetime.now(ZoneInfo('America/Mexico_City')).date()
 
     # Buscar si ya existe corte del día
     corte = CorteCaja.query.filter(
         CorteCaja.empleado_id == empleado_id,
         CorteCaja.sucursal_id == sucursal_id,
-        CorteCaja.fecha_corte >= inicio,
-        CorteCaja.fecha_corte <= fin
+        CorteCaja.fecha_corte == hoy
     ).first()
 
-    # Obtener pagos del día
-    pagos_hoy = Pago.query.filter(
-        Pago.fecha >= inicio,
-        Pago.fecha <= fin,
-        Pago.sucursal_id == sucursal_id,
-        Pago.empleado_id == empleado_id
-    ).all()
-
-    # Calcular totales y cantidades
-    total_efectivo = sum(p.monto for p in pagos_hoy if p.metodo == 'EFECTIVO')
-    total_tarjeta = sum(p.monto for p in pagos_hoy if p.metodo == 'TARJETA')
-    total_transferencia = sum(p.monto for p in pagos_hoy if p.metodo == 'TRANSFERENCIA')
-
-    trans_efectivo = len([p for p in pagos_hoy if p.metodo == 'EFECTIVO'])
-    trans_tarjeta = len([p for p in pagos_hoy if p.metodo == 'TARJETA'])
-    trans_transferencia = len([p for p in pagos_hoy if p.metodo == 'TRANSFERENCIA'])
+    # Totales del día, mantenidos al registrar cada pago
+    totales = totales_del_dia(empleado_id, sucursal_id, hoy)
+    total_efectivo, trans_efectivo = totales['EFECTIVO']
+    total_tarjeta, trans_tarjeta = totales['TARJETA']
+    total_transferencia, trans_transferencia = totales['TRANSFERENCIA']
 
     total_general = total_efectivo + total_tarjeta + total_transferencia
 
@@ -356,3 +319,170 @@ def cerrar_corte(corte_id):
         "estado": corte.estado.value,
         "diferencia_total": float(dif_total)
     })
+
+
+@pagos_bp.post('/corte-caja/comparar/lote')
+@roles_required({'GERENTE', 'ADMIN'})
+def comparar_cortes_lote():
+    """
+    Compara varios cortes en una petición. Body:
+    {"cortes": [{"corte_id": 1, "efectivo": 0, "tarjeta": 0, "transferencia": 0, ...}]}
+    """
+    declarados = (request.json or {}).get('cortes')
+    if not isinstance(declarados, list) or not declarados:
+        return jsonify({'error': 'cortes debe ser una lista no vacía'}), 400
+
+    try:
+        resultado = comparar_cortes(declarados)
+    except (KeyError, TypeError, ValueError, ArithmeticError):
+        return jsonify({'error': 'Cada corte necesita corte_id y montos numéricos'}), 400
+
+    return jsonify({'cortes': resultado}), 200
+
+
+@pagos_bp.post('/corte-caja/cerrar/lote')
+@roles_required({'GERENTE', 'ADMIN'})
+def cerrar_cortes_lote():
+    """
+    Cierra varios cortes declarados en una sola transacción. El gerente es el
+    del token; si algún corte no se puede cerrar no se cierra ninguno.
+    Body: {"corte_ids": [1, 2, 3]}
+    """
+    corte_ids = (request.json or {}).get('corte_ids')
+    if not isinstance(corte_ids, list) or not corte_ids:
+        return jsonify({'error': 'corte_ids debe ser una lista no vacía'}), 400
+    try:
+        corte_ids = [int(i) for i in corte_ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'corte_ids debe contener enteros'}), 400
+
+    try:
+        cerrados = cerrar_cortes(corte_ids, int(get_jwt_identity()))
+    except ErrorCortes as e:
+        db.session.rollback()
+        return jsonify({'error': 'No se cerró ningún corte', 'errores': e.errores}), e.status
+
+    db.session.commit()
+    return jsonify({'msg': f"{len(cerrados)} cortes cerrados correctamente", 'cortes': cerrados}), 200
+
+
+def _fila_reporte(fila) -> dict:
+    return {
+        k: float(v) if isinstance(v, Decimal) else v
+        for k, v in fila._mapping.items()
+    }
+
+
+@pagos_bp.get('/corte-caja/reporte')
+@roles_required({'GERENTE', 'ADMIN'})
+def reporte_cortes():
+    """
+    Reporte de cortes por rango de fechas, sucursales y empleados, con
+    subtotales por sucursal y total general calculados en la base de datos.
+
+    Query params: desde, hasta (YYYY-MM-DD), sucursal_id y empleado_id
+    (repetibles) y formato=ndjson|csv. La respuesta se envía por partes.
+    """
+    try:
+        desde = date.fromisoformat(request.args['desde'])
+        hasta = date.fromisoformat(request.args['hasta'])
+    except (KeyError, ValueError):
+        return jsonify({'error': 'desde y hasta son requeridos (YYYY-MM-DD)'}), 400
+    if desde > hasta:
+        return jsonify({'error': 'desde no puede ser posterior a hasta'}), 400
+
+    formato = request.args.get('formato', 'ndjson')
+    if formato not in ('ndjson', 'csv'):
+        return jsonify({'error': 'formato debe ser ndjson o csv'}), 400
+
+    stmt = consulta_reporte_cortes(
+        desde,
+        hasta,
+        sucursales=request.args.getlist('sucursal_id', type=int),
+        empleados=request.args.getlist('empleado_id', type=int)
+    )
+
+    def generar():
+        resultado = db.session.execute(stmt.execution_options(yield_per=500))
+        if formato == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            filas = (_fila_reporte(f).values() for f in resultado)
+            for valores in itertools.chain([resultado.keys()], filas):
+                writer.writerow(valores)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        else:
+            for fila in resultado:
+                yield json.dumps(_fila_reporte(fila)) + '\n'
+
+    mimetype = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generar()), mimetype=mimetype)
+
+
+@pagos_bp.post('/importar')
+@roles_required({'GERENTE', 'ADMIN'})
+def importar_pagos_archivo():
+    """
+    Importa pagos en bloque desde un archivo CSV (contrato_id,monto[,metodo])
+    o NDJSON, enviado como multipart (campo `archivo`) o como cuerpo crudo.
+
+    Query params: formato=csv|ndjson, sucursal_id y tamano_lote. La respuesta
+    es NDJSON: una línea por fila rechazada y una línea final de resumen.
+    """
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS_IMPORTACION:
+        return jsonify({'error': 'formato debe ser csv o ndjson'}), 400
+
+    tamano_lote = request.args.get('tamano_lote', TAMANO_LOTE, type=int)
+    if tamano_lote <= 0:
+        return jsonify({'error': 'tamano_lote debe ser mayor a 0'}), 400
+
+    archivo = request.files.get('archivo')
+    stream = archivo.stream if archivo else request.stream
+    empleado_id = int(get_jwt_identity())
+    sucursal_id = request.args.get('sucursal_id', type=int)
+
+    def generar():
+        filas = leer_filas(stream, formato)
+        for evento in importar_pagos(filas, empleado_id, sucursal_id, tamano_lote):
+            yield json.dumps(evento) + '\n'
+
+    return Response(stream_with_context(generar()), mimetype='application/x-ndjson')
+
+
+@pagos_bp.post('/conciliar')
+@roles_required({'GERENTE', 'ADMIN'})
+def conciliar_transferencias():
+    """
+    Concilia un estado de cuenta de transferencias (CSV con referencia, monto,
+    fecha o NDJSON) contra los contratos abiertos.
+
+    Query params: formato=csv|ndjson, aplicar=1 para registrar los pagos
+    conciliados con el motor de pagos y sucursal_id para el corte de caja.
+    """
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS_IMPORTACION:
+        return jsonify({'error': 'formato debe ser csv o ndjson'}), 400
+
+    archivo = request.files.get('archivo')
+    stream = archivo.stream if archivo else request.stream
+
+    indice = IndiceContratos.desde_bd()
+    resultado = conciliar(leer_filas(stream, formato), indice)
+    resultado['resumen'] = {
+        'contratos_indexados': indice.total,
+        **{clave: len(resultado[clave]) for clave in ('conciliados', 'ambiguos', 'no_conciliados')}
+    }
+
+    if request.args.get('aplicar') == '1':
+        eventos = list(importar_pagos(
+            filas_para_aplicar(resultado['conciliados']),
+            int(get_jwt_identity()),
+            request.args.get('sucursal_id', type=int)
+        ))
+        resultado['aplicacion'] = eventos[-1]
+        resultado['rechazos_aplicacion'] = eventos[:-1]
+
+    return jsonify(resultado), 200
@@ -2,7 +2,6 @@ from flask import Blueprint, request, jsonify
 from app import db
 from app.models import PlanPago
 from app.utils import calcular_plan_pago
-from decimal import Decimal
 
 planes_bp = Blueprint('planes_bp', __name__, url_prefix='/api/planes')
 
@@ -26,16 +25,11 @@ def calcular_y_actualizar_plan():
         return jsonify({"error": "Plan no encontrado"}), 404
 
     try:
-        # 💰 Convertir a Decimal
-        monto_total_decimal = Decimal(str(monto_total))
-        monto_base_decimal = Decimal(str(monto_base)) if monto_base else monto_total_decimal
-        pago_inicial_decimal = Decimal(str(pago_inicial)) if pago_inicial is not None else Decimal(str(plan.pago_inicial))
-
         print(f"✅ Plan encontrado: {plan.nombre_plan}")
-        print(f"💵 monto_total={monto_total_decimal}, pago_inicial={pago_inicial_decimal}, monto_base={monto_base_decimal}")
+        print(f"💵 monto_total={monto_total}, pago_inicial={pago_inicial}, monto_base={monto_base}")
 
-        # 🔢 Calcular cuotas
-        resultado = calcular_plan_pago(plan, monto_total_decimal, pago_inicial_decimal, monto_base_decimal)
+        # 🔢 Calcular cuotas (en centavos, ver app/dinero.py)
+        resultado = calcular_plan_pago(plan, monto_total, pago_inicial, monto_base or monto_total)
         print("📊 Resultado del cálculo:", resultado)
 
         # 🧾 Actualizar campo ultima_cuota_semanal
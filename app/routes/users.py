@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 import threading
 import requests
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload, undefer, undefer_group
 from app.models import (
     Empleado,
     db,
@@ -22,9 +23,12 @@ from app.utils import (
     confirm_email_change_token,
     send_email,
     encrypt_data,
-    decrypt_data
+    decrypt_data,
+    incluye
 )
 from app.decoradores import roles_required
+from app.saldos import saldo_por_codigo, saldo_de_cliente
+from app.puntualidad import puntualidad_de_cliente
 
 
 users_bp = Blueprint('users', __name__, url_prefix='/users')
@@ -286,7 +290,7 @@ def crear_cliente():
         return jsonify({'error': 'Error creando cliente', 'detalle': str(e)}), 500
 
     # Buscar documentos pendientes por session_id
-    pending =PendingIdentityDocument.query.filter_by(session_id=session_id).first()
+    pending =PendingIdentityDocument.query.options(undefer_group('imagenes')).filter_by(session_id=session_id).first()
 
     if pending:
         doc = UserDocument(
@@ -537,46 +541,33 @@ def obtener_domicilio(user_id):
 
 @users_bp.get('/saldo/<codigo>')
 def obtener_saldo(codigo):
-    # 1. Buscar usuario por su código único (ej. MP-UR6279)
-    usuario = Usuario.query.filter_by(codigo=codigo).first()
+    # Usuario + contratos + total en una sola consulta, sin caché
+    saldo = saldo_por_codigo(codigo)
 
-    if not usuario:
+    if not saldo:
         return jsonify({'success': False, 'message': 'Usuario no encontrado'}), 404
-    # 2. Buscar contratos por cliente_id
-    contratos = ContratoCompraVenta.query.filter_by(cliente_id=usuario.id).all()
 
-    if not contratos:
+    if not saldo['saldos']:
         return (
             jsonify(
                 {
                     'success': True,
-                    'codigo': usuario.codigo,  # ← agregado
+                    'codigo': saldo['codigo'],  # ← agregado
                     'saldo_total': 0,
                     'message': 'El cliente no tiene contratos'
                 }
             ),
             200
         )
-    # 3. Calcular saldo de todos los contratos
-    saldos = [
-        {
-            'contrato_id': c.id,
-            'saldo_pendiente': c.saldo_pendiente,
-            'precio_total': float(c.precio_total)
-        }
-        for c in contratos
-    ]
-
-    saldo_total = sum(c['saldo_pendiente'] for c in saldos)
 
     return (
         jsonify(
             {
                 'success': True,
-                'cliente_id': usuario.id,
-                'codigo': usuario.codigo,  # ← agregado
-                'saldos': saldos,
-                'saldo_total': saldo_total
+                'cliente_id': saldo['cliente_id'],
+                'codigo': saldo['codigo'],  # ← agregado
+                'saldos': saldo['saldos'],
+                'saldo_total': saldo['saldo_total']
             }
         ),
         200
@@ -588,7 +579,8 @@ def buscar_cliente():
     codigo = request.args.get('codigo')
     telefono = request.args.get('telefono')
 
-    query = Usuario.query
+    # Domicilios en el mismo SELECT: serialize() no dispara otra consulta
+    query = Usuario.query.options(joinedload(Usuario.domicilios))
     if codigo:
         query = query.filter_by(codigo=codigo)
     elif telefono:
@@ -600,22 +592,14 @@ def buscar_cliente():
     if not cliente:
         return jsonify({'message': 'Cliente no encontrado'}), 404
 
-    # Buscar contratos y saldos
-    contratos = ContratoCompraVenta.query.filter_by(cliente_id=cliente.id).all()
-    saldos = [
-        {
-            'contrato_id': c.id,
-            'saldo_pendiente': c.saldo_pendiente,
-            'precio_total': float(c.precio_total)
-        }
-        for c in contratos
-    ]
+    # Contratos y saldos (una sola consulta)
+    saldo = saldo_de_cliente(cliente.id)
 
     return jsonify({
     **cliente.serialize(),
     'codigo': cliente.codigo,   # ← AGREGADO  
-    'saldos': saldos,
-    'saldo_total': sum(s['saldo_pendiente'] for s in saldos)
+    'saldos': saldo['saldos'],
+    'saldo_total': saldo['saldo_total']
 }), 200
 
 
@@ -645,7 +629,8 @@ def upload_identity_documents(user_id):
 
 @users_bp.route('/<int:user_id>/identity-documents', methods=['GET'])
 def get_identity_documents(user_id):
-    docs = UserDocument.query.filter_by(user_id=user_id).all()
+    # Las imágenes están diferidas; aquí sí se necesitan
+    docs = UserDocument.query.options(undefer_group('imagenes')).filter_by(user_id=user_id).all()
 
     response = []
     for doc in docs:
@@ -691,20 +676,33 @@ def resumen_usuario(user_id):
     user = Usuario.query.get(user_id)
     if not user:
         return jsonify({'error': 'Usuario no encontrado'}), 404
-    contratos = [c.serialize() for c in user.contratos]
+    # contrato_html solo con ?include=html; sin él la consulta no lo lee
+    con_html = incluye(request.args, 'html')
+    consulta = ContratoCompraVenta.query.filter_by(cliente_id=user_id)
+    if con_html:
+        consulta = consulta.options(undefer(ContratoCompraVenta.contrato_html))
+    contratos = consulta.all()
 
     return jsonify(
         {
             'cliente': user.serialize(),  # <- AQUÍ EL CAMBIO
-            'contratos': contratos,
+            'contratos': [c.serialize(incluir_html=con_html) for c in contratos],
             'puede_iniciar_venta': all(
                 str(c.estado_deuda).strip().upper().endswith('LIQUIDADO')
-                for c in user.contratos
+                for c in contratos
             )
         }
     )
 
 
+@users_bp.get('/<int:user_id>/puntualidad')
+@jwt_required()
+def puntualidad_usuario(user_id):
+    if not db.session.get(Usuario, user_id):
+        return jsonify({'error': 'Usuario no encontrado'}), 404
+    return jsonify(puntualidad_de_cliente(user_id)), 200
+
+
 @users_bp.route('/pending-documents/<session_id>', methods=['POST'])
 def save_pending_documents(session_id):
     data = request.get_json()
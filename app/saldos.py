@@ -0,0 +1,65 @@
+"""
+Saldo por cliente para el mostrador (/users/saldo y /users/buscar).
+
+Los saldos de los contratos de un cliente y su total se leen con una sola
+consulta, por `usuario.codigo` (único) o `usuario.id`, que llega a los
+contratos por `ix_contrato_cv_cliente_id`. No se guardan en caché: con varios
+procesos del servidor un caché por proceso mostraría en el mostrador un saldo
+anterior a un pago ya cobrado en otro proceso.
+"""
+from typing import Optional
+
+from sqlalchemy import bindparam, select, func
+
+from app import db
+from app.models import ContratoCompraVenta, Usuario
+
+
+def _consulta_saldos():
+    """Contratos del cliente con el total ya sumado por la base (SUM ... OVER)."""
+    return select(
+        Usuario.id.label('cliente_id'),
+        Usuario.codigo,
+        ContratoCompraVenta.id.label('contrato_id'),
+        ContratoCompraVenta.saldo_pendiente,
+        ContratoCompraVenta.precio_total,
+        func.coalesce(
+            func.sum(ContratoCompraVenta.saldo_pendiente).over(partition_by=Usuario.id), 0
+        ).label('saldo_total')
+    ).outerjoin(ContratoCompraVenta, ContratoCompraVenta.cliente_id == Usuario.id)
+
+
+# Armadas una vez: se ejecutan en cada consulta del mostrador
+_POR_CODIGO = _consulta_saldos().where(Usuario.codigo == bindparam('codigo'))
+_POR_CLIENTE = _consulta_saldos().where(Usuario.id == bindparam('cliente_id'))
+
+
+def _armar(filas) -> Optional[dict]:
+    if not filas:
+        return None
+    return {
+        'cliente_id': filas[0].cliente_id,
+        'codigo': filas[0].codigo,
+        'saldos': [
+            {
+                'contrato_id': f.contrato_id,
+                'saldo_pendiente': f.saldo_pendiente,
+                'precio_total': float(f.precio_total)
+            }
+            for f in filas if f.contrato_id is not None
+        ],
+        'saldo_total': filas[0].saldo_total
+    }
+
+
+def saldo_por_codigo(codigo: str) -> Optional[dict]:
+    """
+    {'cliente_id', 'codigo', 'saldos', 'saldo_total'} del cliente con ese
+    código, o None si no existe.
+    """
+    return _armar(db.session.execute(_POR_CODIGO, {'codigo': codigo}).all())
+
+
+def saldo_de_cliente(cliente_id: int) -> Optional[dict]:
+    """Igual que `saldo_por_codigo`, cuando ya se tiene el id del cliente."""
+    return _armar(db.session.execute(_POR_CLIENTE, {'cliente_id': cliente_id}).all())
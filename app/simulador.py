@@ -0,0 +1,210 @@
+"""
+Simulador de liquidación, adelanto de cuotas y cambio de plan de un contrato.
+
+El calendario abierto del contrato se carga una vez como arreglos (saldo y
+vencimiento de cada cuota, en centavos) y todos los escenarios de la misma
+petición se evalúan juntos sobre esos arreglos: los adelantos con una suma
+acumulada y los planes con la misma aritmética que `calcular_plan_pago`,
+vectorizada por plan.
+"""
+import numpy as np
+
+from app.models import ContratoCompraVenta, PlanPago, EstadoDeuda
+from app.cobranza import limites_del_dia
+from app.cuotas import cuotas_abiertas, restantes_centavos
+from app.errores import ErrorDeNegocio
+from app.dinero import a_centavos, a_centavos_arreglo, aplicar_tasa, a_float, pesos_enteros, CENTAVOS_POR_PESO
+
+
+LIQUIDAR = 'liquidar'
+ADELANTAR = 'adelantar'
+PLAN = 'plan'
+MAX_ESCENARIOS = 50
+# Cota de cuotas a adelantar (unos 19 años de semanas); para liquidar está el escenario liquidar
+MAX_CUOTAS_ADELANTO = 1000
+ESCENARIOS_POR_DEFECTO = (
+    {'tipo': LIQUIDAR},
+    {'tipo': ADELANTAR, 'cuotas': 1},
+    {'tipo': ADELANTAR, 'cuotas': 2}
+)
+SEMANA = np.timedelta64(7, 'D')
+
+
+class ErrorSimulacion(ErrorDeNegocio):
+    """Escenario inválido o plan inexistente."""
+
+
+def _calendario(contrato: ContratoCompraVenta) -> tuple:
+    """
+    (saldo por cuota en centavos, vencimiento de cada cuota) de lo que falta
+    por pagar. Los contratos sin calendario de cuotas se reconstruyen con el
+    pago semanal, el último pago y `proximo_pago_fecha`.
+    """
+    abiertas = cuotas_abiertas(contrato.id)
+    if abiertas:
+        return (
+            restantes_centavos(abiertas),
+            np.array([c.fecha_vencimiento for c in abiertas], dtype='datetime64[s]')
+        )
+
+    n = contrato.num_pagos_semanales or 0
+    restantes = np.full(n, a_centavos(contrato.pago_semanal), dtype=np.int64)
+    if n and contrato.ultimo_pago_semanal:
+        restantes[-1] = a_centavos(contrato.ultimo_pago_semanal)
+    inicio = np.datetime64(contrato.proximo_pago_fecha, 's') if contrato.proximo_pago_fecha else None
+    fechas = inicio + np.arange(n) * SEMANA if inicio is not None else np.full(n, np.datetime64('NaT'), 'datetime64[s]')
+    return restantes, fechas
+
+
+def cotizar_planes(montos, pagos_iniciales, tasas_centesimas, semanas) -> dict:
+    """
+    `calcular_plan_pago` para varios planes a la vez (arreglos de centavos,
+    tasas en centésimas de punto y semanas): cuotas iguales en pesos enteros
+    y el residuo en la última.
+    """
+    montos = np.asarray(montos, dtype=np.int64)
+    pagos_iniciales = np.asarray(pagos_iniciales, dtype=np.int64)
+    semanas = np.asarray(semanas, dtype=np.int64)
+    financiar = aplicar_tasa(montos - pagos_iniciales, np.maximum(np.asarray(tasas_centesimas, dtype=np.int64), 0))
+    cuota = (financiar // CENTAVOS_POR_PESO // semanas) * CENTAVOS_POR_PESO
+    return {
+        'monto_financiar': financiar,
+        'cuota_semanal': cuota,
+        'ultima_cuota': financiar - cuota * (semanas - 1),
+        'total_pagado': pagos_iniciales + financiar
+    }
+
+
+def _adelantos(restantes, fechas, vencidas: int, extras) -> dict:
+    """Pagar hoy lo vencido más `extras` cuotas adicionales (arreglo de enteros ≥ 0)."""
+    acumulado = np.concatenate(([0], np.cumsum(restantes)))
+    cubiertas = np.minimum(vencidas + np.asarray(extras, dtype=np.int64), len(restantes))
+    pendientes = len(restantes) - cubiertas
+    return {
+        'cuotas_cubiertas': cubiertas,
+        'monto_hoy': acumulado[cubiertas],
+        'saldo_despues': acumulado[-1] - acumulado[cubiertas],
+        'cuotas_restantes': pendientes,
+        # Vencimiento de la primera cuota que queda abierta (NaT si se liquida)
+        'proximo_pago': np.append(fechas, np.datetime64('NaT'))[cubiertas]
+    }
+
+
+def _fecha(valor):
+    return None if np.isnat(valor) else valor.item().isoformat()
+
+
+def _leer_escenarios(escenarios) -> list:
+    if not escenarios:
+        return [dict(e) for e in ESCENARIOS_POR_DEFECTO]
+    if not isinstance(escenarios, list) or len(escenarios) > MAX_ESCENARIOS:
+        raise ErrorSimulacion(f"escenarios debe ser una lista de hasta {MAX_ESCENARIOS} elementos")
+
+    leidos = []
+    for i, e in enumerate(escenarios):
+        tipo = e.get('tipo') if isinstance(e, dict) else None
+        try:
+            if tipo == LIQUIDAR:
+                leidos.append({'tipo': LIQUIDAR})
+            elif tipo == ADELANTAR:
+                cuotas = int(e.get('cuotas', 1))
+                if not 0 <= cuotas <= MAX_CUOTAS_ADELANTO:
+                    raise ErrorSimulacion(f"Escenario {i}: cuotas debe estar entre 0 y {MAX_CUOTAS_ADELANTO}")
+                leidos.append({'tipo': ADELANTAR, 'cuotas': cuotas})
+            elif tipo == PLAN:
+                leidos.append({
+                    'tipo': PLAN,
+                    'plan_id': int(e['plan_id']),
+                    'pago_inicial': a_centavos(e.get('pago_inicial', 0))
+                })
+            else:
+                raise ErrorSimulacion(f"Escenario {i}: tipo debe ser {LIQUIDAR}, {ADELANTAR} o {PLAN}")
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            raise ErrorSimulacion(f"Escenario {i}: valores inválidos") from None
+    return leidos
+
+
+def simular(contrato: ContratoCompraVenta, escenarios: list = None) -> dict:
+    """
+    Evalúa los escenarios pedidos y los devuelve en el mismo orden.
+
+    - liquidar: cuánto paga hoy para terminar el contrato.
+    - adelantar (cuotas=N): lo vencido a hoy más N cuotas adicionales.
+    - plan (plan_id, pago_inicial): el saldo actual refinanciado con otro PlanPago.
+
+    Raises:
+        ErrorSimulacion: si un escenario no es válido o un plan no existe.
+    """
+    if contrato.estado_deuda == EstadoDeuda.LIQUIDADO:
+        raise ErrorSimulacion('El contrato ya está liquidado', 409)
+    escenarios = _leer_escenarios(escenarios)
+
+    restantes, fechas = _calendario(contrato)
+    saldo = a_centavos(contrato.saldo_pendiente)
+    _, fin_de_hoy = limites_del_dia()
+    vencidas = int(np.count_nonzero(fechas < np.datetime64(fin_de_hoy, 's')))
+
+    # Liquidar es adelantar todas las cuotas que quedan
+    extras = [len(restantes) if e['tipo'] == LIQUIDAR else e['cuotas'] for e in escenarios if e['tipo'] != PLAN]
+    adelantos = _adelantos(restantes, fechas, vencidas, extras)
+
+    pedidos = [e for e in escenarios if e['tipo'] == PLAN]
+    if pedidos:
+        planes = {
+            p.id: p for p in PlanPago.query.filter(PlanPago.id.in_({e['plan_id'] for e in pedidos}))
+        }
+        faltantes = sorted({e['plan_id'] for e in pedidos} - set(planes))
+        if faltantes:
+            raise ErrorSimulacion(f"Planes no encontrados: {faltantes}", 404)
+        if any(e['pago_inicial'] < 0 or e['pago_inicial'] > saldo for e in pedidos):
+            raise ErrorSimulacion('El pago inicial debe estar entre 0 y el saldo pendiente.')
+        cotizaciones = cotizar_planes(
+            np.full(len(pedidos), saldo),
+            [e['pago_inicial'] for e in pedidos],
+            a_centavos_arreglo([planes[e['plan_id']].tasa_interes for e in pedidos]),
+            [planes[e['plan_id']].duracion_semanas for e in pedidos]
+        )
+
+    resultados, i_adelanto, i_plan = [], 0, 0
+    for e in escenarios:
+        if e['tipo'] != PLAN:
+            j = i_adelanto
+            i_adelanto += 1
+            # Al liquidar se paga el saldo del contrato, aunque difiera de la suma de cuotas
+            monto = saldo if adelantos['cuotas_restantes'][j] == 0 else int(adelantos['monto_hoy'][j])
+            resultados.append({
+                **e,
+                'monto_hoy': a_float(monto),
+                'cuotas_cubiertas': int(adelantos['cuotas_cubiertas'][j]),
+                'cuotas_restantes': int(adelantos['cuotas_restantes'][j]),
+                'saldo_despues': a_float(max(saldo - monto, 0)),
+                'proximo_pago': _fecha(adelantos['proximo_pago'][j])
+            })
+            continue
+
+        j = i_plan
+        i_plan += 1
+        plan = planes[e['plan_id']]
+        total = int(cotizaciones['total_pagado'][j])
+        resultados.append({
+            'tipo': PLAN,
+            'plan_id': plan.id,
+            'nombre_plan': plan.nombre_plan,
+            'duracion_semanas': plan.duracion_semanas,
+            'tasa_interes': float(plan.tasa_interes),
+            'pago_inicial': pesos_enteros(e['pago_inicial']),
+            'monto_financiar': pesos_enteros(cotizaciones['monto_financiar'][j]),
+            'cuota_semanal': pesos_enteros(cotizaciones['cuota_semanal'][j]),
+            'ultima_cuota': pesos_enteros(cotizaciones['ultima_cuota'][j]),
+            'total_pagado': pesos_enteros(total),
+            # Positivo: el cambio de plan cuesta más que terminar el plan actual
+            'diferencia_vs_actual': a_float(total - saldo)
+        })
+
+    return {
+        'contrato_id': contrato.id,
+        'saldo_pendiente': a_float(saldo),
+        'cuotas_pendientes': int(len(restantes)),
+        'cuotas_vencidas_hoy': vencidas,
+        'escenarios': resultados
+    }
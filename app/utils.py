@@ -5,7 +5,13 @@ from cryptography.fernet import Fernet
 from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 from email.message import EmailMessage
 import smtplib, ssl
-from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from app.dinero import (
+    a_centavos,
+    aplicar_tasa,
+    dividir_en_cuotas,
+    pesos_enteros,
+    CENTAVOS_POR_PESO
+)
 import os
 
 # ──────────────────────────────────────────────
@@ -97,58 +103,48 @@ def confirm_email_change_token(token, purpose, max_age=86400):
         return None
     
 
-def calcular_plan_pago(plan: PlanPago, monto_total: Decimal, pago_inicial: Decimal = None, monto_base: Decimal = None):
+def calcular_plan_pago(plan: PlanPago, monto_total, pago_inicial=None, monto_base=None):
     """
     Calcula las cuotas de un plan de pago con pagos enteros.
     Ajusta la última cuota para que el total sea exacto.
-    """
 
+    Los montos pueden llegar como int, float, str o Decimal; internamente se
+    trabaja en centavos enteros (ver app/dinero.py).
+    """
+    monto_total_c = a_centavos(monto_total)
+    monto_base_c = a_centavos(monto_base) if monto_base is not None else monto_total_c
     # Si no se pasa pago_inicial, usar el del plan
-    pago_inicial = Decimal(str(pago_inicial if pago_inicial is not None else plan.pago_inicial))
+    pago_inicial_c = a_centavos(pago_inicial if pago_inicial is not None else plan.pago_inicial)
 
     if plan.duracion_semanas <= 0:
         raise ValueError("El plan debe tener al menos 1 semana.")
-    if monto_total <= 0:
+    if monto_total_c <= 0:
         raise ValueError("El monto total debe ser mayor a 0.")
-    if pago_inicial < 0 or pago_inicial > monto_total:
+    if pago_inicial_c < 0 or pago_inicial_c > monto_total_c:
         raise ValueError("El pago inicial debe estar entre 0 y el monto total.")
 
-    # Tasa de interés (ejemplo: 10 → 0.10)
-    tasa_interes = Decimal(str(plan.tasa_interes)) / Decimal('100')
-
-    # Calcular el monto a financiar (usando monto_total si monto_base no se pasa)
-    monto_financiar = (monto_base) - pago_inicial
-
-    # Aplicar interés si existe
-    if tasa_interes > 0:
-        monto_financiar *= (Decimal('1') + tasa_interes)
-
-    # Asegurar que trabajamos solo con enteros (redondeo normal)
-    monto_financiar = monto_financiar.to_integral_value(rounding=ROUND_HALF_UP)
+    # Tasa de interés en centésimas de punto (ejemplo: 10 → 1000)
+    tasa_centesimas = a_centavos(plan.tasa_interes)
 
-    # Calcular cuota base entera
-    cuota_base = monto_financiar // plan.duracion_semanas  # división entera
-    residuo = monto_financiar % plan.duracion_semanas      # diferencia que queda
+    # Monto a financiar con interés, redondeado a pesos enteros (redondeo normal)
+    monto_financiar_c = aplicar_tasa(monto_base_c - pago_inicial_c, max(tasa_centesimas, 0))
 
-    # Generar cuotas: todas iguales, y repartir el residuo en la última
-    cuotas = [int(cuota_base)] * plan.duracion_semanas
-    cuotas[-1] += int(residuo)  # última cuota ajustada
-
-    # Resultado final
-    total_pagado = pago_inicial + sum(cuotas)
+    # Cuotas iguales en pesos enteros; el residuo va en la última
+    cuotas_c = dividir_en_cuotas(monto_financiar_c, plan.duracion_semanas)
+    cuotas = (cuotas_c // CENTAVOS_POR_PESO).tolist()
 
     return {
         "nombre_plan": plan.nombre_plan,
         "duracion_semanas": plan.duracion_semanas,
         "tasa_interes": float(plan.tasa_interes),
-        "pago_inicial": int(pago_inicial),
-        "monto_total": int(monto_total),
-        "monto_financiar": int(monto_financiar),
-        "cuota_semanal": int(cuota_base),
+        "pago_inicial": pesos_enteros(pago_inicial_c),
+        "monto_total": pesos_enteros(monto_total_c),
+        "monto_financiar": pesos_enteros(monto_financiar_c),
+        "cuota_semanal": cuotas[0],
         "cuotas": cuotas,
-        "total_pagado": int(total_pagado),
+        "total_pagado": pesos_enteros(pago_inicial_c + int(cuotas_c.sum())),
     }
-    
+
 def get_fernet():
     key = os.getenv("ENCRYPTION_KEY")
     if not key:
@@ -173,4 +169,8 @@ def decrypt_data(data: bytes) -> bytes:
     Recibe bytes encriptados y devuelve bytes desencriptados.
     """
     f = get_fernet()
-    return f.decrypt(data)
\ No newline at end of file
+    return f.decrypt(data)
+
+def incluye(args, campo: str) -> bool:
+    """True si `?include=` de la petición pide `campo` (lista separada por comas, p. ej. include=html)."""
+    return campo in {c.strip() for c in args.get('include', '').split(',')}
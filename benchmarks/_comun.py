@@ -0,0 +1,106 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Los scripts usan la base indicada en BENCH_DATABASE_URL (por defecto un
+SQLite temporal) para no tocar la base de desarrollo.
+"""
+import os
+import string
+import sys
+import tempfile
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cryptography.fernet import Fernet
+
+os.environ.setdefault('ENCRYPTION_KEY', Fernet.generate_key().decode())
+os.environ.setdefault('DEV_FRONTEND_URL', 'http://localhost:3000')
+
+from app import create_app, db  # noqa: E402
+from app.models import (  # noqa: E402
+    Sucursal,
+    Empleado,
+    Usuario,
+    PlanPago,
+    Catalogo_Modelos,
+    ContratoCompraVenta
+)
+from config import Config  # noqa: E402
+
+
+def crear_app_bench():
+    url = os.getenv('BENCH_DATABASE_URL')
+    if not url:
+        ruta = os.path.join(tempfile.mkdtemp(prefix='bench_'), 'bench.db')
+        url = f"sqlite:///{ruta}"
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url
+        SERVER_NAME = None
+        SQLALCHEMY_ENGINE_OPTIONS = (
+            {'connect_args': {'timeout': 60}} if url.startswith('sqlite') else {'pool_size': 50, 'max_overflow': 50}
+        )
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def sembrar_base():
+    """Crea sucursal, empleado, plan y modelo mínimos. Devuelve sus ids."""
+    sucursal = Sucursal(nombre='Bench', direccion='Centro', numero_telefonico='5550000000')
+    db.session.add(sucursal)
+    db.session.flush()
+
+    empleado = Empleado(nombre='Cajero', correo='cajero@bench.mx', sucursal_id=sucursal.id)
+    empleado.set_password('bench')
+    plan = PlanPago(
+        nombre_plan='Plan bench',
+        duracion_semanas=52,
+        tasa_interes=Decimal('10'),
+        pago_inicial=Decimal('500')
+    )
+    modelo = Catalogo_Modelos(
+        marca='Bench', modelo='B1', almacenamiento='128GB', anio='2025', ram='8GB'
+    )
+    db.session.add_all([empleado, plan, modelo])
+    db.session.commit()
+    return {
+        'sucursal_id': sucursal.id,
+        'empleado_id': empleado.id,
+        'plan_id': plan.id,
+        'modelo_id': modelo.id
+    }
+
+
+def crear_contratos(base: dict, n: int, pago_semanal=Decimal('100'), semanas=52):
+    """Inserta `n` clientes con un contrato abierto cada uno. Devuelve los ids."""
+    ids = []
+    for i in range(n):
+        # Código determinista: el aleatorio choca con decenas de miles de clientes
+        letras = string.ascii_uppercase[i // 260000 % 26] + string.ascii_uppercase[i // 10000 % 26]
+        cliente = Usuario(
+            primer_nombre=f"Cliente{i}", apellido_paterno='Bench', codigo=f"MP-{letras}{i % 10000:04d}"
+        )
+        db.session.add(cliente)
+        db.session.flush()
+        contrato = ContratoCompraVenta(
+            cliente_id=cliente.id,
+            modelo_id=base['modelo_id'],
+            plan_pago_id=base['plan_id'],
+            empleado_id=base['empleado_id'],
+            precio_total=pago_semanal * semanas,
+            pago_inicial=Decimal('0'),
+            pago_semanal=pago_semanal,
+            ultimo_pago_semanal=pago_semanal + 1,
+            num_pagos_semanales=semanas,
+            saldo_pendiente=pago_semanal * semanas
+        )
+        db.session.add(contrato)
+        db.session.flush()
+        ids.append(contrato.id)
+    db.session.commit()
+    return ids
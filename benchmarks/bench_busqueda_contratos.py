@@ -0,0 +1,84 @@
+"""
+Búsqueda de contratos por contenido: leer todos los HTML de la carpeta
+buscando la cadena (lo que hacía abrir_contrato) contra el índice invertido
+(app/indice_contratos.py).
+
+    python benchmarks/bench_busqueda_contratos.py --contratos 5000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _comun import crear_app_bench
+from app import db
+from app.indice_contratos import indexar, buscar, archivo_de, BURO
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Pedro', 'Sofía', 'Miguel']
+APELLIDOS = ['García', 'Hernández', 'López', 'Martínez', 'Pérez', 'Sánchez', 'Ramírez', 'Torres']
+CLAUSULAS = ''.join(
+    f"<p>Cláusula {n}. El cliente se obliga a cubrir los pagos semanales pactados en el plan de pago; "
+    f"el atraso genera recargos conforme a la tabla vigente.</p>"
+    for n in range(1, 40)
+)
+
+
+def contrato_html(rnd, i):
+    nombre = f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}"
+    return (
+        f"<html><body><h1>Contrato de compra-venta</h1><p>Cliente: {nombre}</p>"
+        f"<p>Folio: F{i:07d}</p><p>IMEI: {rnd.randrange(10**14, 10**15)}</p>{CLAUSULAS}</body></html>"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=5000)
+    parser.add_argument('--consultas', type=int, default=50)
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        rnd = random.Random(11)
+        carpeta = tempfile.mkdtemp(prefix='contratos_')
+        t0 = time.perf_counter()
+        for i in range(1, args.contratos + 1):
+            html = contrato_html(rnd, i)
+            with open(os.path.join(carpeta, archivo_de(BURO, i)), 'w', encoding='utf-8') as f:
+                f.write(html)
+            indexar(BURO, i, html)
+        db.session.commit()
+        t_indexar = time.perf_counter() - t0
+        megas = sum(os.path.getsize(os.path.join(carpeta, f)) for f in os.listdir(carpeta)) / 2**20
+
+        folios = [f"F{rnd.randint(1, args.contratos):07d}" for _ in range(args.consultas)]
+
+        t0 = time.perf_counter()
+        por_lectura = []
+        for folio in folios:
+            for nombre in os.listdir(carpeta):
+                with open(os.path.join(carpeta, nombre), 'r', encoding='utf-8') as f:
+                    if folio in f.read():
+                        por_lectura.append(nombre)
+                        break
+        t_lectura = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        por_indice = [buscar(folio, limite=1)[0]['archivo'] for folio in folios]
+        t_indice = time.perf_counter() - t0
+        assert por_lectura == por_indice
+
+        print(f"{args.contratos} contratos ({megas:.1f} MB), índice construido en {t_indexar:.2f} s")
+        print(f"  {args.consultas} búsquedas leyendo todos los HTML: {t_lectura * 1000:9.1f} ms")
+        print(f"  {args.consultas} búsquedas con el índice:          {t_indice * 1000:9.1f} ms  "
+              f"({t_lectura / t_indice:.0f}x)")
+
+        t0 = time.perf_counter()
+        resultados = buscar('Cláusula recargos María López', limite=20)
+        print(f"  búsqueda de varios términos comunes: {len(resultados)} resultados en "
+              f"{(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
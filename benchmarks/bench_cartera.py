@@ -0,0 +1,102 @@
+"""
+Antigüedad de cartera: recorrido fila por fila con el ORM (un agregado de
+pagos por contrato) contra la consulta única + pandas de app/cartera.py.
+
+    python benchmarks/bench_cartera.py --contratos 5000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from _comun import crear_app_bench, sembrar_base, crear_contratos
+from app import db
+from app.cartera import analizar_cartera, PROBABILIDAD_INCUMPLIMIENTO, PERDIDA_DADO_INCUMPLIMIENTO
+from app.models import ContratoCompraVenta, Pago, EstadoDeuda
+
+
+def tramo(dias):
+    if dias <= 7:
+        return '0-7'
+    if dias <= 30:
+        return '8-30'
+    if dias <= 60:
+        return '31-60'
+    return '60+'
+
+
+def antiguedad_orm(corte):
+    """Lo que hacía la hoja de cálculo: un objeto por contrato y sus pagos uno a uno."""
+    resumen = {}
+    for contrato in ContratoCompraVenta.query.all():
+        if contrato.estado_deuda == EstadoDeuda.LIQUIDADO:
+            continue
+        pagado = db.session.query(db.func.sum(Pago.monto)).filter(Pago.contrato_id == contrato.id).scalar()
+        dias = max((corte - contrato.proximo_pago_fecha).days, 0) if contrato.proximo_pago_fecha else 0
+        t = tramo(dias)
+        saldo, perdida, cobrado = resumen.get(t, (0.0, 0.0, 0.0))
+        saldo_c = float(contrato.saldo_pendiente)
+        resumen[t] = (
+            saldo + saldo_c,
+            perdida + saldo_c * PROBABILIDAD_INCUMPLIMIENTO[t] * PERDIDA_DADO_INCUMPLIMIENTO,
+            cobrado + float(pagado or 0)
+        )
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=5000)
+    parser.add_argument('--pagos', type=int, default=3, help='Pagos por contrato.')
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        ids = crear_contratos(base, args.contratos)
+        rnd = random.Random(7)
+        corte = datetime.utcnow()
+        tabla = ContratoCompraVenta.__table__
+        db.session.execute(
+            tabla.update().where(tabla.c.id == db.bindparam('b_id')),
+            [
+                {
+                    'b_id': i,
+                    'proximo_pago_fecha': corte - timedelta(days=rnd.randint(-7, 120)),
+                    'fecha_creacion': corte - timedelta(days=180)
+                }
+                for i in ids
+            ]
+        )
+        db.session.execute(
+            db.insert(Pago),
+            [
+                {
+                    'contrato_id': i, 'monto': 100, 'metodo': 'EFECTIVO', 'empleado_id': base['empleado_id'],
+                    'fecha': corte - timedelta(days=rnd.randint(0, 90))
+                }
+                for i in ids for _ in range(args.pagos)
+            ]
+        )
+        db.session.commit()
+
+        inicio = time.perf_counter()
+        orm = antiguedad_orm(corte)
+        t_orm = time.perf_counter() - inicio
+        db.session.expunge_all()
+
+        inicio = time.perf_counter()
+        vectorizado = analizar_cartera(corte)
+        t_vec = time.perf_counter() - inicio
+
+        for fila in vectorizado['antiguedad']:
+            saldo_orm = orm.get(fila['tramo'], (0.0, 0.0, 0))[0]
+            assert abs(saldo_orm - fila['saldo']) < 0.01, (fila['tramo'], saldo_orm, fila['saldo'])
+
+        print(f"{args.contratos} contratos, {args.contratos * args.pagos} pagos")
+        print(f"  ORM fila por fila: {t_orm * 1000:9.1f} ms")
+        print(f"  consulta + pandas: {t_vec * 1000:9.1f} ms  ({t_orm / t_vec:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
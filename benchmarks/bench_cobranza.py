@@ -0,0 +1,103 @@
+"""
+Lista de cobranza: armarla desde /todos (todos los contratos con su HTML,
+filtrados y ordenados en Python) contra la consulta paginada de
+app/cobranza.py, y recorrer todas sus páginas por cursor.
+
+    python benchmarks/bench_cobranza.py --contratos 20000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.orm import undefer
+
+from _comun import crear_app_bench, sembrar_base, crear_contratos
+from app import db
+from app.cobranza import lista_de_cobranza, contar, limites_del_dia, ESTADOS_EN_COBRANZA
+from app.fechas import fecha_mx
+from app.models import ContratoCompraVenta, EstadoDeuda
+
+
+def cobranza_desde_todos(fin, limite):
+    """Lo que tendría que hacer el cliente con /todos?include=html: traerlo todo y filtrar."""
+    consulta = ContratoCompraVenta.query.options(undefer(ContratoCompraVenta.contrato_html))
+    contratos = [c.serialize(incluir_html=True) for c in consulta]
+    pendientes = [
+        c for c in contratos
+        if c['estado_deuda'] in {e.value for e in ESTADOS_EN_COBRANZA}
+        and c['proximo_pago_fecha'] and datetime.fromisoformat(c['proximo_pago_fecha']) < fin
+    ]
+    pendientes.sort(key=lambda c: (
+        fecha_mx(datetime.fromisoformat(c['proximo_pago_fecha'])), -c['saldo_pendiente'], c['id']
+    ))
+    return len(pendientes), pendientes[:limite]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=20000)
+    parser.add_argument('--limite', type=int, default=50)
+    parser.add_argument('--html-kb', type=int, default=20, help='Tamaño del contrato_html de cada contrato.')
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        ids = crear_contratos(base, args.contratos)
+        rnd = random.Random(11)
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        html = '<p>' + 'x' * (args.html_kb * 1024) + '</p>'
+        tabla = ContratoCompraVenta.__table__
+        filas = []
+        for i in ids:
+            proximo = ahora + timedelta(hours=rnd.randint(-24 * 60, 24 * 30))
+            liquidado = rnd.random() < 0.1
+            filas.append({
+                'b_id': i,
+                'proximo_pago_fecha': proximo,
+                'saldo_pendiente': rnd.randint(1, 500) * 10,
+                'estado_deuda': EstadoDeuda.LIQUIDADO if liquidado else EstadoDeuda.AL_DIA,
+                # UPDATE de Core: el evento del modelo no corre, se llena como lo haría
+                'dia_cobro': None if liquidado else fecha_mx(proximo),
+                'contrato_html': html
+            })
+        db.session.execute(tabla.update().where(tabla.c.id == db.bindparam('b_id')), filas)
+        db.session.commit()
+        _, fin = limites_del_dia()
+
+        inicio = time.perf_counter()
+        total_todos, pagina_todos = cobranza_desde_todos(fin, args.limite)
+        t_todos = time.perf_counter() - inicio
+        db.session.expunge_all()
+
+        inicio = time.perf_counter()
+        conteo = contar(base['sucursal_id'])
+        pagina, ultima = lista_de_cobranza(base['sucursal_id'], args.limite)
+        t_pagina = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        contar(base['sucursal_id'])
+        t_conteo_cache = time.perf_counter() - inicio
+
+        assert conteo['total'] == total_todos, (conteo, total_todos)
+        assert [c['contrato_id'] for c in pagina] == [c['id'] for c in pagina_todos]
+
+        inicio = time.perf_counter()
+        vistos, paginas = len(pagina), 1
+        while ultima:
+            pagina, ultima = lista_de_cobranza(base['sucursal_id'], args.limite, ultima)
+            vistos += len(pagina)
+            paginas += 1
+        t_recorrido = time.perf_counter() - inicio
+        assert vistos == total_todos, (vistos, total_todos)
+
+        print(f"{args.contratos} contratos, {total_todos} en cobranza, html de {args.html_kb} KB")
+        print(f"  /todos + filtro en Python:   {t_todos * 1000:9.1f} ms")
+        print(f"  conteo + primera página:     {t_pagina * 1000:9.1f} ms  ({t_todos / t_pagina:.1f}x)")
+        print(f"  conteo desde el caché:       {t_conteo_cache * 1000:9.3f} ms")
+        print(f"  {paginas} páginas por cursor:     {t_recorrido * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Cierre de caja de fin de día: un corte por petición contra los endpoints por
+lote (/pagos/corte-caja/comparar/lote y /cerrar/lote).
+
+    python benchmarks/bench_cortes.py --cortes 40
+
+Se miden por separado las dos etapas del gerente: comparar (cortes aún
+PENDIENTE) y cerrar (cortes ya DECLARADO por el cajero). Por corte, cada
+cierre vuelve a cargar al gerente; por lote, una petición hace todos.
+"""
+import argparse
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask_jwt_extended import create_access_token
+
+from _comun import crear_app_bench, sembrar_base
+from app import db
+from app.models import CorteCaja, Empleado, EstadoCorte, RolesEmpleado
+
+
+def crear_cortes(base: dict, n: int) -> list:
+    cajeros = []
+    for i in range(n):
+        cajero = Empleado(nombre=f"Cajero{i}", correo=f"cajero{i}@bench.mx", sucursal_id=base['sucursal_id'])
+        cajero.set_password('bench')
+        cajeros.append(cajero)
+    db.session.add_all(cajeros)
+    db.session.flush()
+
+    cortes = [
+        CorteCaja(
+            empleado_id=cajero.id, sucursal_id=base['sucursal_id'], fecha_corte=date.today(),
+            total_efectivo=Decimal('1000'), total_tarjeta=Decimal('500'), total_transferencia=Decimal('250'),
+            total_general=Decimal('1750'), trans_tarjeta=3,
+            real_efectivo=Decimal('1000'), real_tarjeta=Decimal('500'), real_transferencia=Decimal('250') - i % 3,
+            dif_efectivo=0, dif_tarjeta=0, dif_transferencia=-(i % 3),
+            confirmado_empleado=True, fecha_confirmacion_empleado=datetime.utcnow(),
+            estado=EstadoCorte.DECLARADO
+        )
+        for i, cajero in enumerate(cajeros)
+    ]
+    db.session.add_all(cortes)
+    db.session.commit()
+    return [c.id for c in cortes]
+
+
+def poner_estado(ids, estado):
+    db.session.execute(
+        db.update(CorteCaja).where(CorteCaja.id.in_(ids))
+        .values(estado=estado, confirmado_admin=False, fecha_cierre=None, cerrado_por_admin_id=None)
+    )
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cortes', type=int, default=40)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        gerente = db.session.get(Empleado, base['empleado_id'])
+        gerente.rol = RolesEmpleado.GERENTE
+        db.session.commit()
+        ids = crear_cortes(base, args.cortes)
+        token = create_access_token(identity=str(gerente.id), additional_claims={'role': 'GERENTE'})
+
+    cliente = app.test_client()
+    headers = {'Authorization': f"Bearer {token}"}
+    declarado = {'efectivo': 1000, 'tarjeta': 500, 'transferencia': 249}
+
+    def comparar_por_corte():
+        for corte_id in ids:
+            assert cliente.post(f"/pagos/corte-caja/comparar/{corte_id}", json=declarado).status_code == 200
+
+    def cerrar_por_corte():
+        for corte_id in ids:
+            r = cliente.post(f"/pagos/corte-caja/cerrar/{corte_id}", json={'empleado_id': base['empleado_id']})
+            assert r.status_code == 200, r.get_json()
+
+    def comparar_por_lote():
+        r = cliente.post('/pagos/corte-caja/comparar/lote', headers=headers,
+                         json={'cortes': [{'corte_id': i, **declarado} for i in ids]})
+        assert r.status_code == 200, r.get_json()
+
+    def cerrar_por_lote():
+        r = cliente.post('/pagos/corte-caja/cerrar/lote', headers=headers, json={'corte_ids': ids})
+        assert r.status_code == 200, r.get_json()
+
+    etapas = (
+        ('comparar', EstadoCorte.PENDIENTE, comparar_por_corte, comparar_por_lote),
+        ('cerrar', EstadoCorte.DECLARADO, cerrar_por_corte, cerrar_por_lote),
+    )
+    resultados = []
+    for etapa, estado, por_corte, por_lote in etapas:
+        tiempos = []
+        for flujo in (por_corte, por_lote):
+            mejores = []
+            for _ in range(args.repeticiones):
+                with app.app_context():
+                    poner_estado(ids, estado)
+                inicio = time.perf_counter()
+                flujo()
+                mejores.append(time.perf_counter() - inicio)
+            tiempos.append(min(mejores))
+        resultados.append((etapa, *tiempos))
+
+    print(f"{args.cortes} cortes (mejor de {args.repeticiones})")
+    print(f"  {'etapa':<10}{'por corte (ms)':>16}{'por lote (ms)':>15}{'aceleración':>13}")
+    for etapa, t_corte, t_lote in resultados:
+        print(f"  {etapa:<10}{t_corte * 1000:>16.1f}{t_lote * 1000:>15.1f}{t_corte / t_lote:>12.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Microbenchmark del kernel de dinero en centavos (app/dinero.py) contra la
+aritmética con Decimal(str(...)) por llamada que usaban las rutas.
+
+    python benchmarks/bench_dinero.py --n 200000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from decimal import Decimal, ROUND_HALF_UP
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.dinero import a_centavos, a_centavos_arreglo, aplicar_pago, aplicar_tasa, dividir_en_cuotas  # noqa: E402
+
+
+def cotizar_decimal(monto_base, pago_inicial, tasa, semanas):
+    financiar = Decimal(str(monto_base)) - Decimal(str(pago_inicial))
+    financiar *= Decimal('1') + Decimal(str(tasa)) / Decimal('100')
+    financiar = financiar.to_integral_value(rounding=ROUND_HALF_UP)
+    cuotas = [int(financiar // semanas)] * semanas
+    cuotas[-1] += int(financiar % semanas)
+    return cuotas
+
+
+def cotizar_centavos(monto_base, pago_inicial, tasa, semanas):
+    financiar = aplicar_tasa(a_centavos(monto_base) - a_centavos(pago_inicial), a_centavos(tasa))
+    return dividir_en_cuotas(financiar, semanas)
+
+
+def abonar_decimal(restantes, monto):
+    monto = Decimal(str(monto))
+    abonos = []
+    for restante in restantes:
+        abono = min(monto, Decimal(str(restante)))
+        abonos.append(abono)
+        monto -= abono
+    return abonos, monto
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=200000)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    montos = [round(rnd.uniform(50, 20000), 2) for _ in range(args.n)]
+    cotizaciones = [
+        (rnd.randint(2000, 30000), rnd.randint(0, 1000), rnd.choice([0, 10, 12.5]), rnd.choice([26, 52]))
+        for _ in range(args.n // 10)
+    ]
+    restantes = [rnd.randint(100, 800) for _ in range(52)]
+    restantes_c = [r * 100 for r in restantes]
+
+    casos = [
+        ('conversión de montos',
+         lambda: [Decimal(str(m)) for m in montos],
+         lambda: [a_centavos(m) for m in montos],
+         args.n),
+        ('conversión vectorizada',
+         lambda: [Decimal(str(m)) for m in montos],
+         lambda: a_centavos_arreglo(montos),
+         args.n),
+        ('cotización de planes',
+         lambda: [cotizar_decimal(*c) for c in cotizaciones],
+         lambda: [cotizar_centavos(*c) for c in cotizaciones],
+         len(cotizaciones)),
+        ('abono sobre 52 cuotas',
+         lambda: [abonar_decimal(restantes, 3000) for _ in range(2000)],
+         lambda: [aplicar_pago(restantes_c, 300000) for _ in range(2000)],
+         2000),
+    ]
+
+    print(f"{'caso':<24}{'Decimal (ms)':>14}{'centavos (ms)':>15}{'aceleración':>13}")
+    for nombre, con_decimal, con_centavos, n in casos:
+        t_dec = min(timeit.repeat(con_decimal, number=1, repeat=3)) * 1000
+        t_cen = min(timeit.repeat(con_centavos, number=1, repeat=3)) * 1000
+        print(f"{nombre:<24}{t_dec:>14.1f}{t_cen:>15.1f}{t_dec / t_cen:>12.1f}x   ({n} operaciones)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Entrega de contratos firmados por /api/contratos/compra-venta/archivos/<id>:
+HTML descomprimido en cada petición (como antes) contra el blob gzip con
+ETag, la revalidación 304 y X-Accel-Redirect, en bytes por respuesta y
+tiempo del worker de Python.
+
+    python benchmarks/bench_entrega_contratos.py --contratos 200 --html-kb 30
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault('CONTRATOS_BLOBS_DIR', tempfile.mkdtemp(prefix='blobs_'))
+
+from flask import Response  # noqa: E402
+
+from _comun import crear_app_bench, sembrar_base, crear_contratos  # noqa: E402
+from app import db  # noqa: E402
+from app.almacen_contratos import guardar, html_de  # noqa: E402
+from app.models import ContratoCompraVenta  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=200)
+    parser.add_argument('--html-kb', type=int, default=30)
+    parser.add_argument('--rondas', type=int, default=5)
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        ids = crear_contratos(base, args.contratos)
+        rnd = random.Random(2)
+        clausula = '<p>Cláusula {}: el comprador se obliga a cubrir los pagos semanales pactados.</p>'
+        hashes = {}
+        for contrato_id in ids:
+            html = (
+                f"<html><body><h1>Contrato {contrato_id}</h1><p>IMEI {rnd.randrange(10**14, 10**15)}</p>"
+                + ''.join(clausula.format(n) for n in range(args.html_kb * 1024 // 80))
+                + '</body></html>'
+            )
+            hashes[contrato_id], _ = guardar(html)
+        tabla = ContratoCompraVenta.__table__
+        db.session.execute(
+            tabla.update().where(tabla.c.id == db.bindparam('b_id')),
+            [{'b_id': i, 'hash_contrato': h} for i, h in hashes.items()]
+        )
+        db.session.commit()
+
+        # Lo que hacía la ruta antes: leer y descomprimir el HTML completo en cada petición
+        @app.get('/bench/html/<int:contrato_id>')
+        def html_completo(contrato_id):
+            return Response(html_de(db.session.get(ContratoCompraVenta, contrato_id)), mimetype='text/html')
+
+        cliente = app.test_client()
+        gzip_ok = {'Accept-Encoding': 'gzip'}
+        etags = {
+            i: cliente.get(f'/api/contratos/compra-venta/archivos/{i}', headers=gzip_ok).headers['ETag']
+            for i in ids
+        }
+
+        def medir(url, cabeceras, estado):
+            total = 0
+            inicio = time.perf_counter()
+            for _ in range(args.rondas):
+                for i in ids:
+                    respuesta = cliente.get(url.format(i), headers=cabeceras(i))
+                    assert respuesta.status_code == estado, respuesta.status_code
+                    total += len(respuesta.data)
+            peticiones = args.rondas * len(ids)
+            return total / peticiones, (time.perf_counter() - inicio) * 1e3 / peticiones
+
+        casos = [
+            ('HTML completo (antes)', '/bench/html/{}', lambda i: {}, 200),
+            ('blob gzip + ETag', '/api/contratos/compra-venta/archivos/{}', lambda i: gzip_ok, 200),
+            ('If-None-Match → 304', '/api/contratos/compra-venta/archivos/{}',
+             lambda i: {**gzip_ok, 'If-None-Match': etags[i]}, 304),
+        ]
+        print(f"{args.contratos} contratos de ~{args.html_kb} KB, {args.rondas} rondas")
+        base_ms = None
+        for nombre, url, cabeceras, estado in casos:
+            bytes_, ms = medir(url, cabeceras, estado)
+            base_ms = base_ms or ms
+            print(f"  {nombre:24} {bytes_:9.0f} bytes {ms:7.3f} ms/petición ({base_ms / ms:.1f}x)")
+
+        app.config['CONTRATOS_X_ACCEL_PREFIX'] = '/_contratos'
+        bytes_, ms = medir('/api/contratos/compra-venta/archivos/{}', lambda i: gzip_ok, 200)
+        print(f"  {'X-Accel-Redirect':24} {bytes_:9.0f} bytes {ms:7.3f} ms/petición ({base_ms / ms:.1f}x)"
+              f"  (nginx envía el blob)")
+
+
+if __name__ == '__main__':
+    main()
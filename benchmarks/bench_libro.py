@@ -0,0 +1,105 @@
+"""
+Saldo histórico y reporte de fin de mes: reconstruirlos sumando todo el
+historial de movimientos contra leer el corte mensual más la cola de
+movimientos posteriores (app/libro.py).
+
+    python benchmarks/bench_libro.py --contratos 2000 --meses 12
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from _comun import crear_app_bench, sembrar_base, crear_contratos
+from app import db
+from app.dinero import a_centavos
+from app.libro import (
+    asiento_de_contrato, asiento_de_pago, asentar, tomar_corte, saldo_al, reporte_de_corte,
+    CUENTAS_POR_COBRAR
+)
+from app.models import MovimientoLibro
+
+
+def saldo_por_historial(contrato_id, fecha):
+    """Sin cortes: sumar todos los movimientos del contrato anteriores a la fecha."""
+    return db.session.query(
+        db.func.coalesce(db.func.sum(MovimientoLibro.debe - MovimientoLibro.haber), 0)
+    ).filter(
+        MovimientoLibro.contrato_id == contrato_id,
+        MovimientoLibro.cuenta == CUENTAS_POR_COBRAR,
+        MovimientoLibro.fecha < fecha
+    ).scalar()
+
+
+def cartera_por_historial(fecha):
+    return db.session.query(
+        db.func.count(db.distinct(MovimientoLibro.contrato_id)),
+        db.func.sum(MovimientoLibro.debe - MovimientoLibro.haber)
+    ).filter(MovimientoLibro.cuenta == CUENTAS_POR_COBRAR, MovimientoLibro.fecha < fecha).one()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=2000)
+    parser.add_argument('--meses', type=int, default=12)
+    parser.add_argument('--consultas', type=int, default=300)
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        ids = crear_contratos(base, args.contratos)
+        rnd = random.Random(9)
+        inicio = datetime.utcnow().replace(microsecond=0) - timedelta(days=30 * args.meses)
+
+        # Un pago semanal por contrato durante todo el periodo
+        filas, pago_id = [], 0
+        for contrato_id in ids:
+            filas += asiento_de_contrato(contrato_id, inicio, 520000, 0)
+            for semana in range(args.meses * 30 // 7):
+                pago_id += 1
+                fecha = inicio + timedelta(weeks=semana, hours=rnd.randint(1, 100))
+                filas += asiento_de_pago(pago_id, contrato_id, fecha, 10000, 10000)
+        for i in range(0, len(filas), 20000):
+            asentar(filas[i:i + 20000])
+        db.session.commit()
+
+        inicio_corte = time.perf_counter()
+        cortes = [inicio + timedelta(days=30 * m) for m in range(1, args.meses + 1)]
+        for corte in cortes:
+            tomar_corte(corte)
+        t_cortes = time.perf_counter() - inicio_corte
+
+        fechas = [inicio + timedelta(days=rnd.uniform(0, 30 * args.meses)) for _ in range(args.consultas)]
+        muestras = [(rnd.choice(ids), f) for f in fechas]
+
+        t0 = time.perf_counter()
+        esperados = [a_centavos(saldo_por_historial(c, f)) for c, f in muestras]
+        t_historial = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        obtenidos = [a_centavos(saldo_al(c, f)['saldo']) for c, f in muestras]
+        t_corte = time.perf_counter() - t0
+        assert esperados == obtenidos
+
+        t0 = time.perf_counter()
+        _, total = cartera_por_historial(cortes[-1])
+        t_mes_historial = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        reporte = reporte_de_corte(cortes[-1])
+        t_mes_corte = time.perf_counter() - t0
+        assert abs(float(total) - reporte['saldo_total']) < 0.01
+
+        movimientos = db.session.query(db.func.count(MovimientoLibro.id)).scalar()
+        print(f"{args.contratos} contratos, {movimientos} líneas de libro, {args.meses} cortes ({t_cortes:.2f} s)")
+        print(f"  saldo histórico x{args.consultas}, todo el historial: {t_historial * 1000:9.1f} ms")
+        print(f"  saldo histórico x{args.consultas}, corte + cola:      {t_corte * 1000:9.1f} ms  "
+              f"({t_historial / t_corte:.1f}x)")
+        print(f"  cartera a fin de mes, todo el historial:   {t_mes_historial * 1000:9.1f} ms")
+        print(f"  cartera a fin de mes, solo el corte:       {t_mes_corte * 1000:9.1f} ms  "
+              f"({t_mes_historial / t_mes_corte:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
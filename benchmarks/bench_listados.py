@@ -0,0 +1,95 @@
+"""
+Listados con columnas pesadas: tamaño de la respuesta y latencia de
+/api/contratos/compra-venta/todos y /users/<id>/resumen con contrato_html
+(?include=html, lo que devolvían siempre) y sin él, y carga de documentos
+de identidad con y sin las imágenes cifradas.
+
+    python benchmarks/bench_listados.py --contratos 2000 --html-kb 30
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy.orm import undefer_group
+
+from _comun import crear_app_bench, sembrar_base, crear_contratos
+from app import db
+from app.models import ContratoCompraVenta, UserDocument
+
+
+def medir(cliente, url, repeticiones):
+    """(bytes de la respuesta, ms por petición)."""
+    respuesta = cliente.get(url)
+    assert respuesta.status_code == 200, respuesta.status_code
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        cliente.get(url)
+    return len(respuesta.data), (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=2000)
+    parser.add_argument('--html-kb', type=int, default=30)
+    parser.add_argument('--documentos', type=int, default=2000)
+    parser.add_argument('--imagen-kb', type=int, default=200)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        ids = crear_contratos(base, args.contratos)
+        # Contratos firmados antes del almacén por hash: el HTML sigue en la columna
+        html = '<html><body>' + '<p>Cláusula del contrato.</p>' * (args.html_kb * 1024 // 29) + '</body></html>'
+        tabla = ContratoCompraVenta.__table__
+        db.session.execute(
+            tabla.update().where(tabla.c.id == db.bindparam('b_id')),
+            [{'b_id': i, 'contrato_html': html} for i in ids]
+        )
+        # Un cliente con varios contratos para /resumen
+        cliente_id = db.session.get(ContratoCompraVenta, ids[0]).cliente_id
+        db.session.execute(
+            tabla.update().where(tabla.c.id.in_(ids[:20])).values(cliente_id=cliente_id)
+        )
+        imagen = os.urandom(args.imagen_kb * 1024)
+        db.session.execute(
+            UserDocument.__table__.insert(),
+            [
+                {'user_id': cliente_id, 'type': 'INE', 'front_image': imagen, 'back_image': imagen}
+                for _ in range(args.documentos)
+            ]
+        )
+        db.session.commit()
+
+        cliente = app.test_client()
+        print(f"{args.contratos} contratos con {args.html_kb} KB de HTML cada uno")
+        for nombre, url in (
+            ('/todos', '/api/contratos/compra-venta/todos'),
+            ('/users/<id>/resumen (20 contratos)', f'/users/{cliente_id}/resumen')
+        ):
+            antes, t_antes = medir(cliente, url + '?include=html', args.repeticiones)
+            despues, t_despues = medir(cliente, url, args.repeticiones)
+            print(f"  {nombre}")
+            print(f"    con contrato_html: {antes / 2**20:8.2f} MB {t_antes:9.1f} ms")
+            print(f"    sin contrato_html: {despues / 2**20:8.2f} MB {t_despues:9.1f} ms  "
+                  f"({antes / despues:.0f}x menos bytes, {t_antes / t_despues:.1f}x más rápido)")
+
+        db.session.expunge_all()
+        inicio = time.perf_counter()
+        con_imagenes = [
+            d.to_dict() for d in UserDocument.query.options(undefer_group('imagenes')).filter_by(user_id=cliente_id)
+        ]
+        t_con = time.perf_counter() - inicio
+        db.session.expunge_all()
+        inicio = time.perf_counter()
+        sin_imagenes = [d.to_dict() for d in UserDocument.query.filter_by(user_id=cliente_id)]
+        t_sin = time.perf_counter() - inicio
+        assert con_imagenes == sin_imagenes
+        print(f"{args.documentos} documentos de identidad con 2 imágenes de {args.imagen_kb} KB")
+        print(f"  to_dict() leyendo las imágenes:  {t_con * 1000:9.1f} ms")
+        print(f"  to_dict() con imágenes diferidas: {t_sin * 1000:9.1f} ms  ({t_con / t_sin:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
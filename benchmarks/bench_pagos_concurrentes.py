@@ -0,0 +1,84 @@
+"""
+Estrés del motor de pagos: muchos hilos cobrando los mismos contratos.
+
+    python benchmarks/bench_pagos_concurrentes.py --hilos 200 --pagos 500
+
+Al terminar comprueba, por contrato, que el saldo y las semanas restantes
+coinciden exactamente con los pagos que quedaron guardados. Con --contratos > 1
+los pagos se reparten entre varios contratos para mostrar que el bloqueo es
+por fila y no serializa toda la tabla.
+"""
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from _comun import crear_app_bench, sembrar_base, crear_contratos, db
+from app.models import ContratoCompraVenta, Pago
+from app.motor_pagos import registrar_pago_contrato, ErrorPago
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hilos', type=int, default=200)
+    parser.add_argument('--pagos', type=int, default=500)
+    parser.add_argument('--contratos', type=int, default=1)
+    args = parser.parse_args()
+
+    pago_semanal = Decimal('100')
+    semanas = args.pagos + 10  # que ningún contrato se liquide durante la prueba
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        contratos = crear_contratos(base, args.contratos, pago_semanal, semanas)
+        iniciales = {
+            c.id: (c.saldo_pendiente, c.num_pagos_semanales)
+            for c in ContratoCompraVenta.query.filter(ContratoCompraVenta.id.in_(contratos))
+        }
+
+    def cobrar(i):
+        contrato_id = contratos[i % len(contratos)]
+        with app.app_context():
+            try:
+                registrar_pago_contrato(
+                    contrato_id, pago_semanal, 'EFECTIVO', base['sucursal_id'], base['empleado_id']
+                )
+                return 'ok'
+            except ErrorPago as e:
+                return f"rechazado ({e.status})"
+            finally:
+                db.session.remove()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.hilos) as pool:
+        resultados = Counter(pool.map(cobrar, range(args.pagos)))
+    duracion = time.perf_counter() - inicio
+
+    consistente = True
+    with app.app_context():
+        for contrato in ContratoCompraVenta.query.filter(ContratoCompraVenta.id.in_(contratos)):
+            saldo_inicial, semanas_iniciales = iniciales[contrato.id]
+            pagos = Pago.query.filter_by(contrato_id=contrato.id).all()
+            cobrado = sum((p.monto for p in pagos), Decimal('0'))
+            ok = (
+                contrato.saldo_pendiente == saldo_inicial - cobrado
+                and contrato.num_pagos_semanales == semanas_iniciales - len(pagos)
+            )
+            consistente &= ok
+            print(
+                f"contrato {contrato.id}: {len(pagos)} pagos, saldo {contrato.saldo_pendiente}, "
+                f"semanas restantes {contrato.num_pagos_semanales} → {'OK' if ok else 'INCONSISTENTE'}"
+            )
+
+    print(f"{args.pagos} pagos con {args.hilos} hilos en {duracion:.2f}s "
+          f"({args.pagos / duracion:.0f} pagos/s)")
+    for resultado, n in sorted(resultados.items()):
+        print(f"  {resultado}: {n}")
+    print('Saldos consistentes' if consistente else 'ERROR: saldos inconsistentes')
+    raise SystemExit(0 if consistente else 1)
+
+
+if __name__ == '__main__':
+    main()
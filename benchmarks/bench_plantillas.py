@@ -0,0 +1,98 @@
+"""
+Contratos con plantilla: bytes guardados por contrato (HTML completo contra
+variables en JSON) y tiempo de abrir un contrato renderizándolo, desde el
+caché de renders y leyendo el blob comprimido del almacén por hash.
+
+    python benchmarks/bench_plantillas.py --contratos 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault('CONTRATOS_BLOBS_DIR', tempfile.mkdtemp(prefix='blobs_'))
+
+from _comun import crear_app_bench  # noqa: E402
+from app import plantillas_contratos  # noqa: E402
+from app.almacen_contratos import guardar, leer  # noqa: E402
+from app.plantillas_contratos import renderizar, html_guardado  # noqa: E402
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Pedro']
+APELLIDOS = ['García', 'Hernández', 'López', 'Martínez', 'Pérez', 'Sánchez']
+
+
+def variables(rnd, i):
+    semanal = rnd.randint(80, 400)
+    return {
+        'folio': f"F{i:07d}",
+        'fecha': f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        'vendedor': rnd.choice(NOMBRES),
+        'sucursal': {'nombre': 'Sucursal Centro', 'direccion': 'Av. Juárez 100, Centro'},
+        'cliente': {
+            'nombre': f"{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+            'curp': f"XEXX{rnd.randrange(10**6, 10**7)}HDFRRN09",
+            'domicilio': f"Calle {rnd.randint(1, 300)} #{rnd.randint(1, 999)}, CDMX"
+        },
+        'equipo': {'marca': 'Marca', 'modelo': 'Modelo X', 'almacenamiento': '128GB',
+                   'imei': str(rnd.randrange(10**14, 10**15))},
+        'precio_total': semanal * 52,
+        'pago_inicial': 500,
+        'plan': {'nombre': 'Plan 52 semanas', 'semanas': 52, 'tasa_interes': 10},
+        'pago_semanal': semanal,
+        'ultimo_pago_semanal': semanal + 3
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        rnd = random.Random(4)
+        firmados = []
+        for i in range(args.contratos):
+            generado = renderizar('compra_venta', None, variables(rnd, i))
+            guardar(generado['contrato_html'])
+            firmados.append(generado)
+
+        html = sum(len(g['contrato_html'].encode()) for g in firmados)
+        json_vars = sum(len(g['variables'].encode()) for g in firmados)
+        blobs = sum(
+            os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(os.environ['CONTRATOS_BLOBS_DIR']) for f in fs
+        )
+        n = args.contratos
+        print(f"{n} contratos con la plantilla compra_venta v1, bytes por contrato:")
+        print(f"  HTML completo (columna contrato_html): {html / n:8.0f}")
+        print(f"  blob gzip en el almacén:               {blobs / n:8.0f}")
+        print(f"  variables JSON (plantilla):            {json_vars / n:8.0f}")
+
+        def abrir_todos():
+            inicio = time.perf_counter()
+            for g in firmados:
+                html_guardado(g['plantilla'], g['version'], g['variables'], g['hash_contrato'])
+            return (time.perf_counter() - inicio) * 1e6 / n
+
+        plantillas_contratos._renders.clear()
+        t_render = abrir_todos()
+        # Los últimos MAX_RENDERS quedan en el caché
+        recientes = firmados[-plantillas_contratos.MAX_RENDERS:]
+        inicio = time.perf_counter()
+        for g in recientes:
+            html_guardado(g['plantilla'], g['version'], g['variables'], g['hash_contrato'])
+        t_cache = (time.perf_counter() - inicio) * 1e6 / len(recientes)
+        inicio = time.perf_counter()
+        for g in firmados:
+            leer(g['hash_contrato'])
+        t_blob = (time.perf_counter() - inicio) * 1e6 / n
+
+        print("Abrir un contrato, µs por contrato:")
+        print(f"  render + verificación del hash: {t_render:8.1f}")
+        print(f"  desde el caché de renders:      {t_cache:8.1f}")
+        print(f"  leer el blob gzip:              {t_blob:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
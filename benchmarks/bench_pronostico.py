@@ -0,0 +1,55 @@
+"""
+Tiempo de respuesta del pronóstico de cobranza con los arreglos base en caché.
+
+Los arreglos se generan sintéticos (sin base de datos) con el mismo formato
+que arma app/pronostico.py, para medir solo el cálculo por llamada.
+
+    python benchmarks/bench_pronostico.py --contratos 500000 --semanas 12
+"""
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+from _comun import crear_app_bench
+from app import pronostico
+
+
+def arreglos_sinteticos(n: int, hoy: date) -> dict:
+    rnd = np.random.default_rng(7)
+    semanal = rnd.choice([15000, 25000, 40000], size=n).astype(np.int64)
+    return {
+        'sucursal_id': rnd.integers(1, 40, size=n),
+        'plan_pago_id': rnd.integers(1, 8, size=n),
+        'semanal': semanal,
+        'ultimo': semanal + rnd.integers(0, 9900, size=n),
+        'restantes': rnd.integers(1, 53, size=n),
+        'proximo': np.datetime64(hoy, 'D') + rnd.integers(-90, 7, size=n).astype('timedelta64[D]')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=500000)
+    parser.add_argument('--semanas', type=int, default=12)
+    args = parser.parse_args()
+
+    hoy = date.today()
+    app = crear_app_bench()
+    with app.app_context():
+        pronostico._base['arreglos'] = arreglos_sinteticos(args.contratos, hoy)
+        pronostico._base['vence'] = float('inf')
+
+        for por in (None, 'sucursal', 'plan'):
+            tiempos = []
+            for _ in range(5):
+                inicio = time.perf_counter()
+                pronostico.pronosticar(hoy, args.semanas, por)
+                tiempos.append(time.perf_counter() - inicio)
+            print(f"por={str(por):<9} {args.contratos} contratos, {args.semanas} semanas: "
+                  f"{min(tiempos) * 1000:7.1f} ms (mejor de 5)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Devengo de recargos: una corrida sobre toda la cartera, la repetición del
+mismo día (no debe insertar nada) y la corrida de una semana después (solo
+la semana nueva).
+
+    python benchmarks/bench_recargos.py --contratos 20000
+"""
+import argparse
+import random
+from datetime import datetime, time, timedelta, timezone
+
+from _comun import crear_app_bench, sembrar_base, crear_contratos
+from app import db
+from app.models import ContratoCompraVenta, Recargo
+from app.fechas import ZONA_MX
+from app.recargos import devengar_recargos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--contratos', type=int, default=20000)
+    parser.add_argument('--lote', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = crear_app_bench()
+    with app.app_context():
+        base = sembrar_base()
+        ids = crear_contratos(base, args.contratos)
+        rnd = random.Random(5)
+        ahora = datetime.now(timezone.utc).replace(tzinfo=None)
+        tabla = ContratoCompraVenta.__table__
+        db.session.execute(
+            tabla.update().where(tabla.c.id == db.bindparam('b_id')),
+            [{'b_id': i, 'proximo_pago_fecha': ahora - timedelta(days=rnd.randint(-14, 70))} for i in ids]
+        )
+        db.session.commit()
+        hoy = datetime.now(ZONA_MX).date()
+
+        for etiqueta, fecha in (
+            ('primera corrida', hoy),
+            ('misma fecha otra vez', hoy),
+            ('una semana después', hoy + timedelta(days=7))
+        ):
+            r = devengar_recargos(fecha, lote=args.lote)
+            print(
+                f"  {etiqueta:22} contratos={r['contratos']:6} recargos={r['recargos']:6} "
+                f"monto={r['monto_total']:12.2f} {r['segundos'] * 1000:8.1f} ms "
+                f"({r['filas_por_segundo']} filas/s)"
+            )
+
+        # Cada contrato vencido debe tener cobradas exactamente sus semanas vencidas a la fecha
+        semanas = dict(
+            db.session.query(Recargo.contrato_id, db.func.sum(Recargo.semanas)).group_by(Recargo.contrato_id)
+        )
+        corte = datetime.combine(hoy + timedelta(days=8), time.min, tzinfo=ZONA_MX)
+        corte = corte.astimezone(timezone.utc).replace(tzinfo=None)
+        for contrato_id, proximo in db.session.query(ContratoCompraVenta.id, ContratoCompraVenta.proximo_pago_fecha):
+            esperado = max(-(-(corte - proximo) // timedelta(days=7)), 0)
+            assert semanas.get(contrato_id, 0) == esperado, (contrato_id, semanas.get(contrato_id), esperado)
+        print(f"{args.contratos} contratos: semanas cobradas correctas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Cotización de muchos planes: `calcular_plan_pago` uno por uno (lo que hacía
+el punto de venta con una petición por escenario) contra `cotizar_planes`
+sobre arreglos. También verifica que ambos den las mismas cuotas.
+
+    python benchmarks/bench_simulador.py --escenarios 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.dinero import a_centavos, CENTAVOS_POR_PESO  # noqa: E402
+from app.simulador import cotizar_planes  # noqa: E402
+from app.utils import calcular_plan_pago  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--escenarios', type=int, default=5000)
+    args = parser.parse_args()
+
+    rnd = random.Random(3)
+    planes = [
+        SimpleNamespace(
+            nombre_plan=f"Plan {i}", duracion_semanas=rnd.randint(4, 104),
+            tasa_interes=Decimal(rnd.randint(0, 6000)) / 100, pago_inicial=Decimal('0')
+        )
+        for i in range(args.escenarios)
+    ]
+    montos = [rnd.randint(500, 60000) for _ in planes]
+    iniciales = [rnd.randint(0, m // 3) for m in montos]
+
+    inicio = time.perf_counter()
+    uno_por_uno = [calcular_plan_pago(p, m, i) for p, m, i in zip(planes, montos, iniciales)]
+    t_uno = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    cotizaciones = cotizar_planes(
+        [m * CENTAVOS_POR_PESO for m in montos],
+        [i * CENTAVOS_POR_PESO for i in iniciales],
+        [a_centavos(p.tasa_interes) for p in planes],
+        [p.duracion_semanas for p in planes]
+    )
+    t_arreglos = time.perf_counter() - inicio
+
+    for k, ref in enumerate(uno_por_uno):
+        assert ref['cuota_semanal'] * CENTAVOS_POR_PESO == cotizaciones['cuota_semanal'][k], k
+        assert ref['cuotas'][-1] * CENTAVOS_POR_PESO == cotizaciones['ultima_cuota'][k], k
+        assert ref['total_pagado'] == int(cotizaciones['total_pagado'][k] / CENTAVOS_POR_PESO), k
+
+    print(f"{args.escenarios} escenarios de plan (mismas cuotas en ambos)")
+    print(f"  calcular_plan_pago uno por uno: {t_uno * 1000:9.1f} ms")
+    print(f"  cotizar_planes sobre arreglos:  {t_arreglos * 1000:9.1f} ms  ({t_uno / t_arreglos:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -28,5 +28,19 @@ class Config:
     # ────── Base de datos ──────
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///app.db")
 
+    # ────── Contratos firmados ──────
+    # Almacén de HTML por hash (app/almacen_contratos.py); por defecto instance/contratos
+    CONTRATOS_BLOBS_DIR = os.getenv("CONTRATOS_BLOBS_DIR")
+    # Si se define (p. ej. "/_contratos"), los contratos firmados se entregan con X-Accel-Redirect
+    # y nginx los sirve desde CONTRATOS_BLOBS_DIR:
+    #   location /_contratos/ {
+    #       internal; alias <CONTRATOS_BLOBS_DIR>/; gzip off; etag off;
+    #       types { } default_type "text/html; charset=utf-8";
+    #       add_header Content-Encoding gzip; add_header Vary Accept-Encoding;
+    #       add_header ETag $upstream_http_etag;
+    #   }
+    # Sin nginx, USE_X_SENDFILE=True hace lo mismo con X-Sendfile (Apache/lighttpd).
+    CONTRATOS_X_ACCEL_PREFIX = os.getenv("CONTRATOS_X_ACCEL_PREFIX")
+
     # ────── Mail ──────
 
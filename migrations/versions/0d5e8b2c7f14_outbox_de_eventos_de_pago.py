@@ -0,0 +1,40 @@
+"""outbox de eventos de pago
+
+Revision ID: 0d5e8b2c7f14
+Revises: b62f0d7e3c91
+Create Date: 2026-02-02 09:15:03.118452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d5e8b2c7f14'
+down_revision = 'b62f0d7e3c91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('evento_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(length=50), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('estado', sa.Enum('PENDIENTE', 'ENVIADO', 'FALLIDO', name='estado_evento_enum', native_enum=False), server_default=sa.text("'PENDIENTE'"), nullable=False),
+    sa.Column('intentos', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('ultimo_error', sa.Text(), nullable=True),
+    sa.Column('disponible_en', sa.DateTime(), nullable=False),
+    sa.Column('creado', sa.DateTime(), nullable=False),
+    sa.Column('procesado', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('evento_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_evento_outbox_estado_disponible', ['estado', 'disponible_en'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('evento_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_evento_outbox_estado_disponible')
+
+    op.drop_table('evento_outbox')
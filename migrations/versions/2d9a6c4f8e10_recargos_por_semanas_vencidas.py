@@ -0,0 +1,35 @@
+"""recargos por semanas vencidas
+
+Revision ID: 2d9a6c4f8e10
+Revises: 8c5f0a3e7b21
+Create Date: 2026-02-13 09:22:51.730164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d9a6c4f8e10'
+down_revision = '8c5f0a3e7b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recargo',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('contrato_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_devengo', sa.Date(), nullable=False),
+    sa.Column('semanas', sa.Integer(), nullable=False),
+    sa.Column('monto', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('vencimiento_hasta', sa.DateTime(), nullable=False),
+    sa.Column('creado', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['contrato_id'], ['contrato_compra_venta.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('contrato_id', 'fecha_devengo', name='uq_recargo_contrato_fecha')
+    )
+
+
+def downgrade():
+    op.drop_table('recargo')
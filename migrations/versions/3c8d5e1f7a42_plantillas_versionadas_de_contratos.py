@@ -0,0 +1,40 @@
+"""plantillas versionadas de contratos
+
+Revision ID: 3c8d5e1f7a42
+Revises: 9e4c7b2a6d18
+Create Date: 2026-02-19 10:17:52.604113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c8d5e1f7a42'
+down_revision = '9e4c7b2a6d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contrato_consulta_buro', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('plantilla', sa.String(length=40), nullable=True))
+        batch_op.add_column(sa.Column('plantilla_version', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('variables', sa.Text(), nullable=True))
+
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('plantilla', sa.String(length=40), nullable=True))
+        batch_op.add_column(sa.Column('plantilla_version', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('variables', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.drop_column('variables')
+        batch_op.drop_column('plantilla_version')
+        batch_op.drop_column('plantilla')
+
+    with op.batch_alter_table('contrato_consulta_buro', schema=None) as batch_op:
+        batch_op.drop_column('variables')
+        batch_op.drop_column('plantilla_version')
+        batch_op.drop_column('plantilla')
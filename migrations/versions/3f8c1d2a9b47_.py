@@ -0,0 +1,26 @@
+"""version de fila en contrato_compra_venta
+
+Revision ID: 3f8c1d2a9b47
+Revises: 6527078f67d6
+Create Date: 2026-01-08 10:42:17.204311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8c1d2a9b47'
+down_revision = '6527078f67d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,82 @@
+"""indice de lista de cobranza
+
+Guarda en el contrato la sucursal del empleado y el día de cobro (hora de
+México) para que la lista de cobranza filtre y ordene con un solo índice, y
+los llena para los contratos existentes.
+
+Revision ID: 4b8e2f6a1c39
+Revises: 7a3e91c4d2b6
+Create Date: 2026-02-09 10:14:27.518306
+
+"""
+from datetime import timezone
+from zoneinfo import ZoneInfo
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e2f6a1c39'
+down_revision = '7a3e91c4d2b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sucursal_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('dia_cobro', sa.Date(), nullable=True))
+        batch_op.create_foreign_key(
+            'fk_contrato_cv_sucursal_id', 'sucursal', ['sucursal_id'], ['id']
+        )
+
+    contrato = sa.table('contrato_compra_venta',
+        sa.column('id', sa.Integer()),
+        sa.column('empleado_id', sa.Integer()),
+        sa.column('sucursal_id', sa.Integer()),
+        sa.column('estado_deuda', sa.String()),
+        sa.column('proximo_pago_fecha', sa.DateTime()),
+        sa.column('dia_cobro', sa.Date())
+    )
+    empleado = sa.table('empleado', sa.column('id', sa.Integer()), sa.column('sucursal_id', sa.Integer()))
+    op.execute(
+        contrato.update().values(
+            sucursal_id=sa.select(empleado.c.sucursal_id)
+            .where(empleado.c.id == contrato.c.empleado_id)
+            .scalar_subquery()
+        )
+    )
+
+    # El día en hora de México depende del horario de verano de cada fecha: se calcula en Python
+    zona_mx = ZoneInfo('America/Mexico_City')
+    conexion = op.get_bind()
+    filas = conexion.execute(
+        sa.select(contrato.c.id, contrato.c.proximo_pago_fecha).where(
+            contrato.c.estado_deuda != 'LIQUIDADO',
+            contrato.c.proximo_pago_fecha.isnot(None)
+        )
+    ).all()
+    if filas:
+        conexion.execute(
+            contrato.update().where(contrato.c.id == sa.bindparam('b_id')).values(dia_cobro=sa.bindparam('b_dia')),
+            [
+                {'b_id': f.id, 'b_dia': f.proximo_pago_fecha.replace(tzinfo=timezone.utc).astimezone(zona_mx).date()}
+                for f in filas
+            ]
+        )
+
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_contrato_cv_cobranza',
+            ['sucursal_id', 'dia_cobro', sa.text('saldo_pendiente DESC'), 'id'],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.drop_index('ix_contrato_cv_cobranza')
+        batch_op.drop_constraint('fk_contrato_cv_sucursal_id', type_='foreignkey')
+        batch_op.drop_column('dia_cobro')
+        batch_op.drop_column('sucursal_id')
@@ -0,0 +1,26 @@
+"""indice de corte_caja por fecha y sucursal para reportes
+
+Revision ID: 5e2b9f41a0c8
+Revises: c81e5b07d2a4
+Create Date: 2026-01-19 09:48:33.120984
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2b9f41a0c8'
+down_revision = 'c81e5b07d2a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('corte_caja', schema=None) as batch_op:
+        batch_op.create_index('ix_corte_caja_fecha_sucursal', ['fecha_corte', 'sucursal_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('corte_caja', schema=None) as batch_op:
+        batch_op.drop_index('ix_corte_caja_fecha_sucursal')
@@ -0,0 +1,28 @@
+"""confirmacion de llaves de idempotencia
+
+Revision ID: 6e1a9d3b5f27
+Revises: 3c8d5e1f7a42
+Create Date: 2026-03-02 09:41:18.276530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e1a9d3b5f27'
+down_revision = '3c8d5e1f7a42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('llave_idempotencia', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('confirmada', sa.Boolean(), server_default=sa.text('false'), nullable=False)
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('llave_idempotencia', schema=None) as batch_op:
+        batch_op.drop_column('confirmada')
@@ -0,0 +1,82 @@
+"""libro de partida doble y cortes de saldo
+
+Revision ID: 6f1b3d8e5a27
+Revises: 2d9a6c4f8e10
+Create Date: 2026-02-17 16:05:38.447921
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1b3d8e5a27'
+down_revision = '2d9a6c4f8e10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('movimiento_libro',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('contrato_id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.DateTime(), nullable=False),
+    sa.Column('cuenta', sa.String(length=40), nullable=False),
+    sa.Column('debe', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('haber', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('referencia_tipo', sa.String(length=20), nullable=False),
+    sa.Column('referencia_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['contrato_id'], ['contrato_compra_venta.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('movimiento_libro', schema=None) as batch_op:
+        batch_op.create_index('ix_movimiento_libro_contrato_cuenta_fecha', ['contrato_id', 'cuenta', 'fecha'], unique=False)
+        batch_op.create_index('ix_movimiento_libro_cuenta_fecha', ['cuenta', 'fecha'], unique=False)
+
+    op.create_table('saldo_contrato_corte',
+    sa.Column('contrato_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_corte', sa.DateTime(), nullable=False),
+    sa.Column('saldo', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['contrato_id'], ['contrato_compra_venta.id'], ),
+    sa.PrimaryKeyConstraint('contrato_id', 'fecha_corte')
+    )
+    with op.batch_alter_table('saldo_contrato_corte', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_saldo_contrato_corte_fecha_corte'), ['fecha_corte'], unique=False)
+
+    # Apertura de los contratos existentes, antes de que llegue cualquier pago al libro
+    contrato = sa.table('contrato_compra_venta', sa.column('id', sa.Integer()), sa.column('saldo_pendiente', sa.Numeric(10, 2)))
+    movimiento = sa.table('movimiento_libro',
+        sa.column('contrato_id', sa.Integer()),
+        sa.column('fecha', sa.DateTime()),
+        sa.column('cuenta', sa.String()),
+        sa.column('debe', sa.Numeric(12, 2)),
+        sa.column('haber', sa.Numeric(12, 2)),
+        sa.column('referencia_tipo', sa.String()),
+        sa.column('referencia_id', sa.Integer())
+    )
+    ahora = sa.literal(datetime.now(timezone.utc).replace(tzinfo=None), sa.DateTime())
+    cero = sa.literal(0, sa.Numeric(12, 2))
+    for cuenta, debe, haber in (
+        ('CUENTAS_POR_COBRAR', contrato.c.saldo_pendiente, cero),
+        ('SALDOS_INICIALES', cero, contrato.c.saldo_pendiente)
+    ):
+        op.execute(movimiento.insert().from_select(
+            ['contrato_id', 'fecha', 'cuenta', 'debe', 'haber', 'referencia_tipo', 'referencia_id'],
+            sa.select(
+                contrato.c.id, ahora, sa.literal(cuenta), debe, haber, sa.literal('APERTURA'), contrato.c.id
+            ).where(contrato.c.saldo_pendiente > 0)
+        ))
+
+
+def downgrade():
+    with op.batch_alter_table('saldo_contrato_corte', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_saldo_contrato_corte_fecha_corte'))
+
+    op.drop_table('saldo_contrato_corte')
+    with op.batch_alter_table('movimiento_libro', schema=None) as batch_op:
+        batch_op.drop_index('ix_movimiento_libro_cuenta_fecha')
+        batch_op.drop_index('ix_movimiento_libro_contrato_cuenta_fecha')
+
+    op.drop_table('movimiento_libro')
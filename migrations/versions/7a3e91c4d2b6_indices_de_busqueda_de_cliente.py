@@ -0,0 +1,32 @@
+"""indices de busqueda de cliente
+
+Revision ID: 7a3e91c4d2b6
+Revises: 0d5e8b2c7f14
+Create Date: 2026-02-05 17:27:44.902316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3e91c4d2b6'
+down_revision = '0d5e8b2c7f14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_usuario_numero_telefonico'), ['numero_telefonico'], unique=False)
+
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.create_index('ix_contrato_cv_cliente_id', ['cliente_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.drop_index('ix_contrato_cv_cliente_id')
+
+    with op.batch_alter_table('usuario', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_usuario_numero_telefonico'))
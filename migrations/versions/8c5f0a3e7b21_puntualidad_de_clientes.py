@@ -0,0 +1,38 @@
+"""puntualidad de clientes
+
+La tabla se crea vacía; después de aplicar la migración hay que correr
+`flask reconstruir-puntualidad` para cargar el historial de pagos existente.
+
+Revision ID: 8c5f0a3e7b21
+Revises: 4b8e2f6a1c39
+Create Date: 2026-02-11 12:40:03.284517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c5f0a3e7b21'
+down_revision = '4b8e2f6a1c39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('puntualidad_cliente',
+    sa.Column('cliente_id', sa.Integer(), nullable=False),
+    sa.Column('pagos', sa.Integer(), nullable=False),
+    sa.Column('pagos_a_tiempo', sa.Integer(), nullable=False),
+    sa.Column('racha_actual', sa.Integer(), nullable=False),
+    sa.Column('racha_maxima', sa.Integer(), nullable=False),
+    sa.Column('dias_atraso_total', sa.Integer(), nullable=False),
+    sa.Column('dias_atraso_max', sa.Integer(), nullable=False),
+    sa.Column('ultimo_pago', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cliente_id'], ['usuario.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('cliente_id')
+    )
+
+
+def downgrade():
+    op.drop_table('puntualidad_cliente')
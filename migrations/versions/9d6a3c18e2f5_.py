@@ -0,0 +1,30 @@
+"""indice (estado_deuda, proximo_pago_fecha) para morosidad
+
+Revision ID: 9d6a3c18e2f5
+Revises: 5e2b9f41a0c8
+Create Date: 2026-01-22 18:03:51.447615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d6a3c18e2f5'
+down_revision = '5e2b9f41a0c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_contrato_cv_estado_deuda_proximo_pago',
+            ['estado_deuda', 'proximo_pago_fecha'],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('contrato_compra_venta', schema=None) as batch_op:
+        batch_op.drop_index('ix_contrato_cv_estado_deuda_proximo_pago')
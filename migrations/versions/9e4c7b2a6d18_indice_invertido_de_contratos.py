@@ -0,0 +1,35 @@
+"""indice invertido de contratos
+
+Revision ID: 9e4c7b2a6d18
+Revises: 6f1b3d8e5a27
+Create Date: 2026-02-18 11:42:09.316504
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4c7b2a6d18'
+down_revision = '6f1b3d8e5a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('termino_contrato',
+    sa.Column('termino', sa.String(length=64), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('contrato_id', sa.Integer(), nullable=False),
+    sa.Column('frecuencia', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('termino', 'tipo', 'contrato_id')
+    )
+    with op.batch_alter_table('termino_contrato', schema=None) as batch_op:
+        batch_op.create_index('ix_termino_contrato_documento', ['tipo', 'contrato_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('termino_contrato', schema=None) as batch_op:
+        batch_op.drop_index('ix_termino_contrato_documento')
+
+    op.drop_table('termino_contrato')
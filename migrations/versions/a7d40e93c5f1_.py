@@ -0,0 +1,47 @@
+"""totales diarios de caja por empleado, sucursal y metodo
+
+Revision ID: a7d40e93c5f1
+Revises: 3f8c1d2a9b47
+Create Date: 2026-01-12 16:05:48.911027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d40e93c5f1'
+down_revision = '3f8c1d2a9b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('total_caja_diario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empleado_id', sa.Integer(), nullable=False),
+    sa.Column('sucursal_id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('metodo', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('transacciones', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['empleado_id'], ['empleado.id'], ),
+    sa.ForeignKeyConstraint(['sucursal_id'], ['sucursal.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('empleado_id', 'sucursal_id', 'fecha', 'metodo', name='uq_total_caja_diario_clave')
+    )
+
+    # Acumular los pagos existentes (la fecha del pago ya está en hora de México)
+    op.execute(
+        """
+        INSERT INTO total_caja_diario (empleado_id, sucursal_id, fecha, metodo, total, transacciones)
+        SELECT empleado_id, sucursal_id, date(fecha), metodo, SUM(monto), COUNT(*)
+        FROM pago
+        WHERE sucursal_id IS NOT NULL
+        GROUP BY empleado_id, sucursal_id, date(fecha), metodo
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('total_caja_diario')
@@ -0,0 +1,40 @@
+"""llaves de idempotencia
+
+Revision ID: b62f0d7e3c91
+Revises: e4c7a2d95b13
+Create Date: 2026-01-29 10:42:18.305127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b62f0d7e3c91'
+down_revision = 'e4c7a2d95b13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('llave_idempotencia',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('empleado_id', sa.String(length=50), nullable=False),
+    sa.Column('ruta', sa.String(length=200), nullable=False),
+    sa.Column('llave', sa.String(length=255), nullable=False),
+    sa.Column('huella', sa.String(length=64), nullable=False),
+    sa.Column('status', sa.Integer(), nullable=True),
+    sa.Column('respuesta', sa.Text(), nullable=True),
+    sa.Column('creada', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('empleado_id', 'ruta', 'llave', name='uq_llave_idempotencia')
+    )
+    with op.batch_alter_table('llave_idempotencia', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_llave_idempotencia_creada'), ['creada'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('llave_idempotencia', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llave_idempotencia_creada'))
+
+    op.drop_table('llave_idempotencia')
@@ -0,0 +1,30 @@
+"""indice compuesto para historial de pagos por cursor
+
+Revision ID: c81e5b07d2a4
+Revises: a7d40e93c5f1
+Create Date: 2026-01-14 11:27:09.558310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81e5b07d2a4'
+down_revision = 'a7d40e93c5f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_pago_contrato_fecha_id',
+            ['contrato_id', sa.text('fecha DESC'), sa.text('id DESC')],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('pago', schema=None) as batch_op:
+        batch_op.drop_index('ix_pago_contrato_fecha_id')
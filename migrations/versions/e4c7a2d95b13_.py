@@ -0,0 +1,42 @@
+"""calendario de cuotas por contrato
+
+Revision ID: e4c7a2d95b13
+Revises: 9d6a3c18e2f5
+Create Date: 2026-01-27 13:16:40.672391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c7a2d95b13'
+down_revision = '9d6a3c18e2f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cuota_contrato',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('contrato_id', sa.Integer(), nullable=False),
+    sa.Column('numero', sa.Integer(), nullable=False),
+    sa.Column('fecha_vencimiento', sa.DateTime(), nullable=False),
+    sa.Column('monto', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('monto_pagado', sa.Numeric(precision=10, scale=2), server_default=sa.text('0'), nullable=False),
+    sa.Column('estado', sa.Enum('PENDIENTE', 'PARCIAL', 'PAGADA', name='estado_cuota_enum', native_enum=False), server_default=sa.text("'PENDIENTE'"), nullable=False),
+    sa.ForeignKeyConstraint(['contrato_id'], ['contrato_compra_venta.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('contrato_id', 'numero', name='uq_cuota_contrato_numero')
+    )
+    with op.batch_alter_table('cuota_contrato', schema=None) as batch_op:
+        batch_op.create_index('ix_cuota_contrato_estado_numero', ['contrato_id', 'estado', 'numero'], unique=False)
+        batch_op.create_index('ix_cuota_contrato_vencimiento_estado', ['fecha_vencimiento', 'estado'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cuota_contrato', schema=None) as batch_op:
+        batch_op.drop_index('ix_cuota_contrato_vencimiento_estado')
+        batch_op.drop_index('ix_cuota_contrato_estado_numero')
+
+    op.drop_table('cuota_contrato')